@@ -1,93 +1,101 @@
-from flask import Flask, request, jsonify, session, send_from_directory
+from flask import Flask, Response, request, jsonify, session, send_from_directory, stream_with_context
 from flask_cors import CORS
+import importlib.util
 import json
 import os
-import pandas as pd
 from datetime import datetime, timedelta
 import subprocess
 import sys
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
-try:
-    import google.generativeai as genai
-    api_key = os.environ.get('GEMINI_API_KEY')
-    if not api_key:
-        GEMINI_AVAILABLE = False
-        print("⚠️ GEMINI_API_KEY not set - AI chat will use fallback responses")
-    else:
-        genai.configure(api_key=api_key)
-        
-        generation_config = {
-            "temperature": 1,
-            "top_p": 0.95,
-            "top_k": 40,
-            "max_output_tokens": 8192,
-            "response_mime_type": "text/plain",
-        }
-        
-        model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash",
-            generation_config=generation_config,
-        )
-        GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+from event_bus import (bus, stream as event_stream, parse_cursor, SSE_ENABLED, RETRY_MILLISECONDS,
+                       EVENT_EMERGENCY_CALL, EVENT_EMERGENCY_SOLVED, EVENT_SCHEDULE_PUBLISHED,
+                       EVENT_UNAVAILABILITY)
+from nurse_directory import directory
+from attendance_analytics import analytics, find_open_checkin, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from reconciliation import reconciler, shift_windows, roster_version
+from mc_store import store as mc_store, STATUSES as MC_STATUSES, parse_date_range as parse_mc_dates
+from swap_matcher import matcher as swap_matcher, apply_matches, Roster
+from replacement_finder import finder as replacement_finder, slot_at
+from availability import availability
+from metrics import metrics, instrument_app, METRICS_TOKEN, SCHEDULER_METRICS_FILE
+from solver_history import history as solver_history
+from memprofile import memprofile
+from lazy_imports import lazy_import
+from file_lock import locked, read_json, write_json
+from http_cache import cached_json, cached_body
+from change_log import change_log, KIND_MC, KIND_SWAP, KIND_EMERGENCY
+import roster_codec
+from schedule_store import schedule_store, read_published_roster, parse_query as parse_schedule_query
+from chat_intents import (match_intent, normalize_message, llm_cache, CANNED_RESPONSES, FEW_SHOT_PROMPT,
+                          LLM_ROUTES, FALLBACK_ROUTES, INTENT_SCHEDULE)
+
+pd = lazy_import("pandas")   # only the schedule/export routes need it
+
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+GEMINI_AVAILABLE = False
+if importlib.util.find_spec('google') is None or importlib.util.find_spec('google.generativeai') is None:
     print("Gemini AI not available. Install google-generativeai package.")
+elif not GEMINI_API_KEY:
+    print("⚠️ GEMINI_API_KEY not set - AI chat will use fallback responses")
+else:
+    GEMINI_AVAILABLE = True
+
+def gemini_model():
+    """Configure the SDK and build the chat model; runs on the first chat that reaches the model."""
+    import google.generativeai as genai
+    genai.configure(api_key=GEMINI_API_KEY)
+    
+    generation_config = {
+        "temperature": 1,
+        "top_p": 0.95,
+        "top_k": 40,
+        "max_output_tokens": 8192,
+        "response_mime_type": "text/plain",
+    }
+    
+    return genai.GenerativeModel(
+        model_name="gemini-1.5-flash",
+        generation_config=generation_config,
+    )
+
+from llm_client import LLMClient, LLMUnavailable, create_backend
+
+# Model calls go through a client with a hard deadline and circuit breaker;
+# LLM_BACKEND=stub swaps in a deterministic offline backend for load tests
+llm_backend = create_backend(gemini_model if GEMINI_AVAILABLE else None)
+llm = LLMClient(llm_backend) if llm_backend is not None else None
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'nurse_scheduler_2024')
 CORS(app, supports_credentials=True)
+instrument_app(app)
 
 ATTENDANCE_FILE = "data/attendance.json"
-MC_FILE = "data/mc_requests.json"
 EMERGENCY_FILE = "data/emergency_calls.json"
 SWAP_FILE = "data/shift_swaps.json"
 ADMIN_IDS = ["N1001", "N1015"]  # Use existing nurse IDs as admins
 
+# Saves replace the file atomically; any load -> modify -> save runs under locked(<file>)
 def load_attendance():
-    if os.path.exists(ATTENDANCE_FILE):
-        with open(ATTENDANCE_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+    return read_json(ATTENDANCE_FILE, dict)
 
 def save_attendance(data):
-    os.makedirs("data", exist_ok=True)
-    with open(ATTENDANCE_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
-
-def load_mc_requests():
-    if os.path.exists(MC_FILE):
-        with open(MC_FILE, 'r') as f:
-            return json.load(f)
-    return {}
-
-def save_mc_requests(data):
-    os.makedirs("data", exist_ok=True)
-    with open(MC_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_json(ATTENDANCE_FILE, data)
 
 def load_emergency_calls():
-    if os.path.exists(EMERGENCY_FILE):
-        with open(EMERGENCY_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    return read_json(EMERGENCY_FILE, list)
 
 def save_emergency_calls(data):
-    os.makedirs("data", exist_ok=True)
-    with open(EMERGENCY_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_json(EMERGENCY_FILE, data)
 
 def load_shift_swaps():
-    if os.path.exists(SWAP_FILE):
-        with open(SWAP_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    return read_json(SWAP_FILE, list)
 
 def save_shift_swaps(data):
-    os.makedirs("data", exist_ok=True)
-    with open(SWAP_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_json(SWAP_FILE, data)
 
 @app.route('/')
 def index():
@@ -116,10 +124,7 @@ def login():
         return jsonify({"error": "Invalid credentials"}), 401
     
     try:
-        with open("csv/nurse_database.json", "r") as f:
-            nurses = json.load(f)
-        
-        nurse = next((n for n in nurses if str(n["id"]) == str(nurse_id)), None)
+        nurse = directory.snapshot().get(nurse_id)
         if nurse:
             session['nurse_id'] = nurse_id
             session['nurse_name'] = nurse.get('name', f'Nurse {nurse_id}')
@@ -160,17 +165,18 @@ def checkin():
     date_str = now.strftime("%Y-%m-%d")
     time_str = now.strftime("%H:%M:%S")
     
-    attendance = load_attendance()
-    if nurse_id not in attendance:
-        attendance[nurse_id] = {}
-    
-    if date_str not in attendance[nurse_id]:
-        attendance[nurse_id][date_str] = {}
-    
-    attendance[nurse_id][date_str]['checkin'] = time_str
-    attendance[nurse_id][date_str]['status'] = 'checked_in'
-    
-    save_attendance(attendance)
+    with locked(ATTENDANCE_FILE):
+        attendance = load_attendance()
+        if nurse_id not in attendance:
+            attendance[nurse_id] = {}
+        
+        if date_str not in attendance[nurse_id]:
+            attendance[nurse_id][date_str] = {}
+        
+        attendance[nurse_id][date_str]['checkin'] = time_str
+        attendance[nurse_id][date_str]['status'] = 'checked_in'
+        
+        save_attendance(attendance)
     
     return jsonify({
         "success": True,
@@ -188,24 +194,25 @@ def checkout():
     date_str = now.strftime("%Y-%m-%d")
     time_str = now.strftime("%H:%M:%S")
     
-    attendance = load_attendance()
-    if nurse_id not in attendance or date_str not in attendance[nurse_id]:
-        return jsonify({"error": "No check-in record found"}), 400
-    
-    checkin_time = attendance[nurse_id][date_str].get('checkin')
-    if not checkin_time:
-        return jsonify({"error": "No check-in record found"}), 400
-    
-    attendance[nurse_id][date_str]['checkout'] = time_str
-    attendance[nurse_id][date_str]['status'] = 'checked_out'
-    
-    # Calculate hours worked
-    checkin_dt = datetime.strptime(f"{date_str} {checkin_time}", "%Y-%m-%d %H:%M:%S")
-    checkout_dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S")
-    hours_worked = (checkout_dt - checkin_dt).total_seconds() / 3600
-    attendance[nurse_id][date_str]['hours_worked'] = round(hours_worked, 2)
-    
-    save_attendance(attendance)
+    with locked(ATTENDANCE_FILE):
+        attendance = load_attendance()
+        # A Night shift (23:00-07:00) checks out the day after it checked in
+        checkin_date = find_open_checkin(attendance.get(nurse_id, {}), now)
+        if not checkin_date:
+            return jsonify({"error": "No check-in record found"}), 400
+        
+        record = attendance[nurse_id][checkin_date]
+        record['checkout'] = time_str
+        record['status'] = 'checked_out'
+        if checkin_date != date_str:
+            record['checkout_date'] = date_str
+        
+        # Calculate hours worked
+        checkin_dt = datetime.strptime(f"{checkin_date} {record['checkin']}", "%Y-%m-%d %H:%M:%S")
+        hours_worked = (now.replace(microsecond=0) - checkin_dt).total_seconds() / 3600
+        record['hours_worked'] = round(hours_worked, 2)
+        
+        save_attendance(attendance)
     
     return jsonify({
         "success": True,
@@ -233,7 +240,22 @@ def get_status():
         "status": today_record.get('status', 'not_checked_in')
     })
 
+def run_scheduler():
+    """Run scheduling_ai.py in a subprocess and fold its stage timings into this process's metrics."""
+    with metrics.stage("scheduler_process"), memprofile.stage("scheduler_process"):
+        result = subprocess.run([sys.executable, 'scheduling_ai.py'], 
+                              capture_output=True, text=True, cwd='.')
+    metrics.merge_file(SCHEDULER_METRICS_FILE)
+    metrics.inc("scheduler_runs_total", result="ok" if result.returncode == 0 else "error")
+    return result
+
+def export_schedule_csv():
+    with metrics.stage("csv_export"), memprofile.stage("csv_export"):
+        df = pd.read_excel('output_schedule.xlsx', sheet_name='Schedule')
+        df.to_csv('output_schedule.csv', index=False)
+
 @app.route('/api/schedule', methods=['POST'])
+@memprofile.profiled("app_schedule")
 def generate_schedule():
     if 'nurse_id' not in session or not session.get('is_admin'):
         return jsonify({"error": "Admin access required"}), 403
@@ -248,21 +270,18 @@ def generate_schedule():
                 json.dump(admission_data, f)
         
         # Run the actual AI scheduling system
-        result = subprocess.run([sys.executable, 'scheduling_ai.py'], 
-                              capture_output=True, text=True, cwd='.')
+        result = run_scheduler()
         
         if result.returncode == 0:
             # Read the generated schedule
             if os.path.exists('output_schedule.xlsx'):
-                df = pd.read_excel('output_schedule.xlsx', sheet_name='Schedule')
                 # Also save as CSV for compatibility
-                df.to_csv('output_schedule.csv', index=False)
+                export_schedule_csv()
                 
-                # Auto backup to S3 after schedule generation
+                # Auto backup to S3 after schedule generation (runs in the background)
                 try:
-                    from s3_operations import backup_to_s3
-                    success, backup_id = backup_to_s3()
-                    backup_msg = f" (Backed up to S3: {backup_id})" if success else ""
+                    from s3_operations import request_backup
+                    backup_msg = " (S3 backup started)" if request_backup() else ""
                 except Exception as e:
                     backup_msg = f" (S3 backup failed: {str(e)})"
                 
@@ -270,6 +289,8 @@ def generate_schedule():
                 if os.path.exists('temp_admission_data.json'):
                     os.remove('temp_admission_data.json')
                 
+                publish_schedule_event()
+                
                 return jsonify({
                     "success": True,
                     "message": f"AI-optimized schedule generated successfully!{backup_msg}",
@@ -284,6 +305,7 @@ def generate_schedule():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/schedule/upload', methods=['POST'])
+@memprofile.profiled("app_schedule_upload")
 def upload_schedule_data():
     if 'nurse_id' not in session or not session.get('is_admin'):
         return jsonify({"error": "Admin access required"}), 403
@@ -346,8 +368,9 @@ def upload_schedule_data():
         
         # Retrain models
         print("Retraining ML models...")
-        ml_result = subprocess.run([sys.executable, 'ML.py'], 
-                                 capture_output=True, text=True, cwd='.')
+        with metrics.stage("retrain_models"), memprofile.stage("retrain_models"):
+            ml_result = subprocess.run([sys.executable, 'ML.py'], 
+                                     capture_output=True, text=True, cwd='.')
         
         if ml_result.returncode != 0:
             return jsonify({"error": f"Model training failed: {ml_result.stderr}"}), 500
@@ -355,26 +378,24 @@ def upload_schedule_data():
         print("Models retrained successfully")
         
         # Generate new schedules
-        result = subprocess.run([sys.executable, 'scheduling_ai.py'], 
-                              capture_output=True, text=True, cwd='.')
+        result = run_scheduler()
         
         if result.returncode == 0:
             if os.path.exists('output_schedule.xlsx'):
-                df = pd.read_excel('output_schedule.xlsx', sheet_name='Schedule')
-                df.to_csv('output_schedule.csv', index=False)
+                export_schedule_csv()
                 
                 # Log schedule generation
                 admin_name = session.get('nurse_name', 'Unknown')
                 admin_id = session.get('nurse_id', 'Unknown')
                 print(f"📅 SCHEDULE GENERATED by {admin_name} ({admin_id})")
                 
-                # Auto backup to S3 after schedule generation
+                # Auto backup to S3 after schedule generation (runs in the background)
                 try:
-                    from s3_operations import backup_to_s3
-                    success, backup_id = backup_to_s3()
-                    backup_msg = f" (Backed up to S3: {backup_id})" if success else ""
-                    if success:
-                        print(f"📤 AUTO-BACKUP: {backup_id}")
+                    from s3_operations import request_backup
+                    started = request_backup()
+                    backup_msg = " (S3 backup started)" if started else ""
+                    if started:
+                        print("📤 AUTO-BACKUP queued")
                 except Exception as e:
                     backup_msg = f" (S3 backup failed: {str(e)})"
                     print(f"❌ BACKUP FAILED: {str(e)}")
@@ -386,6 +407,8 @@ def upload_schedule_data():
                         current_week = f.read().strip()
                         week_info = f" for week starting {current_week}"
                 
+                publish_schedule_event()
+                
                 return jsonify({
                     "success": True,
                     "message": f"Models retrained and schedule generated{week_info}!{backup_msg}",
@@ -404,8 +427,55 @@ def attendance_report():
     if 'nurse_id' not in session or not session.get('is_admin'):
         return jsonify({"error": "Admin access required"}), 403
     
-    attendance = load_attendance()
-    return jsonify({"attendance": attendance})
+    try:
+        report = analytics.report(
+            group=request.args.get('group', 'week'),
+            nurse_id=request.args.get('nurse_id'),
+            ward=request.args.get('ward'),
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            page=request.args.get('page', 1),
+            per_page=request.args.get('per_page', DEFAULT_PAGE_SIZE)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(report)
+
+@app.route('/api/attendance/reconcile', methods=['GET'])
+def attendance_reconcile():
+    """Rostered shifts matched against check-ins: no-shows, partial shifts and unscheduled work."""
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    try:
+        result = reconciler.report(
+            nurse_id=request.args.get('nurse_id'),
+            ward=request.args.get('ward'),
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            status=request.args.get('status'),
+            page=request.args.get('page', 1),
+            per_page=request.args.get('per_page', DEFAULT_PAGE_SIZE)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+def find_nurse_row(df, nurse_identifier):
+    """Find a nurse's schedule row by ID, then by (partial) name via the directory index."""
+    if 'Nurse_ID' not in df.columns:
+        if 'Name' in df.columns:
+            return df[df["Name"].str.contains(nurse_identifier, case=False, na=False, regex=False)]
+        return pd.DataFrame()
+    
+    ids = df['Nurse_ID'].astype(str)
+    nurse_row = df[ids == str(nurse_identifier)]
+    if nurse_row.empty:
+        matches = directory.snapshot().search_name(nurse_identifier)
+        if matches:
+            # Resolve names to IDs so repeated names cannot pick up the wrong row
+            nurse_row = df[ids.isin([str(n["id"]) for n in matches])]
+    return nurse_row
 
 def check_schedule(nurse_identifier):
     """Return the schedule of a nurse using name or ID."""
@@ -418,14 +488,7 @@ def check_schedule(nurse_identifier):
         else:
             return f"No schedule file found. Please generate a schedule first."
         
-        # Search by nurse ID first (exact match)
-        nurse_row = pd.DataFrame()  # Initialize as empty DataFrame
-        if 'Nurse_ID' in df.columns:
-            nurse_row = df[df['Nurse_ID'].astype(str) == str(nurse_identifier)]
-        
-        # If no match by ID, try by name (partial match)
-        if nurse_row.empty and 'Name' in df.columns:
-            nurse_row = df[df["Name"].str.contains(nurse_identifier, case=False, na=False)]
+        nurse_row = find_nurse_row(df, nurse_identifier)
         
         if not nurse_row.empty:
             nurse_data = nurse_row.iloc[0]
@@ -485,13 +548,7 @@ def get_today_schedule(nurse_identifier):
         else:
             return "No schedule available"
         
-        # Search by nurse ID first (exact match)
-        nurse_row = pd.DataFrame()
-        if 'Nurse_ID' in df.columns:
-            nurse_row = df[df['Nurse_ID'].astype(str) == str(nurse_identifier)]
-        
-        if nurse_row.empty and 'Name' in df.columns:
-            nurse_row = df[df["Name"].str.contains(nurse_identifier, case=False, na=False)]
+        nurse_row = find_nurse_row(df, nurse_identifier)
         
         if not nurse_row.empty:
             nurse_data = nurse_row.iloc[0]
@@ -536,12 +593,7 @@ def get_current_week_schedule(nurse_identifier):
         else:
             return "No schedule available"
         
-        nurse_row = pd.DataFrame()
-        if 'Nurse_ID' in df.columns:
-            nurse_row = df[df['Nurse_ID'].astype(str) == str(nurse_identifier)]
-        
-        if nurse_row.empty and 'Name' in df.columns:
-            nurse_row = df[df["Name"].str.contains(nurse_identifier, case=False, na=False)]
+        nurse_row = find_nurse_row(df, nurse_identifier)
         
         if not nurse_row.empty:
             nurse_data = nurse_row.iloc[0]
@@ -583,243 +635,100 @@ def get_current_week_schedule(nurse_identifier):
     except Exception as e:
         return "No schedule available"
 
+def lookup_schedule_from_message(input_text, nurse_name=None):
+    """Answer "I am <name>, ..." and "my schedule" questions; None for anything else."""
+    input_lower = input_text.lower()
+    if "i am" in input_lower:
+        parts = input_text.split("I am") if "I am" in input_text else input_text.split("i am")
+        if len(parts) > 1:
+            name_part = parts[1].split(",")[0].strip()
+            return check_schedule(name_part)
+    
+    if "my schedule" in input_lower:
+        # Use logged-in nurse's ID for more accurate lookup
+        if 'nurse_id' in session:
+            return check_schedule(session['nurse_id'])
+        elif nurse_name:
+            return check_schedule(nurse_name)
+        else:
+            return "Please tell me your name or ID so I can look up your schedule."
+    
+    return None
+
+def route_chat_message(input_text, nurse_name=None):
+    """Answer intents that have a canned reply (MC, swap, schedule, emergency); None means ask the model."""
+    intent = match_intent(input_text.strip(), LLM_ROUTES)
+    if intent == INTENT_SCHEDULE:
+        personal = lookup_schedule_from_message(input_text, nurse_name)
+        if personal is not None:
+            return personal
+    if intent is not None:
+        return CANNED_RESPONSES[intent]
+    return None
+
+def build_llm_prompt(input_text):
+    return list(FEW_SHOT_PROMPT) + [
+        f"input: {input_text}",
+        "output: ",
+    ]
+
 def generate_ai_response(input_text, nurse_name=None):
     """Generate AI response using Gemini or fallback."""
-    if not GEMINI_AVAILABLE:
+    if llm is None:
         return get_fallback_response(input_text)
     
     try:
-        # Handle sick/medical leave requests for nurses
-        input_lower = input_text.lower().strip()
-        
-        # Check for sick nurse requests
-        sick_keywords = ["im sick", "i'm sick", "i am sick", "feeling sick", "not well", "unwell", "ill"]
-        if any(keyword in input_lower for keyword in sick_keywords):
-            return 'I understand you\'re not feeling well. As a nurse, do you need to take medical leave? Let me help you submit an MC request.' + '''<div class="mc-form">
-<h4>📋 Submit Medical Certificate</h4>
-<form id="mcForm">
-<div class="form-group">
-<label>Start Date:</label>
-<input type="date" id="startDate" required>
-</div>
-<div class="form-group">
-<label>End Date:</label>
-<input type="date" id="endDate" required>
-</div>
-<div class="form-group">
-<label>Reason:</label>
-<input type="text" id="reason" placeholder="e.g., Fever, flu symptoms" required>
-</div>
-<div class="form-group">
-<label>Documentation:</label>
-<textarea id="documentation" placeholder="Describe your medical certificate or how you will provide it" required></textarea>
-</div>
-<button type="button" onclick="submitMC()" class="submit-btn">Submit MC Request</button>
-</form>
-</div>'''
-        
-        # Check for leave requests
-        leave_keywords = ["mc leave", "medical leave", "sick leave"]
-        if any(keyword in input_lower for keyword in leave_keywords):
-            return '''<div class="mc-form">
-<h4>📋 Submit Medical Certificate</h4>
-<form id="mcForm">
-<div class="form-group">
-<label>Start Date:</label>
-<input type="date" id="startDate" required>
-</div>
-<div class="form-group">
-<label>End Date:</label>
-<input type="date" id="endDate" required>
-</div>
-<div class="form-group">
-<label>Reason:</label>
-<input type="text" id="reason" placeholder="e.g., Medical appointment, illness" required>
-</div>
-<div class="form-group">
-<label>Documentation:</label>
-<textarea id="documentation" placeholder="Describe your medical certificate or how you will provide it" required></textarea>
-</div>
-<button type="button" onclick="submitMC()" class="submit-btn">Submit MC Request</button>
-</form>
-</div>'''
-        
-        # Handle MC submission requests
-        mc_keywords = ["submit mc", "medical certificate", "request mc", "take mc", "get mc", "mc request", "mc submission", "apply mc", "i wan mc", "i want mc", "need mc"]
-        mc_match = input_lower == "mc" or any(keyword in input_lower for keyword in mc_keywords)
+        local = route_chat_message(input_text, nurse_name)
+        if local is not None:
+            return local
         
-        if mc_match:
-            return '''<div class="mc-form">
-<h4>📋 Submit Medical Certificate</h4>
-<form id="mcForm">
-<div class="form-group">
-<label>Start Date:</label>
-<input type="date" id="startDate" required>
-</div>
-<div class="form-group">
-<label>End Date:</label>
-<input type="date" id="endDate" required>
-</div>
-<div class="form-group">
-<label>Reason:</label>
-<input type="text" id="reason" placeholder="e.g., Doctor's appointment, illness" required>
-</div>
-<div class="form-group">
-<label>Documentation:</label>
-<textarea id="documentation" placeholder="Describe your medical certificate or how you will provide it" required></textarea>
-</div>
-<button type="button" onclick="submitMC()" class="submit-btn">Submit MC Request</button>
-</form>
-</div>'''
+        cache_key = normalize_message(input_text)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-
-        # Handle schedule queries
-        if "schedule" in input_text.lower():
-            if "i am" in input_text.lower():
-                parts = input_text.split("I am") if "I am" in input_text else input_text.split("i am")
-                if len(parts) > 1:
-                    name_part = parts[1].split(",")[0].strip()
-                    return check_schedule(name_part)
-            
-            if "my schedule" in input_text.lower():
-                # Use logged-in nurse's ID for more accurate lookup
-                from flask import session
-                if 'nurse_id' in session:
-                    # Show both current and next week schedules
-                    full_schedule = check_schedule(session['nurse_id'])
-                    return full_schedule
-                elif nurse_name:
-                    return check_schedule(nurse_name)
-                else:
-                    return "Please tell me your name or ID so I can look up your schedule."
-        
-        # Use Gemini AI with enhanced capabilities
-        response = model.generate_content([
-            "input: who are you",
-            "output: I am an AI-powered nurse assistant designed to help with scheduling, medical procedures, emergency protocols, and general nursing support.",
-            "input: What all can you do?",
-            "output: I can help with work schedules, shift management, emergency procedures, medical protocols, patient care guidance, medication information, and general nursing questions. I'm here to support you in your nursing duties.",
-            f"input: {input_text}",
-            "output: ",
-        ])
-        
-        return response.text
+        text = llm.generate(build_llm_prompt(input_text))
+        llm_cache.put(cache_key, text)
+        return text
     except Exception as e:
         return get_fallback_response(input_text)
 
+def stream_ai_response(input_text, nurse_name=None):
+    """Like generate_ai_response, but yields the answer in chunks as the model produces it."""
+    if llm is None:
+        yield get_fallback_response(input_text)
+        return
+    
+    local = route_chat_message(input_text, nurse_name)
+    if local is not None:
+        yield local
+        return
+    
+    cache_key = normalize_message(input_text)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+    
+    parts = []
+    try:
+        for chunk in llm.stream(build_llm_prompt(input_text)):
+            parts.append(chunk)
+            yield chunk
+    except LLMUnavailable:
+        # Only substitute the fallback if nothing has been sent yet
+        if not parts:
+            yield get_fallback_response(input_text)
+        return
+    
+    llm_cache.put(cache_key, "".join(parts))
+
 def get_fallback_response(message):
     """Fallback responses when Gemini is not available."""
-    msg = message.lower()
-    
-    if 'schedule' in msg:
-        return 'Your schedule is available in the Schedule tab. You can also ask admin to generate new schedules.'
-    elif any(keyword in msg for keyword in ['swap', 'change shift', 'shift swap', 'swap shift']):
-        return '''<div class="swap-form">
-<h4>🔄 Shift Swap Request</h4>
-<form id="swapForm">
-<div class="form-group">
-<label>Current Shift to Swap:</label>
-<select id="currentShift" required>
-<option value="">Select your current shift</option>
-<option value="Day 1 Morning">Day 1 Morning</option>
-<option value="Day 1 Evening">Day 1 Evening</option>
-<option value="Day 1 Night">Day 1 Night</option>
-<option value="Day 2 Morning">Day 2 Morning</option>
-<option value="Day 2 Evening">Day 2 Evening</option>
-<option value="Day 2 Night">Day 2 Night</option>
-<option value="Day 3 Morning">Day 3 Morning</option>
-<option value="Day 3 Evening">Day 3 Evening</option>
-<option value="Day 3 Night">Day 3 Night</option>
-<option value="Day 4 Morning">Day 4 Morning</option>
-<option value="Day 4 Evening">Day 4 Evening</option>
-<option value="Day 4 Night">Day 4 Night</option>
-<option value="Day 5 Morning">Day 5 Morning</option>
-<option value="Day 5 Evening">Day 5 Evening</option>
-<option value="Day 5 Night">Day 5 Night</option>
-<option value="Day 6 Morning">Day 6 Morning</option>
-<option value="Day 6 Evening">Day 6 Evening</option>
-<option value="Day 6 Night">Day 6 Night</option>
-<option value="Day 7 Morning">Day 7 Morning</option>
-<option value="Day 7 Evening">Day 7 Evening</option>
-<option value="Day 7 Night">Day 7 Night</option>
-</select>
-</div>
-<div class="form-group">
-<label>Desired Shift:</label>
-<select id="desiredShift" required>
-<option value="">Select desired shift</option>
-<option value="Day 1 Morning">Day 1 Morning</option>
-<option value="Day 1 Evening">Day 1 Evening</option>
-<option value="Day 1 Night">Day 1 Night</option>
-<option value="Day 2 Morning">Day 2 Morning</option>
-<option value="Day 2 Evening">Day 2 Evening</option>
-<option value="Day 2 Night">Day 2 Night</option>
-<option value="Day 3 Morning">Day 3 Morning</option>
-<option value="Day 3 Evening">Day 3 Evening</option>
-<option value="Day 3 Night">Day 3 Night</option>
-<option value="Day 4 Morning">Day 4 Morning</option>
-<option value="Day 4 Evening">Day 4 Evening</option>
-<option value="Day 4 Night">Day 4 Night</option>
-<option value="Day 5 Morning">Day 5 Morning</option>
-<option value="Day 5 Evening">Day 5 Evening</option>
-<option value="Day 5 Night">Day 5 Night</option>
-<option value="Day 6 Morning">Day 6 Morning</option>
-<option value="Day 6 Evening">Day 6 Evening</option>
-<option value="Day 6 Night">Day 6 Night</option>
-<option value="Day 7 Morning">Day 7 Morning</option>
-<option value="Day 7 Evening">Day 7 Evening</option>
-<option value="Day 7 Night">Day 7 Night</option>
-</select>
-</div>
-<div class="form-group">
-<label>Reason for Swap:</label>
-<textarea id="swapReason" placeholder="Please explain why you need this shift swap" required></textarea>
-</div>
-<button type="button" onclick="submitSwapRequest()" class="submit-btn">Submit Swap Request</button>
-</form>
-</div>'''
-    elif 'emergency' in msg or 'procedure' in msg:
-        return '''Emergency Procedures:<br>
-• **Code Blue (Cardiac Arrest)**: Call 2222 immediately, start CPR if trained<br>
-• **Fire Emergency**: Call 3333, evacuate patients safely, use RACE protocol<br>
-• **Security Alert**: Call 4444 for violent patients or intruders<br>
-• **Medical Emergency**: Assess patient, call doctor, prepare emergency cart<br>
-• **Choking**: Heimlich maneuver for conscious patients, back blows for infants<br>
-• **Severe Bleeding**: Apply direct pressure, elevate if possible, call for help<br>
-• **Allergic Reaction**: Check for EpiPen, call doctor, monitor airway<br>
-• **Fall**: Don't move patient, assess injuries, call doctor<br>
-• **Medication Error**: Stop administration, assess patient, report immediately<br>
-• **Equipment Failure**: Switch to backup, call maintenance, document incident<br><br>
-Always follow your hospital's specific protocols and call for help when needed.'''
-    elif 'protocol' in msg:
-        return 'I do not have access to real-time information, including ward protocols. Those are specific to individual hospitals and healthcare facilities. To find out about ward protocols, you should consult your hospital\'s internal documentation, your supervisor, or a senior nurse on the ward.'
-    elif any(keyword in msg for keyword in ['mc', 'medical certificate', 'request mc', 'take mc', 'get mc', 'i wan mc', 'i want mc', 'need mc', 'sick leave', 'medical leave']) or msg.strip() == 'mc':
-        return '''<div class="mc-form">
-<h4>📋 Submit Medical Certificate</h4>
-<form id="mcForm">
-<div class="form-group">
-<label>Start Date:</label>
-<input type="date" id="startDate" required>
-</div>
-<div class="form-group">
-<label>End Date:</label>
-<input type="date" id="endDate" required>
-</div>
-<div class="form-group">
-<label>Reason:</label>
-<input type="text" id="reason" placeholder="e.g., Doctor's appointment, illness" required>
-</div>
-<div class="form-group">
-<label>Documentation:</label>
-<textarea id="documentation" placeholder="Describe your medical certificate or how you will provide it" required></textarea>
-</div>
-<button type="button" onclick="submitMC()" class="submit-btn">Submit MC Request</button>
-</form>
-</div>'''
-    elif 'help' in msg:
-        return 'I can help with:<br>• Schedule information<br>• Emergency procedures<br>• Ward protocols<br>• Shift swaps (say "shift swap")<br>• MC submissions (say "request mc")'
-    else:
-        return f'I understand you\'re asking about: "{message}". I\'m here to help with nursing questions, medical procedures, emergency protocols, and scheduling. What specific information do you need?'
+    intent = match_intent(message, FALLBACK_ROUTES)
+    if intent is not None:
+        return CANNED_RESPONSES[intent]
+    return f'I understand you\'re asking about: "{message}". I\'m here to help with nursing questions, medical procedures, emergency protocols, and scheduling. What specific information do you need?'
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
@@ -830,6 +739,12 @@ def chat():
     message = data.get('message', '')
     nurse_name = session.get('nurse_name', '')
     
+    # ?stream=1 (or "stream": true) returns the answer as a chunked text/plain body
+    if request.args.get('stream') == '1' or data.get('stream'):
+        return Response(stream_with_context(stream_ai_response(message, nurse_name)),
+                        mimetype='text/plain',
+                        headers={"X-Accel-Buffering": "no"})
+    
     try:
         response = generate_ai_response(message, nurse_name)
         return jsonify({
@@ -844,7 +759,7 @@ def submit_mc():
     if 'nurse_id' not in session:
         return jsonify({"error": "Not logged in"}), 401
     
-    data = request.json
+    data = request.json or {}
     nurse_id = session['nurse_id']
     nurse_name = session['nurse_name']
     
@@ -860,12 +775,11 @@ def submit_mc():
         "submitted_at": datetime.now().isoformat()
     }
     
-    mc_requests = load_mc_requests()
-    if nurse_id not in mc_requests:
-        mc_requests[nurse_id] = []
-    
-    mc_requests[nurse_id].append(mc_request)
-    save_mc_requests(mc_requests)
+    try:
+        mc_store.submit(mc_request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    record_changes(KIND_MC, [mc_request])
     
     return jsonify({
         "success": True,
@@ -881,43 +795,174 @@ def list_mc():
     nurse_id = session['nurse_id']
     is_admin = session.get('is_admin', False)
     
-    mc_requests = load_mc_requests()
+    if not is_admin:
+        return jsonify({"requests": mc_store.for_nurse(nurse_id)})
     
-    if is_admin:
-        all_requests = []
-        for nurse_requests in mc_requests.values():
-            all_requests.extend(nurse_requests)
-        return jsonify({"requests": all_requests})
-    else:
-        nurse_requests = mc_requests.get(nurse_id, [])
-        return jsonify({"requests": nurse_requests})
+    # Admins page through one status queue, newest first
+    status = request.args.get('status') or None
+    if status and status not in MC_STATUSES:
+        return jsonify({"error": f"status must be one of {', '.join(MC_STATUSES)}"}), 400
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+    try:
+        start, end = parse_mc_dates(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rows, total = mc_store.page(status, page, per_page, start=start, end=end)
+    return jsonify({
+        "requests": rows,
+        "status": status,
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": -(-total // per_page),
+        "counts": mc_store.counts()
+    })
+
+@app.route('/api/mc/decide', methods=['POST'])
+def decide_mc():
+    """Approve or reject a batch of MC requests and publish the resulting unavailability."""
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    data = request.json or {}
+    ids = data.get('ids') or ([data['id']] if data.get('id') else [])
+    if not ids:
+        return jsonify({"error": "ids is required"}), 400
+    try:
+        updated, errors, windows = mc_store.decide(ids, data.get('status'), session['nurse_id'], data.get('note'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    record_changes(KIND_MC, updated)
+    
+    # One event per ward so ward-scoped subscribers only see their own nurses
+    snapshot = directory.snapshot()
+    by_ward = {}
+    for window in windows:
+        nurse = snapshot.get(window["nurse_id"]) or {}
+        by_ward.setdefault(nurse.get('department'), []).append(window)
+    for ward, ward_windows in by_ward.items():
+        bus.publish(EVENT_UNAVAILABILITY, {"windows": ward_windows, "decided_by": session['nurse_id']}, ward=ward)
+    
+    return jsonify({
+        "success": not errors,
+        "updated": [r["id"] for r in updated],
+        "errors": errors,
+        "unavailability": windows
+    })
+
+@app.route('/api/mc/unavailability', methods=['GET'])
+def mc_unavailability():
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    try:
+        start, end = parse_mc_dates(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"windows": mc_store.unavailability(start, end)})
 
 @app.route('/api/schedule/full', methods=['GET'])
+@memprofile.profiled("app_schedule_full")
 def get_full_schedule():
     if 'nurse_id' not in session or not session.get('is_admin'):
         return jsonify({"error": "Admin access required"}), 403
     
     try:
-        # Try to load from Excel first, then CSV
-        if os.path.exists("output_schedule.xlsx"):
-            df = pd.read_excel("output_schedule.xlsx", sheet_name="Schedule")
-        elif os.path.exists("output_schedule.csv"):
-            df = pd.read_csv("output_schedule.csv")
-        else:
-            return jsonify({"error": "No schedule file found. Please generate a schedule first."}), 404
-        
-        # Convert to dictionary format
-        schedule_data = df.to_dict('records')
-        
-        return jsonify({
-            "success": True,
-            "schedule": schedule_data,
-            "total_nurses": len(schedule_data)
-        })
-        
+        query = parse_schedule_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # The ETag comes from the roster files' versions, so an unchanged roster is a 304 without reading them
+    versions = roster_version()
+    if versions == (None, None):
+        return jsonify({"error": "No schedule file found. Please generate a schedule first."}), 404
+    
+    def build():
+        with memprofile.stage("query_schedule"):
+            return schedule_store.query(**query)
+    
+    try:
+        return cached_json(("schedule_full",) + tuple(sorted(query.items())), versions, build)
+    except LookupError:
+        return jsonify({"error": "No schedule file found. Please generate a schedule first."}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/whatif', methods=['POST'])
+def whatif_scenarios():
+    """Predict and solve a batch of staffing scenarios in parallel and compare them with the baseline."""
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    data = request.json or {}
+    try:
+        # Imported here: it pulls in the scheduler, pandas and OR-Tools
+        from whatif import run_batch
+        with metrics.stage("whatif_batch"):
+            result = run_batch(data.get('scenarios'), start_date=data.get('start_date'),
+                               include_baseline=data.get('include_baseline', True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"success": True, **result})
+
+@app.route('/api/staffing/risk', methods=['GET'])
+def staffing_risk_report():
+    """Monte Carlo probability that the published roster is short-staffed, per ward and shift."""
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    from staffing_risk import staffing_risk, inputs_version, METHODS, DEFAULT_TRAJECTORIES, DEFAULT_SEED
+    try:
+        trajectories = int(request.args.get('trajectories', DEFAULT_TRAJECTORIES))
+        seed = int(request.args.get('seed', DEFAULT_SEED))
+    except ValueError:
+        return jsonify({"error": "trajectories and seed must be integers"}), 400
+    method = request.args.get('method', 'trees')
+    if method not in METHODS:
+        return jsonify({"error": f"method must be one of {', '.join(METHODS)}"}), 400
+    
+    versions = roster_version()
+    if versions == (None, None):
+        return jsonify({"error": "No schedule file found. Please generate a schedule first."}), 404
+    
+    try:
+        return cached_json(("staffing_risk", method, trajectories, seed), (versions, inputs_version()),
+                           lambda: staffing_risk.report(trajectories, method, seed))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError:
+        return jsonify({"error": "No schedule file found. Please generate a schedule first."}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/schedule/packed', methods=['GET'])
+def get_packed_schedule():
+    """The published roster in the compact binary format of roster_codec.py."""
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    versions = roster_version()
+    if versions == (None, None):
+        return jsonify({"error": "No schedule file found. Please generate a schedule first."}), 404
+    
+    try:
+        return cached_body("schedule_packed", versions, lambda: roster_codec.encode_roster(read_schedule_frame()),
+                           roster_codec.MIMETYPE)
+    except ValueError as e:
+        return jsonify({"error": f"Roster cannot be packed: {e}"}), 422
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def read_schedule_frame():
+    with memprofile.stage("read_roster"):
+        return read_published_roster()
+
 @app.route('/api/emergency/call', methods=['POST'])
 def emergency_call():
     if 'nurse_id' not in session:
@@ -929,9 +974,7 @@ def emergency_call():
     
     # Get nurse ward information
     try:
-        with open("csv/nurse_database.json", "r") as f:
-            nurses = json.load(f)
-        nurse_info = next((n for n in nurses if n["id"] == nurse_id), None)
+        nurse_info = directory.snapshot().get(nurse_id)
         ward = nurse_info.get('department', 'Unknown') if nurse_info else 'Unknown'
         role = nurse_info.get('role', 'Nurse') if nurse_info else 'Nurse'
     except:
@@ -951,9 +994,19 @@ def emergency_call():
         "timestamp": datetime.now().isoformat()
     }
     
-    emergency_calls = load_emergency_calls()
-    emergency_calls.append(emergency_call)
-    save_emergency_calls(emergency_calls)
+    with locked(EMERGENCY_FILE):
+        emergency_calls = load_emergency_calls()
+        emergency_calls.append(emergency_call)
+        save_emergency_calls(emergency_calls)
+    record_changes(KIND_EMERGENCY, [emergency_call])
+    # Admins watching the stream get the current shift's best cover candidates with the call
+    try:
+        day, shift = slot_at(datetime.now(), shift_windows())
+        cover = replacement_finder.find(ward, day, shift, exclude=(nurse_id,), limit=5)["candidates"]
+    except Exception as e:
+        print(f"⚠️ Replacement lookup failed: {e}")
+        cover = []
+    bus.publish(EVENT_EMERGENCY_CALL, dict(emergency_call, replacements=cover), ward=ward)
     
     return jsonify({
         "success": True,
@@ -961,6 +1014,50 @@ def emergency_call():
         "call_id": emergency_call["id"]
     })
 
+@app.route('/api/replacements', methods=['GET'])
+def find_replacements():
+    """Ranked cover for a ward/date/shift, or for an absent nurse (?nurse_id=) at a slot or right now."""
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), MAX_PAGE_SIZE)
+        if request.args.get('nurse_id'):
+            result = replacement_finder.for_absence(request.args['nurse_id'], request.args.get('date'),
+                                                    request.args.get('shift'), limit=limit)
+        else:
+            if not all(request.args.get(k) for k in ('ward', 'date', 'shift')):
+                return jsonify({"error": "ward, date and shift (or nurse_id) are required"}), 400
+            result = replacement_finder.find(request.args['ward'], request.args['date'], request.args['shift'],
+                                             grade=request.args.get('grade'), limit=limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+@app.route('/api/availability', methods=['GET'])
+def get_availability():
+    """Free nurses at a slot (?date=&shift=), free for a whole window (?start=&days=), or one nurse's slots."""
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    args = request.args
+    try:
+        days = min(max(int(args.get('days', 7)), 1), 366)
+        if args.get('nurse_id'):
+            if not args.get('start'):
+                return jsonify({"error": "start is required"}), 400
+            return jsonify({"nurse_id": args['nurse_id'], "start": args['start'], "days": days,
+                            **availability.nurse_slots(args['nurse_id'], args['start'], days)})
+        if args.get('date') and args.get('shift'):
+            free = availability.free_at(args['date'], args['shift'], ward=args.get('ward'))
+        elif args.get('start'):
+            free = availability.free_between(args['start'], days, ward=args.get('ward'))
+        else:
+            return jsonify({"error": "date and shift, start, or nurse_id is required"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"ward": args.get('ward'), "free": free, "count": len(free)})
+
 @app.route('/api/emergency/list', methods=['GET'])
 def list_emergency_calls():
     if 'nurse_id' not in session or not session.get('is_admin'):
@@ -985,19 +1082,27 @@ def solve_emergency_call():
     if not call_id:
         return jsonify({"error": "Call ID required"}), 400
     
-    emergency_calls = load_emergency_calls()
-    
-    # Find and update the call status
-    for call in emergency_calls:
-        if call.get('id') == call_id:
-            call['status'] = 'solved'
-            call['solved_at'] = datetime.now().isoformat()
-            call['solved_by'] = session['nurse_id']
-            break
-    else:
-        return jsonify({"error": "Emergency call not found"}), 404
-    
-    save_emergency_calls(emergency_calls)
+    with locked(EMERGENCY_FILE):
+        emergency_calls = load_emergency_calls()
+        
+        # Find and update the call status
+        for call in emergency_calls:
+            if call.get('id') == call_id:
+                call['status'] = 'solved'
+                call['solved_at'] = datetime.now().isoformat()
+                call['solved_by'] = session['nurse_id']
+                solved_call = call
+                break
+        else:
+            return jsonify({"error": "Emergency call not found"}), 404
+        
+        save_emergency_calls(emergency_calls)
+    record_changes(KIND_EMERGENCY, [solved_call])
+    bus.publish(EVENT_EMERGENCY_SOLVED, {
+        "id": call_id,
+        "solved_at": solved_call['solved_at'],
+        "solved_by": solved_call['solved_by']
+    }, ward=solved_call.get('ward'))
     
     return jsonify({
         "success": True,
@@ -1023,10 +1128,17 @@ def submit_swap_request():
         "status": "pending",
         "submitted_at": datetime.now().isoformat()
     }
+    # Pin "Day N" labels to the dated roster columns the nurse was looking at
+    current, desired = swap_matcher.resolve(swap_request)
+    if current and desired:
+        swap_request["current_slot"] = Roster.column(current)
+        swap_request["desired_slot"] = Roster.column(desired)
     
-    swap_requests = load_shift_swaps()
-    swap_requests.append(swap_request)
-    save_shift_swaps(swap_requests)
+    with locked(SWAP_FILE):
+        swap_requests = load_shift_swaps()
+        swap_requests.append(swap_request)
+        save_shift_swaps(swap_requests)
+    record_changes(KIND_SWAP, [swap_request])
     
     return jsonify({
         "success": True,
@@ -1034,6 +1146,116 @@ def submit_swap_request():
         "request_id": swap_request["id"]
     })
 
+@app.route('/api/swap/match', methods=['POST'])
+def match_swap_requests():
+    """Pair every pending swap request with a compatible counterpart in one maximum matching."""
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    dry_run = bool((request.get_json(silent=True) or {}).get('dry_run'))
+    with locked(SWAP_FILE):
+        swap_requests = load_shift_swaps()
+        result = swap_matcher.match(swap_requests)
+        if result["pairs"] and not dry_run:
+            save_shift_swaps(apply_matches(swap_requests, result["pairs"], session['nurse_id']))
+            record_changes(KIND_SWAP, [r for a, b, _, _ in result["pairs"] for r in (a, b)])
+    
+    return jsonify({
+        "success": True,
+        "dry_run": dry_run,
+        "pairs": [{
+            "request_id": a["id"],
+            "nurse_id": a["nurse_id"],
+            "counterpart_request_id": b["id"],
+            "counterpart_nurse_id": b["nurse_id"],
+            "gives": Roster.column(current),
+            "takes": Roster.column(desired)
+        } for a, b, current, desired in result["pairs"]],
+        "unmatched": result["unmatched"],
+        "elapsed_ms": result["elapsed_ms"]
+    })
+
+def record_changes(kind, records):
+    """Append records a write path just saved to the sync change log; a failed append does not fail the write."""
+    snapshot = directory.snapshot()
+    changes = []
+    for r in records:
+        ward = r.get("ward") or (snapshot.get(r.get("nurse_id")) or {}).get('department')
+        changes.append((kind, r.get("nurse_id"), ward, r))
+    try:
+        change_log.record(changes)
+    except OSError as e:
+        print(f"⚠️ Change log append failed: {e}")
+
+def publish_schedule_event():
+    """Announce a newly published roster to every event stream and log its changed cells for /api/sync."""
+    try:
+        snapshot = directory.snapshot()
+        change_log.record_roster(lambda nurse_id: (snapshot.get(nurse_id) or {}).get('department'))
+    except Exception as e:
+        print(f"⚠️ Roster change log failed: {e}")
+    week_start = None
+    if os.path.exists('current_week.txt'):
+        with open('current_week.txt', 'r') as f:
+            week_start = f.read().strip()
+    bus.publish(EVENT_SCHEDULE_PUBLISHED, {
+        "week_start": week_start,
+        "published_by": session.get('nurse_id'),
+        "generated_at": datetime.now().isoformat()
+    })
+
+@app.route('/api/sync', methods=['GET'])
+def sync():
+    """Delta sync: the caller's changed schedule cells, MC and swap updates and emergency calls since `since`.
+
+    Without a cursor (or with one the log no longer covers) the answer is
+    resync=true plus the current cursor: refetch the full lists once, then
+    keep passing the returned cursor back.
+    """
+    if 'nurse_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    since = parse_cursor(request.args.get('since'))
+    if request.args.get('since') not in (None, '') and since is None:
+        return jsonify({"error": "since must be a cursor returned by /api/sync"}), 400
+    nurse_id = session['nurse_id']
+    nurse = directory.snapshot().get(nurse_id) or {}
+    return jsonify(change_log.changes_since(since, nurse_id=nurse_id, ward=nurse.get('department'),
+                                            is_admin=session.get('is_admin', False)))
+
+@app.route('/api/events', methods=['GET'])
+def event_stream_route():
+    """Server-sent event stream of emergency and roster changes.
+
+    Admins receive emergency calls and roster events, optionally filtered with
+    ?ward=ICU; other nurses only receive roster events. Reconnecting clients
+    resume from the Last-Event-ID header (or ?last_event_id=).
+    """
+    if 'nurse_id' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    ward = request.args.get('ward') or None
+    if session.get('is_admin'):
+        types = None
+    else:
+        types = {EVENT_SCHEDULE_PUBLISHED}
+    last_id = parse_cursor(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    
+    if not SSE_ENABLED:
+        return jsonify({"error": "Live events are disabled (SSE_ENABLED=0)"}), 404
+    # Each stream holds a worker thread until the client disconnects
+    if not bus.open_stream():
+        return Response(f"retry: {RETRY_MILLISECONDS}\n\n", status=503, mimetype='text/event-stream',
+                        headers={"Retry-After": str(-(-RETRY_MILLISECONDS // 1000))})
+    response = Response(event_stream(bus, last_id, ward=ward, types=types),
+                        mimetype='text/event-stream',
+                        headers={
+                            "Cache-Control": "no-cache",
+                            "X-Accel-Buffering": "no"
+                        })
+    response.call_on_close(bus.close_stream)
+    return response
+
 @app.route('/api/s3/restore', methods=['POST'])
 def restore_from_s3():
     if 'nurse_id' not in session or not session.get('is_admin'):
@@ -1044,8 +1266,18 @@ def restore_from_s3():
         admin_id = session.get('nurse_id', 'Unknown')
         print(f"📥 S3 RESTORE initiated by {admin_name} ({admin_id})")
         
+        # Optional point-in-time / single-file restore: {"backup_id"} or {"as_of": ISO time}, plus {"paths": [...]}
+        data = request.get_json(silent=True) or {}
+        as_of = None
+        if data.get('as_of'):
+            try:
+                as_of = datetime.fromisoformat(data['as_of'])
+            except ValueError:
+                return jsonify({"error": "as_of must be an ISO date/time"}), 400
+        paths = data.get('paths') or ([data['path']] if data.get('path') else None)
+        
         from s3_operations import restore_from_s3
-        success, message = restore_from_s3()
+        success, message = restore_from_s3(backup_id=data.get('backup_id'), paths=paths, as_of=as_of)
         
         if success:
             print(f"✅ S3 RESTORE SUCCESS: {message}")
@@ -1078,6 +1310,89 @@ def manual_backup_to_s3():
     except Exception as e:
         return jsonify({"error": f"S3 backup error: {str(e)}"}), 500
 
+@app.route('/api/s3/status', methods=['GET'])
+def s3_backup_status():
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    from s3_operations import background_backup
+    last = background_backup.last_result
+    return jsonify({
+        "running": background_backup.running,
+        "last_success": last[0] if last else None,
+        "last_message": last[1] if last else None,
+        "last_finished_at": background_backup.last_finished_at
+    })
+
+@app.route('/api/s3/backups', methods=['GET'])
+def list_s3_backups():
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    try:
+        from s3_operations import get_s3_client
+        from backup_catalog import load_or_rebuild
+        s3_client = get_s3_client()
+        if s3_client is None:
+            return jsonify({"error": "AWS credentials not configured"}), 500
+        catalog = load_or_rebuild(s3_client)
+        return jsonify({
+            "backups": [{
+                "backup_id": s['backup_id'],
+                "created_at": s['created_at'],
+                "files": len(s['files']),
+                "total_size": s['total_size']
+            } for s in reversed(catalog.snapshots)]
+        })
+    except Exception as e:
+        return jsonify({"error": f"S3 catalog error: {str(e)}"}), 500
+
+@app.route('/api/s3/prune', methods=['POST'])
+def prune_s3_backups():
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    try:
+        from s3_operations import get_s3_client
+        from backup_catalog import prune_backups
+        s3_client = get_s3_client()
+        if s3_client is None:
+            return jsonify({"error": "AWS credentials not configured"}), 500
+        dry_run = bool((request.get_json(silent=True) or {}).get('dry_run'))
+        result = prune_backups(s3_client, dry_run=dry_run)
+        print(f"🧹 S3 PRUNE by {session.get('nurse_id')}: {len(result['expired_snapshots'])} snapshot(s), "
+              f"{result['objects_to_delete']} object(s){' (dry run)' if dry_run else ''}")
+        return jsonify({"success": True, "dry_run": dry_run, **result})
+    except Exception as e:
+        return jsonify({"error": f"S3 prune error: {str(e)}"}), 500
+
+@app.route('/api/solver/runs', methods=['GET'])
+def solver_runs():
+    """Solver run history (newest first) with solve-time trends by roster size and seed."""
+    if 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    
+    try:
+        seed = int(request.args['seed']) if request.args.get('seed') else None
+        limit = min(max(int(request.args.get('limit', 50)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"error": "seed and limit must be integers"}), 400
+    return jsonify(solver_history.query(status=request.args.get('status'), seed=seed,
+                                        since=request.args.get('since'), limit=limit))
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text exposition of this worker's request and stage metrics."""
+    if METRICS_TOKEN:
+        if request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+            return jsonify({"error": "Invalid metrics token"}), 401
+    elif 'nurse_id' not in session or not session.get('is_admin'):
+        return jsonify({"error": "Admin access required"}), 403
+    if not metrics.enabled:
+        return jsonify({"error": "Metrics are disabled (METRICS_ENABLED=0)"}), 404
+    
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/admin/reset', methods=['POST'])
 def reset_data():
     if 'nurse_id' not in session or not session.get('is_admin'):
@@ -1089,10 +1404,12 @@ def reset_data():
         print(f"🔄 DATA RESET initiated by {admin_name} ({admin_id})")
         
         # Reset attendance
-        save_attendance({})
+        with locked(ATTENDANCE_FILE):
+            save_attendance({})
         
         # Reset emergency calls
-        save_emergency_calls([])
+        with locked(EMERGENCY_FILE):
+            save_emergency_calls([])
         
         print("✅ RESET COMPLETE: Attendance and Emergency calls cleared")
         
@@ -1104,6 +1421,36 @@ def reset_data():
         print(f"❌ RESET FAILED: {str(e)}")
         return jsonify({"error": f"Reset failed: {str(e)}"}), 500
 
+def _warm_models():
+    # /api/staffing/risk is the only route here that uses the demand models (mobile_api is not registered)
+    from staffing_risk import staffing_risk
+    staffing_risk.demand_model()
+
+def warm_state():
+    """Build the read-mostly caches up front: directory, roster, reconciliation, availability, replacements, models.
+
+    gunicorn.conf.py calls this in the master when preload_app is on, so
+    forked workers start warm and share these pages copy-on-write. Every
+    cache is keyed by file versions, so a worker still rebuilds its own
+    copy once the underlying files change.
+    """
+    steps = [("nurse_directory", directory.snapshot), ("shift_windows", shift_windows),
+             ("roster", swap_matcher.roster), ("schedule_store", schedule_store.index),
+             ("reconciliation", reconciler.refresh),
+             ("availability", availability.index),
+             ("replacements", replacement_finder.index),
+             ("models", _warm_models)]
+    timings = {}
+    for name, build in steps:
+        started = time.perf_counter()
+        try:
+            build()
+        except Exception as e:
+            print(f"⚠️ Warm-up step {name} failed: {e}")
+        timings[name] = round(time.perf_counter() - started, 3)
+    print(f"🔥 Warm state ready: {timings}")
+    return timings
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') != 'production'
@@ -0,0 +1,308 @@
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from lazy_imports import lazy_import
+from nurse_directory import directory
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ---------------- Config ----------------
+ATTENDANCE_FILE = "data/attendance.json"
+CONFIG_FILE = "csv/hospital_config.json"
+LATE_GRACE_MINUTES = int(os.environ.get('LATE_GRACE_MINUTES', 5))
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+GROUPS = ("day", "week", "month")
+
+DAILY_COLUMNS = ["nurse_id", "date", "week", "checkin", "checkout", "status", "hours", "shift", "shift_source",
+                 "late_minutes", "late"]
+
+
+def _file_version(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def find_open_checkin(records, now):
+    """Date key of the check-in a check-out at `now` closes: today's, or yesterday's for a Night shift."""
+    for day in (now.date(), now.date() - timedelta(days=1)):
+        record = records.get(day.strftime("%Y-%m-%d"), {})
+        if record.get('checkin') and not record.get('checkout'):
+            return day.strftime("%Y-%m-%d")
+    return None
+
+
+def load_shift_starts(path=CONFIG_FILE):
+    """{shift: start minute of day} from hospital_config.json."""
+    with open(path, 'r') as f:
+        shifts = json.load(f).get("shifts", {})
+    starts = {}
+    for name, times in shifts.items():
+        hours, minutes = times["start"].split(":")[:2]
+        starts[name] = int(hours) * 60 + int(minutes)
+    return starts
+
+
+def _minutes(values):
+    """'HH:MM[:SS]' strings -> minutes past midnight as floats, NaN when missing."""
+    return pd.to_timedelta(values, errors='coerce').dt.total_seconds().to_numpy() / 60
+
+
+def build_daily(attendance, shift_starts, grace=LATE_GRACE_MINUTES, rostered=None):
+    """One row per nurse per day with hours worked, shift and lateness, all computed column-wise.
+
+    Check-outs earlier than the check-in are overnight (Night shift) and wrap
+    past midnight. `rostered` (nurse_id, date, shift rows, e.g. from the
+    published roster) gives each check-in the shift the nurse was rostered
+    for that day; days with none fall back to the closest configured shift
+    start (circularly), a guess that shift_source marks as "nearest".
+    Minutes past the shift's start beyond `grace` count as late.
+    """
+    records = [(nurse_id, day, r.get('checkin'), r.get('checkout'), r.get('status'))
+               for nurse_id, days in attendance.items() for day, r in days.items()]
+    df = pd.DataFrame(records, columns=["nurse_id", "date", "checkin", "checkout", "status"])
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d", errors='coerce')
+    df = df.dropna(subset=["date"]).reset_index(drop=True)
+    df["week"] = df["date"] - pd.to_timedelta(df["date"].dt.weekday, unit="D")
+
+    checkin = _minutes(df["checkin"].astype("string"))
+    checkout = _minutes(df["checkout"].astype("string"))
+    df["hours"] = np.nan_to_num(np.mod(checkout - checkin, 24 * 60) / 60)
+
+    names = np.array(list(shift_starts), dtype=object)
+    starts = np.array(list(shift_starts.values()), dtype=float)
+    # Signed distance from every check-in to every shift start, wrapped into [-12h, 12h)
+    offset = np.mod(checkin[:, None] - starts[None, :] + 720, 24 * 60) - 720
+    distance = np.where(np.isnan(offset), np.inf, np.abs(offset))
+    chosen = np.argmin(distance, axis=1)
+    from_roster = np.zeros(len(df), dtype=bool)
+    if rostered is not None and len(rostered) and len(df):
+        duty = rostered[rostered["shift"].isin(list(names))]
+        duty = df[["nurse_id", "date"]].reset_index().merge(
+            duty.assign(nurse_id=duty["nurse_id"].astype(str), date=pd.to_datetime(duty["date"])),
+            on=["nurse_id", "date"])
+        if len(duty):
+            column = pd.Index(names).get_indexer(duty["shift"])
+            # More than one rostered shift that day: the one the check-in is closest to
+            duty = duty.assign(column=column, distance=distance[duty["index"].to_numpy(), column])
+            duty = duty.sort_values("distance", kind="stable").drop_duplicates("index")
+            rows = duty["index"].to_numpy()
+            chosen[rows] = duty["column"].to_numpy()
+            from_roster[rows] = True
+    late = offset[np.arange(len(df)), chosen]
+    has_checkin = ~np.isnan(checkin)
+    df["shift"] = np.where(has_checkin, names[chosen], None)
+    df["shift_source"] = np.where(has_checkin, np.where(from_roster, "roster", "nearest"), None)
+    df["late_minutes"] = np.where(has_checkin & (late > grace), late, 0.0)
+    df["late"] = df["late_minutes"] > 0
+    return df[DAILY_COLUMNS]
+
+
+def rostered_shifts(config_path=CONFIG_FILE):
+    """(nurse_id, date, shift) for every rostered shift in the published roster."""
+    from reconciliation import expand_roster, load_roster, shift_windows   # reconciliation imports this module
+    shifts = expand_roster(load_roster(), shift_windows(config_path))
+    return pd.DataFrame({"nurse_id": shifts["nurse_id"], "date": shifts["start"].dt.normalize(),
+                         "shift": shifts["shift"]})
+
+
+def open_week_start():
+    """Monday of the current week."""
+    today = date.today()
+    return today - timedelta(days=today.weekday())
+
+
+def split_attendance(attendance, cutoff):
+    """({nurse_id: {day: record}} before the ISO date `cutoff`, the same from `cutoff` on)."""
+    closed, recent = {}, {}
+    for nurse_id, days in attendance.items():
+        for day, record in days.items():
+            (closed if day < cutoff else recent).setdefault(nurse_id, {})[day] = record
+    return closed, recent
+
+
+def week_fingerprints(daily):
+    """{week start: hash of that week's rows}; sums, so rows split across frames add up."""
+    if not len(daily):
+        return {}
+    hashes = pd.util.hash_pandas_object(daily.drop(columns="week"), index=False)
+    return {week: int(value) for week, value in hashes.groupby(daily["week"]).sum().items()}
+
+
+def rollup_weekly(daily, max_weekly_hours):
+    """Per nurse per week: hours, days worked, late check-ins and overtime beyond max_weekly_hours."""
+    weekly = daily.groupby(["nurse_id", "week"], as_index=False).agg(
+        hours=("hours", "sum"),
+        days_worked=("checkin", "count"),
+        late_checkins=("late", "sum"),
+        late_minutes=("late_minutes", "sum"),
+    )
+    weekly["overtime_hours"] = (weekly["hours"] - max_weekly_hours).clip(lower=0)
+    return weekly
+
+
+class AttendanceAnalytics:
+    """Columnar attendance analytics with per-week rollups.
+
+    The per-day frame is split at the open week: rows before it (less the
+    Sunday whose Night check-out lands on Monday) are parsed once and reused
+    while their records, the shift config and the roster are unchanged, so a
+    check-in only rebuilds the open week's rows. Rollups for closed weeks are
+    cached and reused while that week's rows hash the same; the open
+    (current) week is always recomputed.
+    """
+
+    def __init__(self, path=ATTENDANCE_FILE, config_path=CONFIG_FILE):
+        self.path = path
+        self.config_path = config_path
+        self._version = None
+        self._daily = None
+        self._fingerprints = {}
+        self._closed = None   # (context, closed records, their rows, their week fingerprints, rostered shifts)
+        self._weeks = {}   # week start -> (fingerprint, weekly rollup)
+        self._lock = threading.Lock()
+
+    @property
+    def max_weekly_hours(self):
+        from scheduling_ai import MAX_WEEKLY_HOURS
+        return MAX_WEEKLY_HOURS
+
+    def daily(self):
+        """The per-day frame; only the open week's rows are rebuilt when just the attendance file changed."""
+        from reconciliation import roster_version
+        version = (_file_version(self.path), _file_version(self.config_path), roster_version())
+        with self._lock:
+            if self._daily is not None and version == self._version:
+                return self._daily
+            previous = self._closed
+        attendance = {}
+        if version[0] is not None:
+            with open(self.path, 'r') as f:
+                attendance = json.load(f)
+        cutoff = (open_week_start() - timedelta(days=1)).isoformat()
+        closed, recent = split_attendance(attendance, cutoff)
+        context = (version[1], version[2], cutoff)
+        shift_starts = load_shift_starts(self.config_path)
+        if previous is None or previous[0] != context or previous[1] != closed:
+            rostered = rostered_shifts(self.config_path)
+            closed_daily = build_daily(closed, shift_starts, rostered=rostered)
+            previous = (context, closed, closed_daily, week_fingerprints(closed_daily), rostered)
+        _, _, closed_daily, fingerprints, rostered = previous
+        recent_daily = build_daily(recent, shift_starts, rostered=rostered)
+        daily = pd.concat([closed_daily, recent_daily], ignore_index=True) if len(closed_daily) else recent_daily
+        fingerprints = dict(fingerprints)
+        for week, value in week_fingerprints(recent_daily).items():
+            fingerprints[week] = (fingerprints.get(week, 0) + value) % (1 << 64)
+        with self._lock:
+            self._version, self._daily, self._fingerprints, self._closed = version, daily, fingerprints, previous
+        return daily
+
+    def weekly(self, weeks):
+        """Weekly rollups for the given week starts, from cache for closed weeks."""
+        daily = self.daily()
+        open_week = pd.Timestamp(open_week_start())
+        frames, missing = [], []
+        with self._lock:
+            for week in weeks:
+                cached = self._weeks.get(week)
+                if week != open_week and cached and cached[0] == self._fingerprints.get(week):
+                    frames.append(cached[1])
+                else:
+                    missing.append(week)
+        if missing:
+            computed = rollup_weekly(daily[daily["week"].isin(missing)], self.max_weekly_hours)
+            frames.append(computed)
+            with self._lock:
+                for week, rollup in computed.groupby("week"):
+                    if week != open_week and week in self._fingerprints:
+                        self._weeks[week] = (self._fingerprints[week], rollup)
+        return pd.concat(frames, ignore_index=True) if frames else rollup_weekly(daily.iloc[:0], 0)
+
+    def report(self, group="week", nurse_id=None, ward=None, start=None, end=None,
+               page=1, per_page=DEFAULT_PAGE_SIZE):
+        """Filtered, paginated hours/overtime/lateness rows grouped by day, week or month."""
+        if group not in GROUPS:
+            raise ValueError(f"group must be one of {', '.join(GROUPS)}")
+        page = max(int(page), 1)
+        per_page = min(max(int(per_page), 1), MAX_PAGE_SIZE)
+        start = pd.Timestamp(start) if start else None
+        end = pd.Timestamp(end) if end else None
+
+        snapshot = directory.snapshot()
+        daily = self.daily()
+        mask = np.ones(len(daily), dtype=bool)
+        if nurse_id:
+            mask &= (daily["nurse_id"] == nurse_id).to_numpy()
+        if ward:
+            mask &= daily["nurse_id"].isin([str(n["id"]) for n in snapshot.in_ward(ward)]).to_numpy()
+        if start is not None:
+            mask &= (daily["date"] >= start).to_numpy()
+        if end is not None:
+            mask &= (daily["date"] <= end).to_numpy()
+        selected = daily[mask]
+
+        if group == "day":
+            rows = selected.drop(columns="week").rename(columns={"date": "period"})
+        elif group == "month":
+            month = selected["date"].dt.to_period("M").dt.start_time
+            rows = selected.assign(period=month).groupby(["nurse_id", "period"], as_index=False).agg(
+                hours=("hours", "sum"),
+                days_worked=("checkin", "count"),
+                late_checkins=("late", "sum"),
+                late_minutes=("late_minutes", "sum"),
+            )
+        else:
+            # Whole weeks come from the rollup cache; weeks cut by start/end are rolled up from the filtered days
+            weeks = selected["week"].unique()
+            whole = [w for w in weeks if (start is None or w >= start) and (end is None or w + timedelta(days=6) <= end)]
+            rollup = self.weekly(whole)
+            rollup = rollup[rollup["nurse_id"].isin(selected["nurse_id"].unique())]
+            partial = selected[~selected["week"].isin(whole)]
+            if len(partial):
+                rollup = pd.concat([rollup, rollup_weekly(partial, self.max_weekly_hours)], ignore_index=True)
+            rows = rollup.rename(columns={"week": "period"})
+
+        rows = rows.sort_values(["period", "nurse_id"], ascending=[False, True])
+        total = len(rows)
+        page_rows = rows.iloc[(page - 1) * per_page:page * per_page]
+        return {
+            "group": group,
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "pages": -(-total // per_page),
+            "totals": {
+                "nurses": int(selected["nurse_id"].nunique()),
+                "hours": round(float(selected["hours"].sum()), 2),
+                "overtime_hours": round(float(rows["overtime_hours"].sum()), 2) if "overtime_hours" in rows else None,
+                "late_checkins": int(selected["late"].sum()),
+            },
+            "rows": [self._row(r, snapshot) for r in page_rows.to_dict("records")],
+        }
+
+    @staticmethod
+    def _row(row, snapshot):
+        nurse = snapshot.get(row["nurse_id"]) or {}
+        out = {"nurse_id": row["nurse_id"], "name": nurse.get("name"), "ward": nurse.get("department")}
+        for key, value in row.items():
+            if key == "nurse_id":
+                continue
+            if isinstance(value, (pd.Timestamp, datetime)):
+                value = value.strftime("%Y-%m-%d")
+            elif value is None or value is pd.NA or (isinstance(value, (float, np.floating)) and np.isnan(value)):
+                value = None
+            elif isinstance(value, (float, np.floating)):
+                value = round(float(value), 2)
+            elif isinstance(value, (np.integer, np.bool_)):
+                value = value.item()
+            out[key] = value
+        return out
+
+
+analytics = AttendanceAnalytics()
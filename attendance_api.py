@@ -1,9 +1,10 @@
 from flask import Flask, request, jsonify, session
 from flask_cors import CORS
-import json
-import os
 from datetime import datetime, timedelta
 from scheduling_ai import load_models, predict_next_week, schedule_nurses_optimized
+from nurse_directory import directory
+from file_lock import locked, read_json, write_json
+from attendance_analytics import analytics, find_open_checkin, DEFAULT_PAGE_SIZE
 import pandas as pd
 
 app = Flask(__name__)
@@ -13,16 +14,12 @@ CORS(app, supports_credentials=True)
 ATTENDANCE_FILE = "data/attendance.json"
 ADMIN_IDS = ["admin", "1001"]  # Admin nurse IDs
 
+# Same file as app.py: saves replace it atomically, load -> modify -> save runs under locked()
 def load_attendance():
-    if os.path.exists(ATTENDANCE_FILE):
-        with open(ATTENDANCE_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+    return read_json(ATTENDANCE_FILE, dict)
 
 def save_attendance(data):
-    os.makedirs("data", exist_ok=True)
-    with open(ATTENDANCE_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_json(ATTENDANCE_FILE, data)
 
 @app.route('/api/login', methods=['POST'])
 def login():
@@ -30,10 +27,7 @@ def login():
     nurse_id = data.get('nurse_id')
     
     try:
-        with open("csv/nurse_database.json", "r") as f:
-            nurses = json.load(f)
-        
-        nurse = next((n for n in nurses if str(n["id"]) == str(nurse_id)), None)
+        nurse = directory.snapshot().get(nurse_id)
         if nurse:
             session['nurse_id'] = nurse_id
             session['nurse_name'] = nurse.get('name', f'Nurse {nurse_id}')
@@ -67,17 +61,18 @@ def checkin():
     date_str = now.strftime("%Y-%m-%d")
     time_str = now.strftime("%H:%M:%S")
     
-    attendance = load_attendance()
-    if nurse_id not in attendance:
-        attendance[nurse_id] = {}
-    
-    if date_str not in attendance[nurse_id]:
-        attendance[nurse_id][date_str] = {}
-    
-    attendance[nurse_id][date_str]['checkin'] = time_str
-    attendance[nurse_id][date_str]['status'] = 'checked_in'
-    
-    save_attendance(attendance)
+    with locked(ATTENDANCE_FILE):
+        attendance = load_attendance()
+        if nurse_id not in attendance:
+            attendance[nurse_id] = {}
+        
+        if date_str not in attendance[nurse_id]:
+            attendance[nurse_id][date_str] = {}
+        
+        attendance[nurse_id][date_str]['checkin'] = time_str
+        attendance[nurse_id][date_str]['status'] = 'checked_in'
+        
+        save_attendance(attendance)
     
     return jsonify({
         "success": True,
@@ -95,24 +90,25 @@ def checkout():
     date_str = now.strftime("%Y-%m-%d")
     time_str = now.strftime("%H:%M:%S")
     
-    attendance = load_attendance()
-    if nurse_id not in attendance or date_str not in attendance[nurse_id]:
-        return jsonify({"error": "No check-in record found"}), 400
-    
-    checkin_time = attendance[nurse_id][date_str].get('checkin')
-    if not checkin_time:
-        return jsonify({"error": "No check-in record found"}), 400
-    
-    attendance[nurse_id][date_str]['checkout'] = time_str
-    attendance[nurse_id][date_str]['status'] = 'checked_out'
-    
-    # Calculate hours worked
-    checkin_dt = datetime.strptime(f"{date_str} {checkin_time}", "%Y-%m-%d %H:%M:%S")
-    checkout_dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S")
-    hours_worked = (checkout_dt - checkin_dt).total_seconds() / 3600
-    attendance[nurse_id][date_str]['hours_worked'] = round(hours_worked, 2)
-    
-    save_attendance(attendance)
+    with locked(ATTENDANCE_FILE):
+        attendance = load_attendance()
+        # A Night shift (23:00-07:00) checks out the day after it checked in
+        checkin_date = find_open_checkin(attendance.get(nurse_id, {}), now)
+        if not checkin_date:
+            return jsonify({"error": "No check-in record found"}), 400
+        
+        record = attendance[nurse_id][checkin_date]
+        record['checkout'] = time_str
+        record['status'] = 'checked_out'
+        if checkin_date != date_str:
+            record['checkout_date'] = date_str
+        
+        # Calculate hours worked
+        checkin_dt = datetime.strptime(f"{checkin_date} {record['checkin']}", "%Y-%m-%d %H:%M:%S")
+        hours_worked = (now.replace(microsecond=0) - checkin_dt).total_seconds() / 3600
+        record['hours_worked'] = round(hours_worked, 2)
+        
+        save_attendance(attendance)
     
     return jsonify({
         "success": True,
@@ -152,8 +148,7 @@ def generate_schedule():
         models = load_models()
         df = pd.read_csv("dataset/covid_dataset.csv", parse_dates=["Date"], dayfirst=True)
         
-        with open("csv/nurse_database.json", "r") as f:
-            nurses = json.load(f)
+        nurses = list(directory.snapshot().nurses)
         
         week_demand = predict_next_week(df, models, days=days)
         wards = ["ED", "GW", "ICU"]
@@ -184,8 +179,19 @@ def attendance_report():
     if 'nurse_id' not in session or not session.get('is_admin'):
         return jsonify({"error": "Admin access required"}), 403
     
-    attendance = load_attendance()
-    return jsonify({"attendance": attendance})
+    try:
+        report = analytics.report(
+            group=request.args.get('group', 'week'),
+            nurse_id=request.args.get('nurse_id'),
+            ward=request.args.get('ward'),
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            page=request.args.get('page', 1),
+            per_page=request.args.get('per_page', DEFAULT_PAGE_SIZE)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(report)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
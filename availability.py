@@ -0,0 +1,204 @@
+import json
+import threading
+from datetime import date, timedelta
+
+from attendance_analytics import CONFIG_FILE, _file_version
+from mc_store import store as mc_store, window_dates
+from nurse_directory import directory
+from reconciliation import ROSTER_CSV, ROSTER_EXCEL, shift_windows
+from swap_matcher import can_work_ward, matcher as swap_matcher
+
+# ---------------- Config ----------------
+SWAP_FILE = "data/shift_swaps.json"
+EPOCH = date(2024, 1, 1)   # a Monday; bit 0 is its first shift, so slot bits are stable across rosters
+
+
+class AvailabilityIndex:
+    """One integer bitset per nurse over (day x shift) slots, in two layers.
+
+    `rostered` holds the published roster with matched swaps applied;
+    `absent` holds approved MC days (every shift of the day). A slot's bit
+    is day_offset * shifts_per_day + shift_index counted from EPOCH, so
+    "free at slot S" is one AND and "free all week" is one AND against a
+    precomputed week mask.
+    """
+
+    def __init__(self, shifts):
+        self.shifts = list(shifts)
+        self.per_day = len(self.shifts)
+        self.rostered = {}
+        self.absent = {}
+        self.generation = 0
+
+    # ---------------- slot arithmetic ----------------
+    def slot(self, day, shift):
+        if shift not in self.shifts:
+            raise ValueError(f"shift must be one of {', '.join(self.shifts)}")
+        offset = (date.fromisoformat(day) - EPOCH).days
+        if offset < 0:
+            raise ValueError(f"dates before {EPOCH.isoformat()} are not tracked")
+        return offset * self.per_day + self.shifts.index(shift)
+
+    def mask(self, start, days=1):
+        """Bits for `days` whole days from `start`."""
+        first = self.slot(start, self.shifts[0])
+        return ((1 << (days * self.per_day)) - 1) << first
+
+    def slots(self, bits):
+        """Decode bits into [(date, shift)]."""
+        out = []
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            day, shift = divmod(index, self.per_day)
+            out.append(((EPOCH + timedelta(days=day)).isoformat(), self.shifts[shift]))
+            bits ^= low
+        return out
+
+    # ---------------- updates ----------------
+    def replace_layer(self, layer, bits_by_nurse):
+        """Swap in a rebuilt layer, touching only nurses whose bits changed. Returns their ids."""
+        current = getattr(self, layer)
+        changed = {n for n in current.keys() | bits_by_nurse.keys()
+                   if current.get(n, 0) != bits_by_nurse.get(n, 0)}
+        for nurse_id in changed:
+            if bits_by_nurse.get(nurse_id):
+                current[nurse_id] = bits_by_nurse[nurse_id]
+            else:
+                current.pop(nurse_id, None)
+        if changed:
+            self.generation += 1
+        return changed
+
+    # ---------------- queries ----------------
+    def busy(self, nurse_id):
+        return self.rostered.get(nurse_id, 0) | self.absent.get(nurse_id, 0)
+
+    def is_free(self, nurse_id, day, shift):
+        return not self.busy(nurse_id) >> self.slot(day, shift) & 1
+
+    def free(self, candidates, mask):
+        """Candidates with nothing rostered and no MC anywhere in `mask`."""
+        return [n for n in candidates if not self.busy(n) & mask]
+
+
+class Availability:
+    """Keeps an AvailabilityIndex in step with the roster, swap and MC files.
+
+    Each layer is rebuilt only when its own sources change on disk, and
+    only the nurses whose bits differ are replaced.
+    """
+
+    def __init__(self, config_path=CONFIG_FILE, swap_path=SWAP_FILE):
+        self.config_path = config_path
+        self.swap_path = swap_path
+        self._versions = {}
+        self._index = None
+        self._ward_members = (None, {})   # (directory version, {ward: ids})
+        self._lock = threading.Lock()
+
+    def index(self):
+        with self._lock:
+            if self._index is None:
+                self._index = AvailabilityIndex(shift_windows(self.config_path))
+            index = self._index
+            roster_version = (_file_version(ROSTER_CSV), _file_version(ROSTER_EXCEL),
+                              _file_version(self.config_path), _file_version(self.swap_path))
+            if self._versions.get("rostered") != roster_version:
+                index.replace_layer("rostered", self._roster_bits(index))
+                self._versions["rostered"] = roster_version
+            mc_version = _file_version(mc_store.path)
+            if self._versions.get("absent") != mc_version:
+                index.replace_layer("absent", self._absence_bits(index))
+                self._versions["absent"] = mc_version
+            return index
+
+    def _roster_bits(self, index):
+        duty = swap_matcher.duty(self._matched_swaps())
+        bits = {}
+        for nurse_id, slots in duty.items():
+            value = 0
+            for day, shift in slots:
+                if date.fromisoformat(day) >= EPOCH:
+                    value |= 1 << index.slot(day, shift)
+            bits[nurse_id] = value
+        return bits
+
+    def _matched_swaps(self):
+        try:
+            with open(self.swap_path, 'r') as f:
+                return [r for r in json.load(f) if r.get("status") == "matched"]
+        except FileNotFoundError:
+            return []
+
+    def _absence_bits(self, index):
+        bits = {}
+        for window in mc_store.unavailability():
+            dates = window_dates(window)
+            if dates is None:
+                continue
+            start = max(dates[0], EPOCH)
+            days = (dates[1] - start).days + 1
+            if days > 0:
+                bits[window["nurse_id"]] = bits.get(window["nurse_id"], 0) | index.mask(start.isoformat(), days)
+        return bits
+
+    def ward_members(self, ward):
+        snapshot = directory.snapshot()
+        version, members = self._ward_members
+        if version != snapshot.version:
+            members = {}
+            self._ward_members = (snapshot.version, members)
+        if ward not in members:
+            members[ward] = tuple(str(n["id"]) for n in snapshot.nurses if can_work_ward(n, ward))
+        return members[ward]
+
+    def _candidates(self, ward):
+        if ward:
+            return self.ward_members(ward)
+        return tuple(str(n["id"]) for n in directory.snapshot().nurses)
+
+    def free_at(self, day, shift, ward=None):
+        """Nurses who can work `ward` and are neither rostered nor on MC at that slot."""
+        index = self.index()
+        return index.free(self._candidates(ward), 1 << index.slot(day, shift))
+
+    def free_between(self, start, days=7, ward=None):
+        """Nurses with no roster duty and no MC on any day of [start, start + days)."""
+        index = self.index()
+        return index.free(self._candidates(ward), index.mask(start, days))
+
+    def nurse_slots(self, nurse_id, start, days=7):
+        """{"rostered": [...], "absent": [...]} slots of one nurse in the window."""
+        index = self.index()
+        window = index.mask(start, days)
+        return {
+            "rostered": index.slots(index.rostered.get(nurse_id, 0) & window),
+            "absent": index.slots(index.absent.get(nurse_id, 0) & window),
+        }
+
+    def duty(self, start, days):
+        """{nurse_id: [(date, shift)]} rostered in [start, start + days), with matched swaps applied."""
+        index = self.index()
+        window = index.mask(start, days)
+        return {nurse_id: index.slots(bits & window) for nurse_id, bits in index.rostered.items() if bits & window}
+
+    def blocked_slots(self, nurse_ids, start_date, days, shifts):
+        """{nurse_id: {(day offset, shift index)}} a new roster from start_date must leave empty (approved MCs)."""
+        index = self.index()
+        start = start_date.strftime('%Y-%m-%d') if hasattr(start_date, 'strftime') else str(start_date)
+        window = index.mask(start, days)
+        first = index.slot(start, index.shifts[0])
+        blocked = {}
+        for nurse_id in nurse_ids:
+            bits = index.absent.get(str(nurse_id), 0) & window
+            while bits:
+                low = bits & -bits
+                day, shift = divmod(low.bit_length() - 1 - first, index.per_day)
+                if index.shifts[shift] in shifts:
+                    blocked.setdefault(nurse_id, set()).add((day, shifts.index(index.shifts[shift])))
+                bits ^= low
+        return blocked
+
+
+availability = Availability()
@@ -0,0 +1,292 @@
+import bisect
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+
+from s3_operations import (BUCKET_NAME, MANIFEST_NAME, OBJECTS_PREFIX, UPLOAD_WORKERS, iter_objects,
+                           list_backup_ids, load_manifest)
+
+# ---------------- Config ----------------
+CATALOG_KEY = 'catalog.json'
+DELETE_BATCH_SIZE = 1000   # S3 DeleteObjects limit
+# Unreferenced objects younger than this may belong to a backup still in flight
+GC_GRACE_SECONDS = int(os.environ.get('S3_GC_GRACE_SECONDS', 3600))
+
+# Grandfather-father-son retention: newest snapshot in each of the last N hours/days/weeks
+RETENTION = {
+    "hourly": int(os.environ.get('S3_KEEP_HOURLY', 24)),
+    "daily": int(os.environ.get('S3_KEEP_DAILY', 7)),
+    "weekly": int(os.environ.get('S3_KEEP_WEEKLY', 4)),
+}
+
+
+def backup_time(backup_id):
+    """backup_20250922_143000 -> datetime(2025, 9, 22, 14, 30)"""
+    return datetime.strptime(backup_id.replace('backup_', ''), '%Y%m%d_%H%M%S')
+
+
+def _period(when, kind):
+    if kind == "hourly":
+        return when.strftime('%Y%m%d%H')
+    if kind == "daily":
+        return when.strftime('%Y%m%d')
+    year, week, _ = when.isocalendar()
+    return f"{year}W{week:02d}"
+
+
+class BackupCatalog:
+    """Index of every snapshot's files, sizes and hashes, stored as one object next to the backups.
+
+    Snapshots are kept sorted by time, so "latest" is the last entry and
+    "as of T" is one bisect, without listing the bucket.
+    """
+
+    def __init__(self, snapshots=()):
+        self.snapshots = sorted(snapshots, key=lambda s: s['backup_id'])
+        self._ids = [s['backup_id'] for s in self.snapshots]
+
+    # ---------------- persistence ----------------
+    @classmethod
+    def load(cls, s3_client):
+        """Read the catalog object; returns None when the bucket has no catalog yet."""
+        try:
+            body = s3_client.get_object(Bucket=BUCKET_NAME, Key=CATALOG_KEY)['Body'].read()
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return cls(json.loads(body).get('snapshots', []))
+
+    @classmethod
+    def rebuild(cls, s3_client):
+        """Recreate the catalog from the snapshot manifests (and legacy per-file snapshots)."""
+        manifests = load_manifests(s3_client, list_backup_ids(s3_client))
+        return cls(_entry(m) for m in manifests.values() if m)
+
+    def save(self, s3_client):
+        body = json.dumps({"updated_at": datetime.now().isoformat(), "snapshots": self.snapshots})
+        s3_client.put_object(Bucket=BUCKET_NAME, Key=CATALOG_KEY, Body=body.encode('utf-8'),
+                             ContentType='application/json')
+
+    # ---------------- lookups ----------------
+    def __len__(self):
+        return len(self.snapshots)
+
+    def add(self, manifest):
+        entry = _entry(manifest)
+        i = bisect.bisect_left(self._ids, entry['backup_id'])
+        if i < len(self._ids) and self._ids[i] == entry['backup_id']:
+            self.snapshots[i] = entry
+        else:
+            self.snapshots.insert(i, entry)
+            self._ids.insert(i, entry['backup_id'])
+        return entry
+
+    def latest(self):
+        return self.snapshots[-1] if self.snapshots else None
+
+    def get(self, backup_id):
+        i = bisect.bisect_left(self._ids, backup_id)
+        if i < len(self._ids) and self._ids[i] == backup_id:
+            return self.snapshots[i]
+        return None
+
+    def as_of(self, when):
+        """Newest snapshot taken at or before `when` (a datetime)."""
+        i = bisect.bisect_right(self._ids, f"backup_{when.strftime('%Y%m%d_%H%M%S')}")
+        return self.snapshots[i - 1] if i else None
+
+    # ---------------- retention ----------------
+    def expired(self, retention=RETENTION):
+        """Snapshots no retention rule keeps. The latest snapshot is always kept."""
+        if not self.snapshots:
+            return []
+        keep = {self.snapshots[-1]['backup_id']}
+        for kind, count in retention.items():
+            seen = []
+            for snapshot in reversed(self.snapshots):
+                period = _period(backup_time(snapshot['backup_id']), kind)
+                if period in seen:
+                    continue
+                if len(seen) == count:
+                    break
+                seen.append(period)
+                keep.add(snapshot['backup_id'])
+        return [s for s in self.snapshots if s['backup_id'] not in keep]
+
+    def remove(self, backup_ids):
+        drop = set(backup_ids)
+        self.snapshots = [s for s in self.snapshots if s['backup_id'] not in drop]
+        self._ids = [s['backup_id'] for s in self.snapshots]
+
+    def referenced_keys(self):
+        return {entry['key'] for s in self.snapshots for entry in s['files'].values()}
+
+
+def _entry(manifest):
+    files = manifest['files']
+    return {
+        "backup_id": manifest['backup_id'],
+        "created_at": manifest.get('created_at') or backup_time(manifest['backup_id']).isoformat(),
+        "total_size": sum(e.get('size') or 0 for e in files.values()),
+        "files": files,
+    }
+
+
+def load_manifests(s3_client, backup_ids):
+    """{backup_id: manifest or None} for the given snapshots, fetched in parallel.
+
+    None means the folder has neither a manifest nor legacy files (a
+    bundle whose manifest was never written). Any other failure raises a
+    RuntimeError naming the snapshot, so callers never act on a partial view.
+    """
+    def fetch(backup_id):
+        try:
+            return backup_id, load_manifest(s3_client, backup_id)
+        except Exception as e:
+            raise RuntimeError(f"manifest for {backup_id} could not be read: {e}") from e
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        return dict(pool.map(fetch, backup_ids))
+
+
+_catalog_lock = threading.Lock()   # serializes read-modify-write of the catalog object in this process
+
+
+def load_or_rebuild(s3_client):
+    """Load the catalog, building it from the manifests the first time (e.g. on a bucket from before the catalog)."""
+    catalog = BackupCatalog.load(s3_client)
+    if catalog is None:
+        catalog = BackupCatalog.rebuild(s3_client)
+        if len(catalog):
+            catalog.save(s3_client)
+    return catalog
+
+
+def record_snapshot(s3_client, manifest):
+    """Add a freshly written snapshot to the catalog."""
+    with _catalog_lock:
+        catalog = load_or_rebuild(s3_client)
+        catalog.add(manifest)
+        catalog.save(s3_client)
+
+
+def resolve_snapshot(s3_client, backup_id=None, as_of=None):
+    """Return the manifest for backup_id, the newest snapshot at or before as_of, or the latest one.
+
+    Uses the catalog when there is one, so no listing is needed; otherwise
+    falls back to listing the snapshot folders.
+    """
+    catalog = BackupCatalog.load(s3_client)
+    if catalog is not None:
+        if backup_id:
+            return catalog.get(backup_id)
+        return catalog.as_of(as_of) if as_of else catalog.latest()
+
+    if not backup_id:
+        backup_ids = list_backup_ids(s3_client)
+        if as_of:
+            cutoff = f"backup_{as_of.strftime('%Y%m%d_%H%M%S')}"
+            backup_ids = backup_ids[:bisect.bisect_right(backup_ids, cutoff)]
+        if not backup_ids:
+            return None
+        backup_id = backup_ids[-1]
+    return load_manifest(s3_client, backup_id)
+
+
+def delete_keys(s3_client, keys):
+    """Delete keys in DeleteObjects batches of up to 1,000. Returns the number deleted."""
+    keys = sorted(keys)
+    for i in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[i:i + DELETE_BATCH_SIZE]
+        s3_client.delete_objects(Bucket=BUCKET_NAME, Delete={
+            "Objects": [{"Key": k} for k in batch],
+            "Quiet": True
+        })
+    return len(keys)
+
+
+def prune_backups(s3_client, retention=RETENTION, dry_run=False, grace_seconds=GC_GRACE_SECONDS):
+    """Apply the retention policy: drop expired snapshots and any content no kept snapshot references.
+
+    The catalog can miss snapshots (a failed record_snapshot, or two
+    processes updating it at once), so the prune works from a catalog
+    rebuilt from the manifests themselves and saves that back. If any
+    manifest cannot be read, nothing is deleted. Snapshots that appear
+    while the objects are listed are re-read before deleting anything.
+    The catalog is saved before deleting, so an interrupted prune leaves
+    orphaned objects (cleaned up next time) rather than dangling entries.
+    """
+    with _catalog_lock:
+        try:
+            catalog = BackupCatalog.rebuild(s3_client)
+        except RuntimeError as e:
+            raise RuntimeError(f"prune aborted, nothing deleted: {e}") from e
+        known_ids = set(catalog._ids)
+        expired = catalog.expired(retention)
+        expired_ids = [s['backup_id'] for s in expired]
+        catalog.remove(expired_ids)
+        if not dry_run:
+            catalog.save(s3_client)
+
+    # A snapshot folder holds its manifest and bundle, or for legacy snapshots the files themselves
+    doomed = []
+    for snapshot in expired:
+        folder = f"{snapshot['backup_id']}/"
+        files = snapshot['files'].values()
+        keys = {e['key'] for e in files if e['key'].startswith(folder)}
+        if any(e.get('sha256') for e in files):
+            keys.add(folder + MANIFEST_NAME)
+        doomed.extend(keys)
+    referenced = catalog.referenced_keys()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+    unreferenced = [obj['Key'] for obj in iter_objects(s3_client, prefix=OBJECTS_PREFIX)
+                    if obj['Key'] not in referenced and obj['LastModified'] < cutoff]
+
+    # A backup that finished meanwhile may reuse an old object only an expired snapshot referenced
+    new_ids = [b for b in list_backup_ids(s3_client) if b not in known_ids]
+    try:
+        fresh = load_manifests(s3_client, new_ids)
+    except RuntimeError as e:
+        raise RuntimeError(f"prune aborted, nothing deleted: {e}") from e
+    referenced |= {entry['key'] for m in fresh.values() if m for entry in m['files'].values()}
+    doomed.extend(k for k in unreferenced if k not in referenced)
+
+    deleted = 0 if dry_run else delete_keys(s3_client, doomed)
+    return {
+        "expired_snapshots": expired_ids,
+        "kept_snapshots": len(catalog),
+        "objects_deleted": deleted,
+        "objects_to_delete": len(doomed),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from s3_operations import get_s3_client
+
+    parser = argparse.ArgumentParser(description="Inspect and prune the S3 backup catalog")
+    parser.add_argument('command', choices=['list', 'rebuild', 'prune'])
+    parser.add_argument('--dry-run', action='store_true', help='prune: report what would be deleted')
+    args = parser.parse_args()
+
+    client = get_s3_client()
+    if client is None:
+        raise SystemExit("❌ AWS credentials not configured")
+    if args.command == 'list':
+        for snapshot in reversed(load_or_rebuild(client).snapshots):
+            print(f"{snapshot['backup_id']}  {len(snapshot['files']):3d} files  {snapshot['total_size'] / 1024:10.1f} KB")
+    elif args.command == 'rebuild':
+        with _catalog_lock:
+            catalog = BackupCatalog.rebuild(client)
+            catalog.save(client)
+        print(f"✅ Catalog rebuilt: {len(catalog)} snapshot(s)")
+    else:
+        result = prune_backups(client, dry_run=args.dry_run)
+        verb = "Would delete" if args.dry_run else "Deleted"
+        print(f"🧹 {verb} {len(result['expired_snapshots'])} snapshot(s) and {result['objects_to_delete']} object(s); "
+              f"{result['kept_snapshots']} snapshot(s) kept")
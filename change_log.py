@@ -0,0 +1,184 @@
+import bisect
+import json
+import os
+import threading
+from datetime import datetime
+
+from file_lock import locked, write_json
+from reconciliation import SLOT_PATTERN, load_roster
+
+# ---------------- Config ----------------
+CHANGE_LOG_FILE = "data/change_log.jsonl"
+ROSTER_CELLS_FILE = "data/roster_cells.json"   # last roster the log has seen, to diff the next one against
+MAX_CHANGES = 20000          # entries kept after compaction; older cursors get resync
+MAX_SYNC_CHANGES = 1000      # entries scanned per /api/sync call; the rest come with more=true
+
+KIND_SCHEDULE = "schedule"     # data: {slot column: value} for one nurse
+KIND_MC = "mc"                 # data: the MC request
+KIND_SWAP = "swap"             # data: the swap request
+KIND_EMERGENCY = "emergency"   # data: the emergency call
+KINDS = (KIND_SCHEDULE, KIND_MC, KIND_SWAP, KIND_EMERGENCY)
+
+
+class ChangeLog:
+    """Append-only, file-backed log of changes with a monotonic sequence number.
+
+    Writes from every gunicorn worker go to one JSON-lines file under an
+    exclusive flock on the sidecar <path>.lock (compaction replaces the
+    log's inode, so the log itself cannot carry the lock), which makes
+    sequence numbers global. Each process keeps
+    the entries in memory and reads only the bytes appended since its last
+    look, so changes_since(cursor) costs O(log n + changes).
+    """
+
+    def __init__(self, path=CHANGE_LOG_FILE, cells_path=ROSTER_CELLS_FILE, max_changes=MAX_CHANGES):
+        self.path = path
+        self.cells_path = cells_path
+        self.max_changes = max_changes
+        self._entries = []   # sorted by seq
+        self._seqs = []
+        self._offset = 0
+        self._first = None   # the file's first line; changes when another process compacts
+        self._lock = threading.Lock()
+
+    # ---------------- file handling ----------------
+    def _refresh(self):
+        """Pull in lines other processes appended; reload from scratch after a compaction.
+
+        Compaction is spotted by the first line changing rather than the
+        inode, since a freed inode number can come straight back.
+        """
+        try:
+            f = open(self.path, 'r')
+        except FileNotFoundError:
+            self._entries, self._seqs, self._offset, self._first = [], [], 0, None
+            return
+        with f:
+            first = f.readline()
+            size = os.fstat(f.fileno()).st_size
+            if first != self._first or size < self._offset:
+                self._entries, self._seqs, self._offset, self._first = [], [], 0, first
+            if size == self._offset:
+                return
+            f.seek(self._offset)
+            chunk = f.read()
+        complete = chunk[:chunk.rfind("\n") + 1]   # leave a half-written last line for next time
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self._entries.append(entry)
+            self._seqs.append(entry["seq"])
+        self._offset += len(complete.encode())
+
+    @property
+    def head(self):
+        with self._lock:
+            self._refresh()
+            return self._seqs[-1] if self._seqs else 0
+
+    # ---------------- writes ----------------
+    def record(self, changes):
+        """Append [(kind, nurse_id, ward, data)] with consecutive seqs; returns the new head."""
+        if not changes:
+            return self.head
+        # The file lock first: record_roster already holds it when it calls in here
+        with locked(self.path), self._lock:
+            self._refresh()
+            seq = self._seqs[-1] if self._seqs else 0
+            at = datetime.now().isoformat(timespec="seconds")
+            lines = []
+            for kind, nurse_id, ward, data in changes:
+                seq += 1
+                lines.append(json.dumps({"seq": seq, "at": at, "kind": kind, "nurse_id": nurse_id,
+                                         "ward": ward, "data": data}) + "\n")
+            with open(self.path, 'a') as f:
+                f.writelines(lines)
+            self._refresh()
+            if len(self._entries) > 2 * self.max_changes:
+                self._compact()
+            return seq
+
+    def _compact(self):
+        """Keep the newest max_changes entries; the caller holds locked(self.path)."""
+        keep = self._entries[-self.max_changes:]
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as out:
+            out.writelines(json.dumps(e) + "\n" for e in keep)
+        os.replace(tmp, self.path)
+        self._entries, self._seqs, self._offset, self._first = [], [], 0, None
+        self._refresh()
+
+    def record_roster(self, ward_of=None):
+        """Diff the published roster against the last one logged and record one entry per changed nurse."""
+        cells = roster_cells(load_roster())
+        # Read, diff, record and save under the log's lock, so two workers cannot log the same diff
+        with locked(self.path):
+            try:
+                with open(self.cells_path, 'r') as f:
+                    previous = json.load(f)
+            except (FileNotFoundError, ValueError):
+                previous = {}
+            changes = []
+            for nurse_id in sorted(cells.keys() | previous.keys()):
+                old, new = previous.get(nurse_id, {}), cells.get(nurse_id, {})
+                diff = {slot: new.get(slot) for slot in old.keys() | new.keys() if old.get(slot) != new.get(slot)}
+                if diff:
+                    changes.append((KIND_SCHEDULE, nurse_id, ward_of(nurse_id) if ward_of else None, diff))
+            head = self.record(changes)
+            write_json(self.cells_path, cells, indent=None)
+            return head
+
+    # ---------------- reads ----------------
+    def changes_since(self, cursor, nurse_id=None, ward=None, is_admin=False, limit=MAX_SYNC_CHANGES):
+        """Changes after `cursor` visible to the caller, coalesced to the latest state per item.
+
+        Nurses see their own schedule cells, MC and swap requests, and
+        emergency calls in their ward; admins see every MC, swap and
+        emergency. Returns resync=True when the cursor is older than the
+        log keeps (or ahead of it, after a reset); the client should then
+        refetch everything and continue from the returned cursor.
+        """
+        with self._lock:
+            self._refresh()
+            head = self._seqs[-1] if self._seqs else 0
+            oldest = self._seqs[0] if self._seqs else head + 1
+            if cursor is None or not oldest - 1 <= cursor <= head:
+                return {"cursor": head, "resync": True, "more": False}
+            start = bisect.bisect_right(self._seqs, cursor)
+            window = self._entries[start:start + limit]
+            more = start + limit < len(self._seqs)
+
+        schedule, items = {}, {KIND_MC: {}, KIND_SWAP: {}, KIND_EMERGENCY: {}}
+        for entry in window:
+            kind = entry["kind"]
+            if kind == KIND_SCHEDULE:
+                if entry["nurse_id"] == nurse_id:
+                    schedule.update(entry["data"])
+            elif kind == KIND_EMERGENCY:
+                if is_admin or (ward and entry["ward"] == ward):
+                    items[kind][entry["data"]["id"]] = entry["data"]
+            elif kind in items and (is_admin or entry["nurse_id"] == nurse_id):
+                items[kind][entry["data"]["id"]] = entry["data"]
+        return {
+            "cursor": window[-1]["seq"] if window else cursor,
+            "resync": False,
+            "more": more,
+            "schedule": schedule,
+            "mc": list(items[KIND_MC].values()),
+            "swaps": list(items[KIND_SWAP].values()),
+            "emergencies": list(items[KIND_EMERGENCY].values()),
+        }
+
+
+def roster_cells(frame):
+    """{nurse_id: {slot column: value}} from a wide roster frame."""
+    if frame is None or "Nurse_ID" not in frame:
+        return {}
+    slots = [c for c in frame.columns if SLOT_PATTERN.match(str(c))]
+    return {str(row["Nurse_ID"]): {slot: str(row[slot]) for slot in slots}
+            for row in frame[["Nurse_ID"] + slots].to_dict("records")}
+
+
+change_log = ChangeLog()
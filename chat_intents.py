@@ -0,0 +1,209 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------- Config ----------------
+LLM_CACHE_SIZE = 512        # distinct normalized questions kept
+LLM_CACHE_TTL = 600         # seconds before a cached LLM answer is refreshed
+
+INTENT_SICK = "sick"
+INTENT_LEAVE = "leave"
+INTENT_MC = "mc"
+INTENT_SCHEDULE = "schedule"
+INTENT_SWAP = "swap"
+INTENT_EMERGENCY = "emergency"
+INTENT_PROTOCOL = "protocol"
+INTENT_HELP = "help"
+
+
+def _compile(*phrases, words=(), exact=()):
+    """Build one case-insensitive alternation for an intent.
+
+    `phrases` match anywhere, `words` only as whole words (so 'ill' does not
+    fire on 'will'), and `exact` only as the entire message.
+    """
+    alternatives = [re.escape(p) for p in phrases]
+    alternatives += [rf"\b{re.escape(w)}\b" for w in words]
+    alternatives += [rf"^\s*{re.escape(p)}\s*$" for p in exact]
+    return re.compile("|".join(alternatives), re.IGNORECASE)
+
+
+_SICK = _compile("im sick", "i'm sick", "i am sick", "feeling sick", "not well", "unwell", words=("ill",))
+_LEAVE = _compile("mc leave", "medical leave", "sick leave")
+_MC = _compile("submit mc", "medical certificate", "request mc", "take mc", "get mc", "mc request",
+               "mc submission", "apply mc", "i wan mc", "i want mc", "need mc", exact=("mc",))
+_MC_ANY = _compile("medical certificate", "sick leave", "medical leave", words=("mc",))
+_SCHEDULE = _compile("schedule")
+_SWAP = _compile("swap", "change shift")
+_EMERGENCY = _compile("emergency")
+_EMERGENCY_OR_PROCEDURE = _compile("emergency", "procedure")
+_PROTOCOL = _compile("protocol")
+_HELP = _compile("help")
+
+# Checked in order; the first matching intent wins.
+# LLM path: intents with canned answers are served locally, everything else goes to the model.
+LLM_ROUTES = (
+    (INTENT_SICK, _SICK),
+    (INTENT_LEAVE, _LEAVE),
+    (INTENT_MC, _MC),
+    (INTENT_SCHEDULE, _SCHEDULE),
+    (INTENT_SWAP, _SWAP),
+    (INTENT_EMERGENCY, _EMERGENCY),
+)
+# Offline path: same order as the original keyword fallback
+FALLBACK_ROUTES = (
+    (INTENT_SCHEDULE, _SCHEDULE),
+    (INTENT_SWAP, _SWAP),
+    (INTENT_EMERGENCY, _EMERGENCY_OR_PROCEDURE),
+    (INTENT_PROTOCOL, _PROTOCOL),
+    (INTENT_MC, _MC_ANY),
+    (INTENT_HELP, _HELP),
+)
+
+
+def match_intent(message, routes=LLM_ROUTES):
+    """Return the first intent whose pattern matches the message, or None."""
+    for intent, pattern in routes:
+        if pattern.search(message):
+            return intent
+    return None
+
+
+# ---------------- Pre-rendered responses ----------------
+def _mc_form(reason_placeholder):
+    return f'''<div class="mc-form">
+<h4>📋 Submit Medical Certificate</h4>
+<form id="mcForm">
+<div class="form-group">
+<label>Start Date:</label>
+<input type="date" id="startDate" required>
+</div>
+<div class="form-group">
+<label>End Date:</label>
+<input type="date" id="endDate" required>
+</div>
+<div class="form-group">
+<label>Reason:</label>
+<input type="text" id="reason" placeholder="{reason_placeholder}" required>
+</div>
+<div class="form-group">
+<label>Documentation:</label>
+<textarea id="documentation" placeholder="Describe your medical certificate or how you will provide it" required></textarea>
+</div>
+<button type="button" onclick="submitMC()" class="submit-btn">Submit MC Request</button>
+</form>
+</div>'''
+
+
+def _shift_options(placeholder):
+    options = [f'<option value="">{placeholder}</option>']
+    for day in range(1, 8):
+        for shift in ("Morning", "Evening", "Night"):
+            options.append(f'<option value="Day {day} {shift}">Day {day} {shift}</option>')
+    return "\n".join(options)
+
+
+SWAP_FORM = f'''<div class="swap-form">
+<h4>🔄 Shift Swap Request</h4>
+<form id="swapForm">
+<div class="form-group">
+<label>Current Shift to Swap:</label>
+<select id="currentShift" required>
+{_shift_options("Select your current shift")}
+</select>
+</div>
+<div class="form-group">
+<label>Desired Shift:</label>
+<select id="desiredShift" required>
+{_shift_options("Select desired shift")}
+</select>
+</div>
+<div class="form-group">
+<label>Reason for Swap:</label>
+<textarea id="swapReason" placeholder="Please explain why you need this shift swap" required></textarea>
+</div>
+<button type="button" onclick="submitSwapRequest()" class="submit-btn">Submit Swap Request</button>
+</form>
+</div>'''
+
+EMERGENCY_PROCEDURES = '''Emergency Procedures:<br>
+• **Code Blue (Cardiac Arrest)**: Call 2222 immediately, start CPR if trained<br>
+• **Fire Emergency**: Call 3333, evacuate patients safely, use RACE protocol<br>
+• **Security Alert**: Call 4444 for violent patients or intruders<br>
+• **Medical Emergency**: Assess patient, call doctor, prepare emergency cart<br>
+• **Choking**: Heimlich maneuver for conscious patients, back blows for infants<br>
+• **Severe Bleeding**: Apply direct pressure, elevate if possible, call for help<br>
+• **Allergic Reaction**: Check for EpiPen, call doctor, monitor airway<br>
+• **Fall**: Don't move patient, assess injuries, call doctor<br>
+• **Medication Error**: Stop administration, assess patient, report immediately<br>
+• **Equipment Failure**: Switch to backup, call maintenance, document incident<br><br>
+Always follow your hospital's specific protocols and call for help when needed.'''
+
+CANNED_RESPONSES = {
+    INTENT_SICK: ('I understand you\'re not feeling well. As a nurse, do you need to take medical leave? '
+                  'Let me help you submit an MC request.' + _mc_form("e.g., Fever, flu symptoms")),
+    INTENT_LEAVE: _mc_form("e.g., Medical appointment, illness"),
+    INTENT_MC: _mc_form("e.g., Doctor's appointment, illness"),
+    INTENT_SCHEDULE: 'Your schedule is available in the Schedule tab. You can also ask admin to generate new schedules.',
+    INTENT_SWAP: SWAP_FORM,
+    INTENT_EMERGENCY: EMERGENCY_PROCEDURES,
+    INTENT_PROTOCOL: ('I do not have access to real-time information, including ward protocols. Those are specific '
+                      'to individual hospitals and healthcare facilities. To find out about ward protocols, you should '
+                      'consult your hospital\'s internal documentation, your supervisor, or a senior nurse on the ward.'),
+    INTENT_HELP: ('I can help with:<br>• Schedule information<br>• Emergency procedures<br>• Ward protocols<br>'
+                  '• Shift swaps (say "shift swap")<br>• MC submissions (say "request mc")'),
+}
+
+# Few-shot context sent ahead of every question that reaches the model
+FEW_SHOT_PROMPT = (
+    "input: who are you",
+    "output: I am an AI-powered nurse assistant designed to help with scheduling, medical procedures, emergency protocols, and general nursing support.",
+    "input: What all can you do?",
+    "output: I can help with work schedules, shift management, emergency procedures, medical protocols, patient care guidance, medication information, and general nursing questions. I'm here to support you in your nursing duties.",
+)
+
+
+# ---------------- LLM answer cache ----------------
+def normalize_message(message):
+    """Cache key for a question: case, punctuation and spacing do not matter."""
+    return " ".join(re.sub(r"[^\w\s]", " ", message.lower()).split())
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+llm_cache = TTLCache()
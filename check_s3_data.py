@@ -1,6 +1,12 @@
 import boto3
+import json
+import os
+import shutil
+import tempfile
 from datetime import datetime
 
+from s3_bundle import extract_members
+
 # AWS S3 Configuration
 AWS_ACCESS_KEY_ID = 'YOUR_ACCESS_KEY_ID'
 AWS_SECRET_ACCESS_KEY = 'YOUR_SECRET_ACCESS_KEY'
@@ -20,16 +26,34 @@ def list_s3_backups():
         print(f"📁 Checking S3 bucket: {BUCKET_NAME}")
         print("=" * 60)
         
-        # List all objects in bucket
-        response = s3_client.list_objects_v2(Bucket=BUCKET_NAME)
+        # The backup catalog lists every snapshot in one GET; fall back to listing older buckets
+        try:
+            catalog = json.loads(s3_client.get_object(Bucket=BUCKET_NAME, Key='catalog.json')['Body'].read())
+        except s3_client.exceptions.NoSuchKey:
+            catalog = None
+        if catalog:
+            for snapshot in reversed(catalog['snapshots']):
+                print(f"\n🗓️  Backup: {snapshot['created_at'][:19].replace('T', ' ')}")
+                print(f"📂 Snapshot: {snapshot['backup_id']}/")
+                print("-" * 40)
+                for path, entry in sorted(snapshot['files'].items()):
+                    print(f"   📄 {path} ({(entry.get('size') or 0) / 1024:.1f} KB)")
+                print(f"   💾 Total size: {snapshot['total_size']/1024:.1f} KB")
+            print(f"\n✅ Found {len(catalog['snapshots'])} backup(s) in S3")
+            return
+        
+        # List backup objects, following continuation tokens past 1,000 keys
+        paginator = s3_client.get_paginator('list_objects_v2')
+        objects = [obj for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix='backup_')
+                   for obj in page.get('Contents', [])]
         
-        if 'Contents' not in response:
+        if not objects:
             print("❌ No backups found in S3 bucket")
             return
         
         # Group by backup timestamp
         backups = {}
-        for obj in response['Contents']:
+        for obj in objects:
             key = obj['Key']
             if key.startswith('backup_'):
                 timestamp = key.split('/')[0].replace('backup_', '')
@@ -75,18 +99,13 @@ def download_latest_backup():
             region_name=AWS_REGION
         )
         
-        # Get latest backup
-        response = s3_client.list_objects_v2(Bucket=BUCKET_NAME)
-        if 'Contents' not in response:
-            print("❌ No backups found")
-            return
+        paginator = s3_client.get_paginator('list_objects_v2')
         
-        # Find latest backup folder
+        # Find latest backup folder: one listing entry per snapshot, every page
         latest_backup = None
-        for obj in response['Contents']:
-            key = obj['Key']
-            if key.startswith('backup_'):
-                timestamp = key.split('/')[0].replace('backup_', '')
+        for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix='backup_', Delimiter='/'):
+            for common in page.get('CommonPrefixes', []):
+                timestamp = common['Prefix'].rstrip('/').replace('backup_', '')
                 if not latest_backup or timestamp > latest_backup:
                     latest_backup = timestamp
         
@@ -97,16 +116,39 @@ def download_latest_backup():
         print(f"📥 Downloading backup: {latest_backup}")
         
         # Download all files from latest backup
-        objects = s3_client.list_objects_v2(Bucket=BUCKET_NAME, Prefix=f'backup_{latest_backup}/')
+        keys = [obj['Key'] for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix=f'backup_{latest_backup}/')
+                for obj in page.get('Contents', [])]
+        manifest_key = f'backup_{latest_backup}/manifest.json'
+        if manifest_key in keys:
+            # Manifest snapshots point at content-addressed objects
+            manifest = json.loads(s3_client.get_object(Bucket=BUCKET_NAME, Key=manifest_key)['Body'].read())
+            downloads = [(entry['key'], path.replace('/', '_')) for path, entry in manifest['files'].items()
+                         if not entry.get('member')]
+            # Bundle snapshots keep every file as a member of one zip; extract them rather than saving the zip
+            bundles = {}
+            for path, entry in manifest['files'].items():
+                if entry.get('member'):
+                    bundles.setdefault(entry['key'], {})[path] = entry
+        else:
+            downloads = [(key, key.split('/')[-1]) for key in keys]
+            bundles = {}
         
-        for obj in objects['Contents']:
-            key = obj['Key']
-            filename = key.split('/')[-1]
+        for key, filename in downloads:
             local_path = f"restored_{filename}"
             
             s3_client.download_file(BUCKET_NAME, key, local_path)
             print(f"✅ Downloaded: {filename}")
         
+        for key, entries in bundles.items():
+            staging_dir = tempfile.mkdtemp(prefix='.restore_', dir='.')
+            try:
+                for path, staged in extract_members(s3_client, BUCKET_NAME, key, entries, staging_dir).items():
+                    filename = path.replace('/', '_')
+                    os.replace(staged, f"restored_{filename}")
+                    print(f"✅ Extracted: {filename}")
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+        
         print(f"\n🎉 Latest backup downloaded successfully!")
         
     except Exception as e:
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# ---------------- Config ----------------
+REPLAY_BUFFER_SIZE = 500      # events kept for Last-Event-ID reconnects
+HEARTBEAT_SECONDS = 15        # keep-alive comment interval for idle streams
+RETRY_MILLISECONDS = 3000     # client reconnect delay sent in the stream
+# Each open stream holds a gthread worker thread; cap them so dashboards cannot starve the API
+MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 4))
+# The bus lives in worker memory, so gunicorn.conf.py runs a single worker while this is on
+SSE_ENABLED = os.environ.get('SSE_ENABLED', '1') != '0'
+
+EVENT_EMERGENCY_CALL = "emergency_call"
+EVENT_EMERGENCY_SOLVED = "emergency_solved"
+EVENT_SCHEDULE_PUBLISHED = "schedule_published"
+EVENT_UNAVAILABILITY = "unavailability"       # approved MC windows, for the scheduler
+
+
+class EventBus:
+    """In-process pub/sub bus with a bounded replay buffer.
+
+    Each gunicorn worker has its own bus, so subscribers only see events
+    published by the worker that serves their stream; gunicorn.conf.py
+    therefore pins one worker while SSE_ENABLED. At most max_streams
+    streams are open at once, since each one holds a worker thread.
+    """
+
+    def __init__(self, buffer_size=REPLAY_BUFFER_SIZE, max_streams=MAX_STREAMS):
+        self._events = deque(maxlen=buffer_size)
+        self._next_id = 1
+        self._cond = threading.Condition()
+        self.max_streams = max_streams
+        self._streams = 0
+
+    @property
+    def open_streams(self):
+        with self._cond:
+            return self._streams
+
+    def open_stream(self):
+        """Reserve a stream slot; False when max_streams are already open."""
+        with self._cond:
+            if self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._cond:
+            self._streams = max(self._streams - 1, 0)
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._next_id - 1
+
+    def publish(self, event_type, data, ward=None):
+        """Append an event to the buffer and wake every waiting subscriber."""
+        with self._cond:
+            event = {
+                "id": self._next_id,
+                "type": event_type,
+                "ward": ward,
+                "data": data,
+                "published_at": datetime.now().isoformat(),
+            }
+            self._next_id += 1
+            self._events.append(event)
+            self._cond.notify_all()
+        return event
+
+    def events_since(self, last_id, ward=None, types=None):
+        """Return (matching events newer than last_id, cursor still in buffer, newest id)."""
+        with self._cond:
+            oldest = self._events[0]["id"] if self._events else self._next_id
+            # A cursor ahead of the bus means the worker restarted since the client connected
+            in_range = oldest <= last_id + 1 <= self._next_id
+            events = [e for e in self._events
+                      if e["id"] > last_id and _matches(e, ward, types)]
+            return events, in_range, self._next_id - 1
+
+    def wait(self, last_id, timeout):
+        """Block until an event newer than last_id exists or timeout elapses."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._next_id - 1 > last_id, timeout)
+
+
+def _matches(event, ward, types):
+    if types is not None and event["type"] not in types:
+        return False
+    # Events without a ward (e.g. a new roster) go to every ward's stream
+    return ward is None or event["ward"] is None or event["ward"] == ward
+
+
+def format_sse(event):
+    """Render one event in text/event-stream wire format."""
+    payload = json.dumps({"ward": event["ward"], "published_at": event["published_at"], **event["data"]})
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+def parse_cursor(value):
+    """Parse a Last-Event-ID value, returning None when absent or malformed."""
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def stream(bus, last_id, ward=None, types=None, heartbeat=HEARTBEAT_SECONDS):
+    """Return a generator of SSE frames from last_id onwards, replaying anything buffered first.
+
+    The cursor is resolved here rather than inside the generator so that
+    events published before the first frame is pulled are not skipped.
+    """
+    replay = last_id is not None
+    if not replay:
+        last_id = bus.last_id
+    return _frames(bus, last_id, replay, ward, types, heartbeat)
+
+
+def _frames(bus, last_id, replay, ward, types, heartbeat):
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+
+    if replay:
+        events, in_range, head = bus.events_since(last_id, ward, types)
+        if not in_range:
+            # Cursor fell out of the replay buffer: tell the client to refetch lists
+            yield f"event: resync\ndata: {json.dumps({'last_id': head})}\n\n"
+        for event in events:
+            yield format_sse(event)
+        last_id = head
+
+    while True:
+        if not bus.wait(last_id, heartbeat):
+            yield f": keepalive {int(time.time())}\n\n"
+            continue
+        events, _, head = bus.events_since(last_id, ward, types)
+        for event in events:
+            yield format_sse(event)
+        # Filtered-out events still advance the cursor so wait() does not spin
+        last_id = head
+
+
+bus = EventBus()
@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows: single-process dev server only
+    fcntl = None
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+_held = threading.local()   # paths this thread has flocked, so nested locked() calls do not flock twice
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(path), threading.RLock())
+
+
+@contextmanager
+def locked(path):
+    """Hold `path` exclusively against other threads and other processes.
+
+    gthread workers serve requests on many threads and WEB_CONCURRENCY can
+    start several workers, so a load -> modify -> save cycle takes both a
+    per-path thread lock and an flock on the sidecar `<path>.lock`. The
+    sidecar, not the data file, is locked because writers replace the data
+    file's inode with os.replace. Re-entrant within a thread.
+    """
+    key = os.path.abspath(path)
+    with _thread_lock(path):
+        held = _held.__dict__.setdefault('paths', set())
+        if key in held:
+            # A second flock on a new descriptor would wait for our own lock
+            yield
+            return
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.lock', 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            held.add(key)
+            try:
+                yield
+            finally:
+                held.discard(key)
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_json(path, default):
+    """Parsed contents of `path`, or `default()` when it does not exist yet."""
+    if not os.path.exists(path):
+        return default()
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_json(path, data, indent=2):
+    """Write to a temp file and os.replace it in, so readers never see a half-written file."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(tmp, path)
@@ -0,0 +1,22 @@
+import os
+
+from event_bus import SSE_ENABLED
+
+# ---------------- Config ----------------
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+if SSE_ENABLED and workers > 1:
+    # /api/events subscribers only see events published by their own worker
+    print(f"⚠️ SSE_ENABLED: running 1 worker instead of {workers}; set SSE_ENABLED=0 to scale out")
+    workers = 1
+# Import app.py once in the master and fork warm workers from it; PRELOAD=0 gives each worker a cold import
+preload_app = os.environ.get('PRELOAD', '1') != '0'
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded import and before any worker is forked
+    if preload_app:
+        from app import warm_state
+        warm_state()
@@ -0,0 +1,138 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ---------------- Config ----------------
+COMPRESS_MIN_BYTES = 1024     # smaller bodies go out as-is; the headers would eat the saving
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+MAX_CACHED_BODIES = 256       # (endpoint, version) entries kept, least recently used dropped first
+CACHE_CONTROL = "private, no-cache"   # clients may keep a copy but must revalidate with If-None-Match
+
+
+def etag_for(key, versions):
+    """Strong ETag for `key` at these source-file versions."""
+    return '"' + hashlib.sha1(repr((key, versions)).encode()).hexdigest()[:32] + '"'
+
+
+def accepted_codings(header):
+    """{coding: q} from an Accept-Encoding header."""
+    codings = {}
+    for part in (header or "").split(","):
+        fields = part.strip().split(";")
+        coding = fields[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def negotiate(header):
+    """'br', 'gzip' or None (identity): the best coding the client accepts and we can produce."""
+    codings = accepted_codings(header)
+    wildcard = codings.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in ("br", "gzip"):   # br first so it wins ties
+        if coding == "br" and brotli is None:
+            continue
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class BodyCache:
+    """Serialized response bodies per (key, etag), with compressed forms built once on demand."""
+
+    def __init__(self, max_entries=MAX_CACHED_BODIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def body(self, key, etag, build):
+        with self._lock:
+            entry = self._entries.get((key, etag))
+            if entry is not None:
+                self._entries.move_to_end((key, etag))
+                return entry
+        entry = {None: build()}   # built outside the lock; a racing duplicate build is harmless
+        with self._lock:
+            # A new version of the same key makes the old ones unreachable
+            for stale in [k for k in self._entries if k[0] == key and k[1] != etag]:
+                del self._entries[stale]
+            entry = self._entries.setdefault((key, etag), entry)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def encoded(self, entry, coding):
+        data = entry.get(coding)
+        if data is None:
+            raw = entry[None]
+            if coding == "br":
+                data = brotli.compress(raw, quality=BROTLI_QUALITY)
+            else:
+                data = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+            entry[coding] = data
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+bodies = BodyCache()
+
+
+def cached_body(key, versions, build, mimetype):
+    """Response for `key` at `versions`, with conditional GET and negotiated compression.
+
+    `versions` must change whenever build()'s bytes would (file versions
+    from os.stat are the usual input). A matching If-None-Match gets a 304
+    before build() runs; otherwise the body and its compressed forms are
+    reused until the versions change.
+    """
+    etag = etag_for(key, versions)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if _matches(request.headers.get("If-None-Match"), etag):
+        return Response(status=304, headers=headers)
+
+    entry = bodies.body(key, etag, build)
+    coding = negotiate(request.headers.get("Accept-Encoding")) if len(entry[None]) >= COMPRESS_MIN_BYTES else None
+    if coding:
+        headers["Content-Encoding"] = coding
+        data = bodies.encoded(entry, coding)
+    else:
+        data = entry[None]
+    return Response(data, mimetype=mimetype, headers=headers)
+
+
+def cached_json(key, versions, build):
+    """cached_body() for a JSON-serializable build() result."""
+    return cached_body(key, versions, lambda: current_app.json.dumps(build()).encode("utf-8") + b"\n",
+                       "application/json")
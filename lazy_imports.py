@@ -0,0 +1,54 @@
+import importlib
+import os
+import sys
+import threading
+
+# ---------------- Config ----------------
+LAZY_IMPORTS = os.environ.get('LAZY_IMPORTS', '1') != '0'   # 0 imports everything up front, as before
+
+_lock = threading.RLock()
+
+
+class LazyModule:
+    """Stands in for a module until the first attribute access, then forwards to it.
+
+    Used for pandas/numpy in modules the app imports at startup, so a
+    worker that only serves check-ins never pays for them. The import
+    runs under a lock: gthread workers can hit two cold routes at once.
+    """
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with _lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__['_module'] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_import(name):
+    """`name` itself if it is already imported or LAZY_IMPORTS=0, otherwise a LazyModule."""
+    if not LAZY_IMPORTS or name in sys.modules:
+        return importlib.import_module(name)
+    return LazyModule(name)
+
+
+def loaded(name):
+    """Whether `name` has really been imported in this process."""
+    return name in sys.modules
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# ---------------- Config ----------------
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini')               # 'gemini' or 'stub'
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', 8))
+LLM_SLOW_CALL_SECONDS = float(os.environ.get('LLM_SLOW_CALL_SECONDS', 4))
+LLM_FAILURE_THRESHOLD = int(os.environ.get('LLM_FAILURE_THRESHOLD', 3))
+LLM_RESET_SECONDS = float(os.environ.get('LLM_RESET_SECONDS', 30))
+LLM_MAX_WORKERS = int(os.environ.get('LLM_MAX_WORKERS', 8))
+
+STUB_LATENCY_SECONDS = float(os.environ.get('LLM_STUB_LATENCY', 0.05))
+STUB_CHUNK_SECONDS = float(os.environ.get('LLM_STUB_CHUNK_LATENCY', 0.005))
+
+
+class LLMUnavailable(Exception):
+    """Raised when the model times out, errors, or the circuit is open."""
+
+
+# ---------------- Backends ----------------
+class GeminiBackend:
+    """Wraps a google.generativeai GenerativeModel.
+
+    `model` may instead be a zero-argument factory; it is then called on
+    the first request, so importing and configuring the SDK stays off the
+    worker's startup path.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model, timeout=LLM_TIMEOUT_SECONDS):
+        self._model = model
+        self._lock = threading.Lock()
+        self.timeout = timeout
+
+    @property
+    def model(self):
+        if not hasattr(self._model, "generate_content"):
+            with self._lock:
+                if not hasattr(self._model, "generate_content"):
+                    self._model = self._model()
+        return self._model
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt, request_options={"timeout": self.timeout})
+        return response.text
+
+    def stream(self, prompt):
+        response = self.model.generate_content(prompt, stream=True, request_options={"timeout": self.timeout})
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class StubBackend:
+    """Deterministic offline backend for load tests: same prompt, same answer, fixed latency."""
+
+    name = "stub"
+
+    ANSWERS = (
+        "Please follow your ward's standard operating procedure and inform the charge nurse.",
+        "Monitor the patient's vital signs closely and document any changes in the chart.",
+        "Check the medication administration record and confirm with the pharmacist if unsure.",
+        "Ensure proper hand hygiene and use the appropriate personal protective equipment.",
+    )
+
+    def __init__(self, latency=STUB_LATENCY_SECONDS, chunk_latency=STUB_CHUNK_SECONDS):
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+
+    def _answer(self, prompt):
+        digest = hashlib.sha1(str(prompt[-2] if isinstance(prompt, (list, tuple)) else prompt).encode()).digest()
+        return self.ANSWERS[digest[0] % len(self.ANSWERS)]
+
+    def generate(self, prompt):
+        time.sleep(self.latency)
+        return self._answer(prompt)
+
+    def stream(self, prompt):
+        time.sleep(self.latency)
+        for word in self._answer(prompt).split(" "):
+            time.sleep(self.chunk_latency)
+            yield word + " "
+
+
+# ---------------- Circuit breaker ----------------
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures, then allows one trial call per `reset_after` seconds."""
+
+    def __init__(self, failure_threshold=LLM_FAILURE_THRESHOLD, reset_after=LLM_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_after or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+# ---------------- Client ----------------
+class LLMClient:
+    """Calls a backend on a bounded thread pool with a hard deadline and a circuit breaker.
+
+    Timeouts, errors and calls slower than `slow_call` all count as failures.
+    A timed-out call keeps running in its pool thread, but the request
+    thread returns at the deadline.
+    """
+
+    def __init__(self, backend, timeout=LLM_TIMEOUT_SECONDS, slow_call=LLM_SLOW_CALL_SECONDS,
+                 breaker=None, max_workers=LLM_MAX_WORKERS):
+        self.backend = backend
+        self.timeout = timeout
+        self.slow_call = slow_call
+        self.breaker = breaker or CircuitBreaker()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    def _finish(self, started, ok):
+        if ok and time.monotonic() - started <= self.slow_call:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def generate(self, prompt):
+        """Return the model's answer or raise LLMUnavailable."""
+        if not self.breaker.allow():
+            raise LLMUnavailable("circuit open")
+
+        started = time.monotonic()
+        future = self._pool.submit(self.backend.generate, prompt)
+        try:
+            text = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            self._finish(started, ok=False)
+            raise LLMUnavailable(f"no answer within {self.timeout}s")
+        except Exception as e:
+            self._finish(started, ok=False)
+            raise LLMUnavailable(str(e))
+
+        self._finish(started, ok=True)
+        return text
+
+    def stream(self, prompt):
+        """Yield answer chunks as they arrive; raise LLMUnavailable if the deadline passes or the backend fails.
+
+        The deadline covers the whole answer, so a model that starts quickly
+        but stalls mid-answer is still cut off.
+        """
+        if not self.breaker.allow():
+            raise LLMUnavailable("circuit open")
+
+        started = time.monotonic()
+        deadline = started + self.timeout
+        chunks = queue.Queue()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in self.backend.stream(prompt):
+                    chunks.put(chunk)
+                chunks.put(done)
+            except Exception as e:
+                chunks.put(e)
+
+        self._pool.submit(produce)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = chunks.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    self._finish(started, ok=False)
+                    raise LLMUnavailable(f"answer not finished within {self.timeout}s")
+                if item is done:
+                    self._finish(started, ok=True)
+                    return
+                if isinstance(item, Exception):
+                    self._finish(started, ok=False)
+                    raise LLMUnavailable(str(item))
+                yield item
+        except GeneratorExit:
+            # The client went away mid-answer; the model itself was healthy
+            self.breaker.record_success()
+            raise
+
+
+def create_backend(gemini_model=None):
+    """Pick the backend from LLM_BACKEND; returns None when no model is configured."""
+    if LLM_BACKEND == 'stub':
+        return StubBackend()
+    if gemini_model is not None:
+        return GeminiBackend(gemini_model)
+    return None
+
+
+if __name__ == "__main__":
+    # Offline latency/throughput check of the client path using the stub backend
+    import statistics
+    import sys
+
+    requests_total = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    client = LLMClient(StubBackend(), max_workers=concurrency)
+    latencies = []
+
+    def one(i):
+        t = time.perf_counter()
+        client.generate(["input: question %d" % (i % 20), "output: "])
+        latencies.append(time.perf_counter() - t)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as callers:
+        list(callers.map(one, range(requests_total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Stub LLM: {requests_total} calls, concurrency {concurrency}")
+    print(f"Throughput: {requests_total / elapsed:.1f} req/s")
+    print(f"p50 {statistics.median(latencies) * 1000:.1f} ms | "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
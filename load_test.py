@@ -0,0 +1,338 @@
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# ---------------- Config ----------------
+NURSE_JSON = "csv/nurse_database.json"
+ATTENDANCE_FILE = "data/attendance.json"
+ADMIN_IDS = ("N1001", "N1015")
+COPY_IGNORE = shutil.ignore_patterns('.git', '__pycache__', 'mobile_app', 'deploy', '*.pdf', '*.docx', 'memprofile')
+ARRIVALS = ("burst", "uniform", "poisson", "shift_change")
+CHAT_MESSAGES = (
+    "What is my schedule this week?",
+    "How do I submit an MC?",
+    "Patient in bed 4 has a fever of 39C, what should I do?",
+    "How should I handle a needle stick injury?",
+    "What PPE do I need for an isolation room?",
+    "Hello",
+)
+REQUEST_TIMEOUT = 30
+
+
+# ---------------- Test environment ----------------
+def synthetic_nurses(count, source_path):
+    """The real directory's admins plus `count` generated ward nurses, so every virtual user has its own id."""
+    with open(source_path, 'r') as f:
+        real = json.load(f)
+    admins = [n for n in real if n["id"] in ADMIN_IDS]
+    wards = [("ICU", "ICU Nurse"), ("ED", "ED Nurse"), ("GW", "GW Nurse")]
+    nurses = list(admins)
+    for i in range(count):
+        ward, role = wards[i % len(wards)]
+        nurses.append({"id": f"N{5000 + i}", "name": f"Load Test Nurse {i}", "department": ward, "role": role,
+                       "grade": "U29", "skills": [ward, role], "max_shifts_per_week": 5,
+                       "employment_type": "Permanent", "preferred_shifts": "Morning", "seniority": 1,
+                       "specializations": []})
+    return nurses
+
+
+def make_workdir(source_dir, nurses):
+    """Copy the app into a scratch directory with an empty attendance store and the synthetic directory."""
+    workdir = os.path.join(tempfile.mkdtemp(prefix='loadtest_'), 'app')
+    shutil.copytree(source_dir, workdir, ignore=COPY_IGNORE)
+    os.makedirs(os.path.join(workdir, 'data'), exist_ok=True)
+    with open(os.path.join(workdir, ATTENDANCE_FILE), 'w') as f:
+        json.dump({}, f)
+    with open(os.path.join(workdir, NURSE_JSON), 'w') as f:
+        json.dump(nurses, f, indent=2)
+    return workdir
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, port, gunicorn_workers):
+    """Start the app with the stub LLM; gunicorn mirrors the Procfile, otherwise Flask's threaded server."""
+    env = dict(os.environ, LLM_BACKEND='stub', FLASK_ENV='production', PORT=str(port))
+    env.pop('GEMINI_API_KEY', None)
+    if gunicorn_workers:
+        cmd = [sys.executable, '-m', 'gunicorn', '--worker-class', 'gthread', '--threads', '16',
+               '-w', str(gunicorn_workers), '-b', f'127.0.0.1:{port}', 'app:app']
+    else:
+        cmd = [sys.executable, '-c', f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    log = open(os.path.join(workdir, 'server.log'), 'w')
+    process = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited early, see {log.name}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not start within 120s")
+
+
+# ---------------- Client ----------------
+class Recorder:
+    """Per-route latencies and outcomes, shared by all virtual users."""
+
+    def __init__(self):
+        self.samples = {}    # route -> [seconds]
+        self.statuses = {}   # route -> {status: count}
+        self._lock = threading.Lock()
+
+    def add(self, route, seconds, status):
+        with self._lock:
+            self.samples.setdefault(route, []).append(seconds)
+            counts = self.statuses.setdefault(route, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def report(self, elapsed):
+        routes = {}
+        for route in sorted(self.samples):
+            latencies = sorted(self.samples[route])
+            errors = sum(c for s, c in self.statuses[route].items() if not str(s).startswith('2'))
+            routes[route] = {
+                "requests": len(latencies),
+                "errors": errors,
+                "error_rate": round(errors / len(latencies), 4),
+                "statuses": {str(s): c for s, c in sorted(self.statuses[route].items(), key=lambda i: str(i[0]))},
+                "p50_ms": _percentile_ms(latencies, 0.50),
+                "p95_ms": _percentile_ms(latencies, 0.95),
+                "p99_ms": _percentile_ms(latencies, 0.99),
+                "max_ms": round(latencies[-1] * 1000, 1),
+            }
+        total = sum(r["requests"] for r in routes.values())
+        errors = sum(r["errors"] for r in routes.values())
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 1) if elapsed else None,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "routes": routes,
+        }
+
+
+def _percentile_ms(sorted_values, q):
+    return round(sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)] * 1000, 1)
+
+
+class VirtualUser:
+    """One nurse's cookie session against the server."""
+
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def call(self, method, route, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.base_url + route, data=data, method=method,
+                                     headers={"Content-Type": "application/json"} if data else {})
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=REQUEST_TIMEOUT) as response:
+                body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            body, status = e.read(), e.code
+        except (urllib.error.URLError, OSError) as e:
+            body, status = b"", type(e).__name__
+        self.recorder.add(route, time.perf_counter() - started, status)
+        return status, body
+
+
+def nurse_session(base_url, recorder, nurse_id, chat_ratio, outcome):
+    """Login, status, check in, status, maybe chat, check out - one nurse across a shift change."""
+    user = VirtualUser(base_url, recorder)
+    status, _ = user.call('POST', '/api/login', {"nurse_id": nurse_id, "password": f"{nurse_id}_Hack"})
+    if status != 200:
+        return
+    user.call('GET', '/api/status')
+    status, _ = user.call('POST', '/api/checkin')
+    if status == 200:
+        outcome["checked_in"].add(nurse_id)
+    user.call('GET', '/api/status')
+    if random.random() < chat_ratio:
+        user.call('POST', '/api/chat', {"message": random.choice(CHAT_MESSAGES)})
+    status, _ = user.call('POST', '/api/checkout')
+    if status == 200:
+        outcome["checked_out"].add(nurse_id)
+
+
+def admin_session(base_url, recorder, admin_id, polls, interval):
+    """An admin dashboard polling the full roster while nurses arrive."""
+    user = VirtualUser(base_url, recorder)
+    user.call('POST', '/api/login', {"nurse_id": admin_id, "password": f"{admin_id}_Hack"})
+    for _ in range(polls):
+        user.call('GET', '/api/schedule/full')
+        time.sleep(interval)
+
+
+def arrival_offsets(pattern, count, window, rng):
+    """Seconds from the start at which each virtual nurse arrives."""
+    if pattern == "burst" or window <= 0:
+        return [0.0] * count
+    if pattern == "uniform":
+        return [i * window / count for i in range(count)]
+    if pattern == "poisson":
+        offsets, t = [], 0.0
+        for _ in range(count):
+            t += rng.expovariate(count / window)
+            offsets.append(min(t, window))
+        return offsets
+    # shift_change: arrivals bunch up around the middle of the window, like a handover
+    return sorted(min(max(rng.gauss(window / 2, window / 8), 0.0), window) for _ in range(count))
+
+
+# ---------------- Integrity ----------------
+def check_attendance(path, outcome, date_str):
+    """Compare the attendance file with what the server acknowledged.
+
+    lost_checkins: 200 on check-in but no record for the day.
+    lost_checkouts: 200 on check-out but the record does not say checked_out.
+    unexpected_records: records for nurses whose check-in never succeeded
+    (duplicated or resurrected writes).
+    """
+    try:
+        with open(path, 'r') as f:
+            attendance = json.load(f)
+    except (OSError, ValueError) as e:
+        return {"readable": False, "error": str(e)}
+    recorded = {nurse_id for nurse_id, days in attendance.items() if date_str in days}
+    checked_out = {nurse_id for nurse_id in recorded
+                   if attendance[nurse_id][date_str].get('status') == 'checked_out'}
+    return {
+        "readable": True,
+        "acknowledged_checkins": len(outcome["checked_in"]),
+        "acknowledged_checkouts": len(outcome["checked_out"]),
+        "records": len(recorded),
+        "lost_checkins": sorted(outcome["checked_in"] - recorded),
+        "lost_checkouts": sorted(outcome["checked_out"] - checked_out),
+        "unexpected_records": sorted(recorded - outcome["checked_in"]),
+    }
+
+
+# ---------------- Main ----------------
+def run(args):
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    server, workdir = None, None
+    if args.url:
+        # A remote server only knows its own directory, so use the real nurse ids
+        with open(os.path.join(source_dir, NURSE_JSON), 'r') as f:
+            nurse_ids = [n["id"] for n in json.load(f) if n["id"] not in ADMIN_IDS][:args.nurses]
+        base_url = args.url
+        attendance_path = args.attendance_file
+    else:
+        nurses = synthetic_nurses(args.nurses, os.path.join(source_dir, NURSE_JSON))
+        nurse_ids = [n["id"] for n in nurses if n["id"] not in ADMIN_IDS]
+        workdir = make_workdir(source_dir, nurses)
+        port = free_port()
+        print(f"Starting app in {workdir} on port {port} ({'gunicorn' if args.gunicorn else 'flask threaded'})...")
+        server = start_server(workdir, port, args.gunicorn)
+        base_url = f"http://127.0.0.1:{port}"
+        attendance_path = os.path.join(workdir, ATTENDANCE_FILE)
+
+    recorder = Recorder()
+    outcome = {"checked_in": set(), "checked_out": set()}
+    offsets = arrival_offsets(args.arrival, len(nurse_ids), args.window, rng)
+    print(f"{len(nurse_ids)} nurses, {args.arrival} arrivals over {args.window:.0f}s, "
+          f"concurrency {args.concurrency}, {args.admins} admin pollers")
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency + args.admins) as pool:
+            polls = max(int(args.window / args.poll_interval), 1)
+            admins = [pool.submit(admin_session, base_url, recorder, ADMIN_IDS[i % len(ADMIN_IDS)],
+                                  polls, args.poll_interval) for i in range(args.admins)]
+            gate = threading.Semaphore(args.concurrency)
+            futures = []
+            for nurse_id, offset in sorted(zip(nurse_ids, offsets), key=lambda p: p[1]):
+                delay = offset - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+                gate.acquire()
+                future = pool.submit(nurse_session, base_url, recorder, nurse_id, args.chat_ratio, outcome)
+                future.add_done_callback(lambda _: gate.release())
+                futures.append(future)
+            for future in futures + admins:
+                future.result()
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = recorder.report(elapsed)
+    report["config"] = {k: v for k, v in vars(args).items() if k != 'json'}
+    report["integrity"] = check_attendance(attendance_path, outcome, date_str) if attendance_path else None
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    if workdir and not args.keep:
+        shutil.rmtree(os.path.dirname(workdir), ignore_errors=True)
+    elif workdir:
+        print(f"Scratch app kept in {workdir}")
+    return report
+
+
+def print_report(report):
+    print("-" * 86)
+    print(f"{'route':24} {'reqs':>6} {'err%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for route, r in report["routes"].items():
+        print(f"{route:24} {r['requests']:6d} {r['error_rate'] * 100:6.1f} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} "
+              f"{r['p99_ms']:9.1f} {r['max_ms']:9.1f}  {r['statuses']}")
+    print("-" * 86)
+    print(f"{report['requests']} requests in {report['elapsed_seconds']}s: {report['throughput_rps']} req/s, "
+          f"error rate {report['error_rate'] * 100:.2f}%")
+    integrity = report["integrity"]
+    if integrity is None:
+        print("Integrity: skipped (pass --attendance-file when testing a remote --url)")
+    elif not integrity["readable"]:
+        print(f"Integrity: attendance file unreadable after the run: {integrity['error']}")
+    else:
+        print(f"Integrity: {integrity['records']} records for {integrity['acknowledged_checkins']} acknowledged "
+              f"check-ins | lost check-ins {len(integrity['lost_checkins'])}, lost check-outs "
+              f"{len(integrity['lost_checkouts'])}, unexpected records {len(integrity['unexpected_records'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the attendance API against a scratch copy of the app")
+    parser.add_argument('--nurses', type=int, default=300, help='virtual nurses, one synthetic id each (capped at the real directory with --url)')
+    parser.add_argument('--concurrency', type=int, default=32, help='nurse sessions in flight at once')
+    parser.add_argument('--arrival', choices=ARRIVALS, default='shift_change', help='arrival pattern')
+    parser.add_argument('--window', type=float, default=300.0, help='seconds over which nurses arrive')
+    parser.add_argument('--chat-ratio', type=float, default=0.3, help='share of nurses who also ask the chatbot')
+    parser.add_argument('--admins', type=int, default=2, help='admin sessions polling /api/schedule/full')
+    parser.add_argument('--poll-interval', type=float, default=5.0, help='seconds between admin polls')
+    parser.add_argument('--gunicorn', type=int, default=0, metavar='WORKERS',
+                        help='serve with gunicorn gthread workers (as in the Procfile) instead of Flask')
+    parser.add_argument('--url', help='test an already running server instead (start it with LLM_BACKEND=stub)')
+    parser.add_argument('--attendance-file', help="the --url server's attendance.json, for the integrity check")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help='also write the report as JSON to this path')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch app directory and server.log')
+    run(parser.parse_args())
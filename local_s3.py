@@ -0,0 +1,250 @@
+import bisect
+import hashlib
+import io
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+
+def _not_found(operation, key):
+    return ClientError({"Error": {"Code": "404", "Message": f"Not Found: {key}"}}, operation)
+
+
+def _parse_range(header, size):
+    """Parse an HTTP 'bytes=a-b' / 'bytes=-n' range into a [start, end) slice."""
+    spec = header.split("=", 1)[1]
+    first, last = spec.split("-", 1)
+    if first == "":
+        return max(size - int(last), 0), size
+    start = int(first)
+    end = size if last == "" else min(int(last) + 1, size)
+    return start, end
+
+
+class _Paginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **kwargs):
+        token = None
+        while True:
+            if token:
+                kwargs["ContinuationToken"] = token
+            page = self.client.list_objects_v2(**kwargs)
+            yield page
+            if not page.get("IsTruncated"):
+                return
+            token = page["NextContinuationToken"]
+
+
+class LocalS3Client:
+    """Directory-backed stand-in for the subset of the boto3 S3 client this app uses.
+
+    Objects live at <root>/<bucket>/<key>. Every call is counted in `stats`
+    (requests per operation plus bytes in/out), and `latency` adds a fixed
+    per-request delay to mimic a network round trip. Enable it for the app
+    with S3_LOCAL_DIR=<dir>.
+    """
+
+    def __init__(self, root, latency=0.0):
+        self.root = root
+        self.latency = latency
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._listing = {}   # bucket -> sorted keys, dropped on every write
+
+    # ---------------- helpers ----------------
+    def _count(self, operation, bytes_in=0, bytes_out=0):
+        with self._lock:
+            self.stats[operation] += 1
+            self.stats["requests"] += 1
+            self.stats["bytes_in"] += bytes_in
+            self.stats["bytes_out"] += bytes_out
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def _invalidate(self, bucket):
+        with self._lock:
+            self._listing.pop(bucket, None)
+
+    def _keys(self, bucket):
+        with self._lock:
+            keys = self._listing.get(bucket)
+        if keys is not None:
+            return keys
+        base = os.path.join(self.root, bucket)
+        keys = []
+        for dirpath, _, filenames in os.walk(base):
+            rel = os.path.relpath(dirpath, base)
+            for name in filenames:
+                if name.endswith(".part"):
+                    continue
+                keys.append(name if rel == "." else "/".join(rel.split(os.sep) + [name]))
+        keys.sort()
+        with self._lock:
+            self._listing[bucket] = keys
+        return keys
+
+    def _write(self, bucket, key, data_or_path):
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".part"
+        if isinstance(data_or_path, bytes):
+            with open(tmp, "wb") as f:
+                f.write(data_or_path)
+        else:
+            shutil.copyfile(data_or_path, tmp)
+        os.replace(tmp, path)
+        self._invalidate(bucket)
+
+    def _etag(self, path):
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                md5.update(block)
+        return f'"{md5.hexdigest()}"'
+
+    # ---------------- S3 API subset ----------------
+    def head_bucket(self, Bucket):
+        self._count("head_bucket")
+        if not os.path.isdir(os.path.join(self.root, Bucket)):
+            raise _not_found("HeadBucket", Bucket)
+        return {}
+
+    def create_bucket(self, Bucket, **kwargs):
+        self._count("create_bucket")
+        os.makedirs(os.path.join(self.root, Bucket), exist_ok=True)
+        return {}
+
+    def _count_upload(self, size, Config):
+        # boto3 switches to multipart above the threshold: one request per part plus create/complete
+        threshold = getattr(Config, "multipart_threshold", None)
+        chunk = getattr(Config, "multipart_chunksize", None)
+        if threshold and chunk and size >= threshold:
+            parts = -(-size // chunk)
+            self._count("create_multipart_upload")
+            for i in range(parts):
+                self._count("upload_part", bytes_in=min(chunk, size - i * chunk))
+            self._count("complete_multipart_upload")
+        else:
+            self._count("put_object", bytes_in=size)
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        self._count_upload(os.path.getsize(Filename), Config)
+        self._write(Bucket, Key, Filename)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        data = Fileobj.read()
+        self._count_upload(len(data), Config)
+        self._write(Bucket, Key, data)
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        data = Body if isinstance(Body, bytes) else Body.encode() if isinstance(Body, str) else Body.read()
+        self._count("put_object", bytes_in=len(data))
+        self._write(Bucket, Key, data)
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self._count("head_object")
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            raise _not_found("HeadObject", Key)
+        st = os.stat(path)
+        return {
+            "ContentLength": st.st_size,
+            "ETag": self._etag(path),
+            "LastModified": datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+        }
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            self._count("get_object")
+            raise _not_found("GetObject", Key)
+        size = os.path.getsize(path)
+        start, end = _parse_range(Range, size) if Range else (0, size)
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        self._count("get_object", bytes_out=len(data))
+        response = {"Body": io.BytesIO(data), "ContentLength": len(data), "ETag": self._etag(path)}
+        if Range:
+            response["ContentRange"] = f"bytes {start}-{end - 1}/{size}"
+        return response
+
+    def download_file(self, Bucket, Key, Filename, ExtraArgs=None, Callback=None, Config=None):
+        path = self._path(Bucket, Key)
+        if not os.path.isfile(path):
+            self._count("get_object")
+            raise _not_found("GetObject", Key)
+        self._count("get_object", bytes_out=os.path.getsize(path))
+        shutil.copyfile(path, Filename)
+
+    def list_objects_v2(self, Bucket, Prefix="", Delimiter=None, ContinuationToken=None, StartAfter=None,
+                        MaxKeys=1000, **kwargs):
+        self._count("list_objects_v2")
+        keys = self._keys(Bucket)
+        after = ContinuationToken or StartAfter or ""
+        i = bisect.bisect_right(keys, after) if after else 0
+        i = max(i, bisect.bisect_left(keys, Prefix))
+        page, prefixes, last = [], [], None
+        while i < len(keys) and keys[i].startswith(Prefix) and len(page) + len(prefixes) < MaxKeys:
+            key = keys[i]
+            cut = key.find(Delimiter, len(Prefix)) if Delimiter else -1
+            if cut >= 0:
+                # Roll everything under this prefix into one CommonPrefixes entry
+                common = key[:cut + len(Delimiter)]
+                prefixes.append(common)
+                last = common + "\U0010ffff"
+                i = bisect.bisect_left(keys, last)
+            else:
+                page.append(key)
+                last = key
+                i += 1
+        truncated = i < len(keys) and keys[i].startswith(Prefix)
+        contents = []
+        for key in page:
+            path = self._path(Bucket, key)
+            st = os.stat(path)
+            contents.append({
+                "Key": key,
+                "Size": st.st_size,
+                "ETag": self._etag(path),
+                "LastModified": datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+            })
+        response = {"KeyCount": len(contents) + len(prefixes), "IsTruncated": truncated,
+                    "MaxKeys": MaxKeys, "Prefix": Prefix}
+        if contents:
+            response["Contents"] = contents
+        if prefixes:
+            response["CommonPrefixes"] = [{"Prefix": p} for p in prefixes]
+        if truncated:
+            response["NextContinuationToken"] = last
+        return response
+
+    def delete_objects(self, Bucket, Delete):
+        objects = Delete.get("Objects", [])
+        if len(objects) > 1000:
+            raise ClientError({"Error": {"Code": "MalformedXML", "Message": "more than 1000 keys"}}, "DeleteObjects")
+        self._count("delete_objects")
+        deleted = []
+        for obj in objects:
+            path = self._path(Bucket, obj["Key"])
+            if os.path.isfile(path):
+                os.remove(path)
+            deleted.append({"Key": obj["Key"]})
+        self._invalidate(Bucket)
+        return {"Deleted": deleted}
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(operation_name)
+        return _Paginator(self)
@@ -0,0 +1,258 @@
+import bisect
+import heapq
+import itertools
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from file_lock import locked, read_json, write_json
+
+# ---------------- Config ----------------
+MC_FILE = "data/mc_requests.json"
+STATUSES = ("pending", "approved", "rejected")
+
+
+def _sort_key(record):
+    return (record.get("submitted_at") or "", record["id"])
+
+
+class MCStore:
+    """MC requests with per-status queues and a date-range index.
+
+    The file layout ({nurse_id: [request, ...]}) is unchanged. Each status
+    queue is kept sorted by submission time, so "pending, newest first,
+    page N" is a slice from the end. Approved requests are also indexed by
+    start date for unavailability lookups. The indexes are rebuilt only when
+    the file changes on disk (e.g. another worker wrote it) and are
+    maintained in place for this process's own writes. Writes re-read the
+    file under file_lock.locked, so concurrent workers never drop each
+    other's submissions or decisions.
+    """
+
+    def __init__(self, path=MC_FILE):
+        self.path = path
+        self._loaded = False
+        self._version = None
+        self._data = {}
+        self._by_id = {}
+        self._queues = {s: [] for s in STATUSES}     # status -> sorted [(submitted_at, id)]
+        self._approved_starts = []                    # sorted [(start_date, id)] of approved requests
+        self._longest_approved = 0                    # longest approved span in days, bounds range scans
+        self._lock = threading.RLock()
+
+    # ---------------- loading ----------------
+    def _file_version(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _ensure_loaded(self, force=False):
+        version = self._file_version()
+        if self._loaded and version == self._version and not force:
+            return
+        data = read_json(self.path, dict)
+        self._data = data
+        self._by_id = {r["id"]: r for records in data.values() for r in records}
+        self._queues = {s: [] for s in STATUSES}
+        for record in self._by_id.values():
+            self._queues.setdefault(record.get("status", "pending"), []).append(_sort_key(record))
+        for queue in self._queues.values():
+            queue.sort()
+        self._approved_starts = sorted((r["start_date"] or "", r["id"]) for r in self._by_id.values()
+                                       if r.get("status") == "approved")
+        self._longest_approved = max((_span_days(r) for r in self._by_id.values() if r.get("status") == "approved"),
+                                     default=0)
+        self._version = version
+        self._loaded = True
+
+    def _save(self):
+        write_json(self.path, self._data)
+        self._version = self._file_version()
+
+    # ---------------- reads ----------------
+    def get(self, mc_id):
+        with self._lock:
+            self._ensure_loaded()
+            return self._by_id.get(mc_id)
+
+    def for_nurse(self, nurse_id):
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._data.get(nurse_id, []))
+
+    def page(self, status=None, page=1, per_page=50, start=None, end=None):
+        """Requests newest first, optionally one status and/or overlapping [start, end]. Returns (rows, total).
+
+        Without a date filter this walks the status queue(s) from the newest
+        end, so the cost grows with the page offset rather than with the
+        number of requests; a date filter has to scan the queue.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            queues = [self._queues.get(status, [])] if status else list(self._queues.values())
+            newest_first = heapq.merge(*(reversed(q) for q in queues), reverse=True)
+            offset = (page - 1) * per_page
+            if start or end:
+                matching = (self._by_id[i] for _, i in newest_first if _overlaps(self._by_id[i], start, end))
+                records = list(matching)
+                return records[offset:offset + per_page], len(records)
+            total = sum(len(q) for q in queues)
+            return [self._by_id[i] for _, i in itertools.islice(newest_first, offset, offset + per_page)], total
+
+    def counts(self):
+        with self._lock:
+            self._ensure_loaded()
+            return {s: len(q) for s, q in self._queues.items()}
+
+    def unavailability(self, start=None, end=None):
+        """Approved MC windows overlapping [start, end] (ISO dates), for the scheduler.
+
+        Uses the start-date index: only requests starting before `end` and
+        no more than the longest approved span before `start` are examined.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            lo = 0
+            if start:
+                earliest = _shift_date(start, -self._longest_approved)
+                lo = bisect.bisect_left(self._approved_starts, (earliest, ""))
+            hi = bisect.bisect_right(self._approved_starts, (end, "\uffff")) if end else len(self._approved_starts)
+            windows = []
+            for _, mc_id in self._approved_starts[lo:hi]:
+                record = self._by_id[mc_id]
+                if _overlaps(record, start, end):
+                    windows.append(_window(record))
+            return windows
+
+    # ---------------- writes ----------------
+    def submit(self, record):
+        """Store a new request; ValueError unless its start/end dates are valid ISO dates in order."""
+        if not record.get("start_date") or not record.get("end_date"):
+            raise ValueError("start_date and end_date are required")
+        # Stored normalized, since the date index compares them as strings
+        record["start_date"], record["end_date"] = parse_date_range(record["start_date"], record["end_date"],
+                                                                    names=("start_date", "end_date"))
+        with self._lock, locked(self.path):
+            self._ensure_loaded(force=True)
+            self._data.setdefault(record["nurse_id"], []).append(record)
+            self._by_id[record["id"]] = record
+            bisect.insort(self._queues.setdefault(record["status"], []), _sort_key(record))
+            self._save()
+            return record
+
+    def decide(self, mc_ids, status, decided_by, note=None):
+        """Approve or reject several requests with one write.
+
+        Returns (updated records, {id: error}, unavailability windows created by the approvals).
+        """
+        if status not in ("approved", "rejected"):
+            raise ValueError("status must be approved or rejected")
+        # A bare string would otherwise be decided one character at a time
+        if not isinstance(mc_ids, list) or not all(isinstance(i, str) for i in mc_ids):
+            raise ValueError("ids must be a list of MC request ids")
+        with self._lock, locked(self.path):
+            self._ensure_loaded(force=True)
+            updated, errors = [], {}
+            decided_at = datetime.now().isoformat()
+            for mc_id in dict.fromkeys(mc_ids):
+                record = self._by_id.get(mc_id)
+                if record is None:
+                    errors[mc_id] = "not found"
+                    continue
+                if record.get("status") != "pending":
+                    errors[mc_id] = f"already {record.get('status')}"
+                    continue
+                if status == "approved" and not _valid_dates(record):
+                    # Submitted before dates were validated; approving would publish a window nobody can parse
+                    errors[mc_id] = "invalid start_date/end_date"
+                    continue
+                queue = self._queues["pending"]
+                del queue[bisect.bisect_left(queue, _sort_key(record))]
+                record["status"] = status
+                record["decided_by"] = decided_by
+                record["decided_at"] = decided_at
+                if note:
+                    record["decision_note"] = note
+                bisect.insort(self._queues[status], _sort_key(record))
+                if status == "approved":
+                    bisect.insort(self._approved_starts, (record["start_date"] or "", mc_id))
+                    self._longest_approved = max(self._longest_approved, _span_days(record))
+                updated.append(record)
+            if updated:
+                self._save()
+            windows = [_window(r) for r in updated if status == "approved"]
+            return updated, errors, windows
+
+
+def parse_date_range(start, end, names=('start', 'end')):
+    """(start, end) as ISO dates, either may be None; ValueError unless they are YYYY-MM-DD and in order."""
+    def day(name, value):
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value).isoformat()
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+
+    start, end = day(names[0], start), day(names[1], end)
+    if start and end and end < start:
+        raise ValueError(f"{names[1]} must not be before {names[0]}")
+    return start, end
+
+
+def window_dates(window):
+    """(first, last) dates of an unavailability window, or None (logged) when they do not parse.
+
+    Records approved before submit validated dates can still hold anything,
+    and one of them must not take down every consumer of the MC windows.
+    """
+    try:
+        return date.fromisoformat(window["start_date"]), date.fromisoformat(window["end_date"])
+    except (TypeError, ValueError):
+        print(f"⚠️ Skipping MC {window.get('mc_id')}: invalid dates "
+              f"{window.get('start_date')!r} - {window.get('end_date')!r}")
+        return None
+
+
+def _valid_dates(record):
+    """True when the stored dates are normalized ISO dates in order (end_date may be missing)."""
+    start, end = record.get("start_date"), record.get("end_date")
+    try:
+        return bool(start) and parse_date_range(start, end) == (start, end or None)
+    except ValueError:
+        return False
+
+
+def _shift_date(iso_date, days):
+    return (date.fromisoformat(iso_date) + timedelta(days=days)).isoformat()
+
+
+def _span_days(record):
+    try:
+        start = datetime.fromisoformat(record["start_date"])
+        end = datetime.fromisoformat(record.get("end_date") or record["start_date"])
+    except (TypeError, ValueError):
+        return 0
+    return max((end - start).days, 0)
+
+
+def _overlaps(record, start, end):
+    """ISO dates compare correctly as strings; a missing end date means a one-day MC."""
+    first = record.get("start_date") or ""
+    last = record.get("end_date") or first
+    return (not start or last >= start) and (not end or first <= end)
+
+
+def _window(record):
+    return {
+        "nurse_id": record["nurse_id"],
+        "start_date": record["start_date"],
+        "end_date": record.get("end_date") or record["start_date"],
+        "source": "mc",
+        "mc_id": record["id"],
+    }
+
+
+store = MCStore()
@@ -0,0 +1,225 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from functools import wraps
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+# ---------------- Config ----------------
+MEMPROFILE_ENABLED = os.environ.get('MEMPROFILE', '0') == '1'
+MEMPROFILE_DIR = os.environ.get('MEMPROFILE_DIR', "data/memprofile")
+MEMPROFILE_TOP = int(os.environ.get('MEMPROFILE_TOP', 10))         # allocation sites reported per stage
+MEMPROFILE_FRAMES = int(os.environ.get('MEMPROFILE_FRAMES', 1))    # >1 reports call stacks instead of single lines
+IGNORED_FILES = frozenset((tracemalloc.__file__, __file__,   # the profiler's own snapshots and reports
+                           "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>"))
+
+
+def peak_rss_bytes():
+    """Highest resident set size this process has reached, or None where getrusage is missing."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024   # Linux reports KiB
+
+
+def current_rss_bytes():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _NoopStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+def _noop_mark(stage):
+    pass
+
+
+class _Stage:
+    __slots__ = ("run", "name")
+
+    def __init__(self, run, name):
+        self.run, self.name = run, name
+
+    def __enter__(self):
+        self.run.baseline()
+        return self
+
+    def __exit__(self, *exc):
+        self.run.record(self.name)
+        return False
+
+
+class MemoryRun:
+    """Allocation snapshots taken at the stage boundaries of one run.
+
+    Stages are sequential, not nested. Each reports the memory it left
+    allocated, the tracemalloc peak reached inside it, process RSS, and
+    the allocation sites that grew most since the stage began.
+    """
+
+    def __init__(self, name, top=MEMPROFILE_TOP):
+        self.name = name
+        self.top = top
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.stages = []
+        self._sites = {}
+        self._started = None
+        self.baseline()
+
+    def _take(self):
+        """{site: (size, count)} grouped by line (or call stack), without the profiler's own frames.
+
+        Only the grouped totals are kept between stages, not the raw
+        snapshot, so profiling does not pin a copy of every trace.
+        """
+        key = 'traceback' if MEMPROFILE_FRAMES > 1 else 'lineno'
+        sites = {}
+        for stat in tracemalloc.take_snapshot().statistics(key):
+            if stat.traceback[0].filename not in IGNORED_FILES:
+                sites[stat.traceback] = (stat.size, stat.count)
+        return sites
+
+    def baseline(self):
+        tracemalloc.reset_peak()
+        self._sites = self._take()
+        self._started = time.perf_counter()
+
+    def record(self, stage):
+        seconds = time.perf_counter() - self._started
+        current, peak = tracemalloc.get_traced_memory()
+        sites = self._take()
+        growth = []
+        for traceback, (size, count) in sites.items():
+            before_size, before_count = self._sites.get(traceback, (0, 0))
+            if size > before_size:
+                growth.append((size - before_size, size, count - before_count, traceback))
+        growth.sort(key=lambda g: g[0], reverse=True)
+        self.stages.append({
+            "stage": stage,
+            "seconds": round(seconds, 4),
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "rss_bytes": current_rss_bytes(),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "top_allocations": [{
+                "site": [f"{frame.filename}:{frame.lineno}" for frame in traceback],
+                "size_diff_bytes": size_diff,
+                "size_bytes": size,
+                "count_diff": count_diff,
+            } for size_diff, size, count_diff, traceback in growth[:self.top]],
+        })
+        self._sites = sites
+        self._started = time.perf_counter()
+
+    def report(self):
+        return {
+            "name": self.name,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "traced_peak_bytes": max((s["traced_peak_bytes"] for s in self.stages), default=0),
+            "stages": self.stages,
+        }
+
+
+class MemoryProfiler:
+    """Opt-in (MEMPROFILE=1) memory profiling with one active run per thread.
+
+    Call sites use stage()/laps() unconditionally; without an active run
+    they cost one attribute lookup. tracemalloc is process-wide, so runs
+    overlapping in the app attribute each other's allocations - profile
+    with a single worker and sequential requests.
+    """
+
+    def __init__(self, enabled=MEMPROFILE_ENABLED, directory=MEMPROFILE_DIR):
+        self.enabled = enabled
+        self.directory = directory
+        self._local = threading.local()
+
+    def _active(self):
+        return getattr(self._local, "run", None)
+
+    def begin(self, name):
+        if not self.enabled:
+            return None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMPROFILE_FRAMES)
+        self._local.run = MemoryRun(name)
+        return self._local.run
+
+    def finish(self, final_stage=None):
+        """End this thread's run and write its report; returns the report path.
+
+        `final_stage` names whatever ran since the last stage boundary.
+        """
+        run = self._active()
+        if run is None:
+            return None
+        self._local.run = None
+        if final_stage:
+            run.record(final_stage)
+        report = run.report()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.directory, f"{run.name}_{stamp}_{report['pid']}.json")
+        for target in (path, os.path.join(self.directory, f"{run.name}_latest.json")):
+            with open(target, 'w') as f:
+                json.dump(report, f, indent=2)
+        print(f"🧠 Memory profile for {run.name} written to {path} (peak RSS {_mib(report['peak_rss_bytes'])})")
+        return path
+
+    def stage(self, stage):
+        """Context manager recording one stage of the active run."""
+        run = self._active()
+        if run is None:
+            return _NOOP
+        return _Stage(run, stage)
+
+    def laps(self):
+        """Return mark(stage): each call records allocations since the previous mark (or creation)."""
+        run = self._active()
+        if run is None:
+            return _noop_mark
+        run.baseline()
+        return run.record
+
+    def profiled(self, name):
+        """Decorator running the wrapped view as its own profile run."""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                self.begin(name)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.finish("response")
+            return wrapper
+        return decorate
+
+
+def _mib(value):
+    return "n/a" if value is None else f"{value / (1 << 20):.1f} MiB"
+
+
+memprofile = MemoryProfiler()
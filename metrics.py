@@ -0,0 +1,223 @@
+import bisect
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+# ---------------- Config ----------------
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')   # when set, /api/metrics requires "Authorization: Bearer <token>"
+SCHEDULER_METRICS_FILE = "data/scheduler_metrics.json"   # handed from the scheduling_ai.py subprocess to the app
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HELP = {
+    "http_requests_total": "HTTP requests by route, method and status",
+    "http_request_duration_seconds": "HTTP request latency by route and method",
+    "scheduler_stage_seconds": "Duration of each schedule generation stage",
+    "scheduler_runs_total": "Schedule generation runs by result",
+    "s3_backups_total": "S3 backup runs by result",
+}
+
+
+class _NoopTimer:
+    """Shared stand-in returned when metrics are disabled, so timing sites cost one attribute lookup."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def _noop_mark(stage):
+    pass
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry, name, labels):
+        self.registry, self.name, self.labels = registry, name, labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Registry:
+    """In-process counters and histograms rendered in the Prometheus text format.
+
+    Each gunicorn worker keeps its own registry, like the event bus; a
+    scraper sees the worker that served the scrape. Label sets are keyed
+    as sorted tuples, so label order at the call site does not matter.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._counters = {}     # (name, labels) -> value
+        self._histograms = {}   # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    # ---------------- recording ----------------
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def timer(self, name, **labels):
+        """Context manager observing its block's wall time into histogram `name`."""
+        if not self.enabled:
+            return _NOOP
+        return _Timer(self, name, labels)
+
+    def stage(self, stage):
+        """Time one schedule generation stage."""
+        return self.timer("scheduler_stage_seconds", stage=stage)
+
+    def laps(self, name="scheduler_stage_seconds", label="stage"):
+        """Return mark(stage): each call records the time since the previous mark (or creation)."""
+        if not self.enabled:
+            return _noop_mark
+        last = [time.perf_counter()]
+
+        def mark(stage):
+            now = time.perf_counter()
+            self.observe(name, now - last[0], **{label: stage})
+            last[0] = now
+        return mark
+
+    def timed(self, name, **labels):
+        """Decorator form of timer()."""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    # ---------------- exchange with subprocesses ----------------
+    def dump(self, path):
+        """Write this registry's series to `path` so another process can merge them."""
+        if not self.enabled:
+            return
+        with self._lock:
+            payload = {
+                "buckets": self.buckets,
+                "counters": [[name, labels, value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, labels, series] for (name, labels), series in self._histograms.items()],
+            }
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(payload, f)
+
+    def merge_file(self, path):
+        """Add the series dumped at `path` into this registry, then remove the file."""
+        if not self.enabled or not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r') as f:
+                payload = json.load(f)
+        finally:
+            os.remove(path)
+        if tuple(payload.get("buckets", ())) != self.buckets:
+            return False
+        with self._lock:
+            for name, labels, value in payload["counters"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, labels, series in payload["histograms"]:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                current = self._histograms.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, value in enumerate(series):
+                    current[i] += value
+        return True
+
+    # ---------------- exposition ----------------
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), series in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(series[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def instrument_app(flask_app, registry=None):
+    """Count and time every request by route template (not raw path, to keep label sets bounded)."""
+    registry = registry or metrics
+    if not registry.enabled:
+        return
+    from flask import g, request
+
+    @flask_app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @flask_app.after_request
+    def _record(response):
+        started = getattr(g, '_metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            registry.observe("http_request_duration_seconds", time.perf_counter() - started,
+                             route=route, method=request.method)
+            registry.inc("http_requests_total", route=route, method=request.method, status=str(response.status_code))
+        return response
+
+
+metrics = Registry()
@@ -1,31 +1,43 @@
 from flask import Blueprint, request, jsonify
-import json
-import pandas as pd
 import os
+import threading
 from datetime import datetime, timedelta
+from http_cache import cached_json
+from lazy_imports import lazy_import
+from nurse_directory import directory
+from reconciliation import ROSTER_CSV, ROSTER_EXCEL, roster_version
+
+pd = lazy_import("pandas")
 
 app = Blueprint('api', __name__)
 
-# Load models once at startup
-models = None
-try:
-    from scheduling_ai import load_models, predict_next_week, schedule_nurses_optimized
-    models = load_models()
-    print("✅ Models loaded successfully")
-except Exception as e:
-    print(f"❌ Error loading models: {e}")
-    print("⚠️  API will work with mock data")
+# Models load once, on the first route that needs them (or in the gunicorn master via app.warm_state)
+_models = None
+_models_lock = threading.Lock()
+
+def get_models():
+    global _models
+    with _models_lock:
+        if _models is None:
+            try:
+                from scheduling_ai import load_models
+                _models = load_models()
+                print("✅ Models loaded successfully")
+            except Exception as e:
+                _models = False
+                print(f"❌ Error loading models: {e}")
+                print("⚠️  API will work with mock data")
+    return _models or None
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "models_loaded": models is not None})
+    return jsonify({"status": "healthy", "models_loaded": bool(_models)})
 
 @app.route('/nurses', methods=['GET'])
 def get_nurses():
     try:
-        with open("csv/nurse_database.json", "r", encoding="utf-8") as f:
-            nurses = json.load(f)
-        return jsonify({"nurses": nurses})
+        snapshot = directory.snapshot()
+        return cached_json("nurses", snapshot.version, lambda: {"nurses": list(snapshot.nurses)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -39,11 +51,11 @@ def generate_schedule():
         df = pd.read_csv("dataset/covid_dataset.csv", parse_dates=["Date"], dayfirst=True)
         
         # Load nurses
-        with open("csv/nurse_database.json", "r", encoding="utf-8") as f:
-            nurses = json.load(f)
+        nurses = list(directory.snapshot().nurses)
         
         # Predict demand
-        week_demand = predict_next_week(df, models, days=days)
+        from scheduling_ai import predict_next_week, schedule_nurses_optimized
+        week_demand = predict_next_week(df, get_models(), days=days)
         
         # Generate schedule
         wards = ["ED", "GW", "ICU"]
@@ -70,28 +82,69 @@ def generate_schedule():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Published roster frame, re-read only when the files change: (versions, frame)
+_published = (None, None)
+_published_lock = threading.Lock()
+
+def published_roster():
+    global _published
+    versions = roster_version()
+    with _published_lock:
+        if _published[0] != versions:
+            # Excel first, like /api/schedule/full
+            if versions[0] is not None:
+                frame = pd.read_excel(ROSTER_EXCEL, sheet_name="Schedule")
+            else:
+                frame = pd.read_csv(ROSTER_CSV)
+            _published = (versions, frame)
+        return _published[1]
+
+def published_nurse_schedule(nurse):
+    """One nurse's row of the published roster; LookupError if they are not on it."""
+    roster = published_roster()
+    # Match on Nurse_ID: names repeat
+    rows = roster[roster['Nurse_ID'].astype(str) == str(nurse['id'])]
+    if rows.empty:
+        raise LookupError(nurse['id'])
+    return {
+        "nurse_id": nurse['id'],
+        "nurse_name": nurse.get("name", f"ID {nurse['id']}"),
+        "schedule": rows.iloc[0].to_dict()
+    }
+
 @app.route('/nurse/<nurse_id>/schedule', methods=['GET'])
 def get_nurse_schedule(nurse_id):
     try:
-        # Generate current week schedule (simplified)
+        snapshot = directory.snapshot()
+        nurse = snapshot.get(nurse_id)
+        if not nurse:
+            return jsonify({"error": "Nurse not found"}), 404
+        
+        # Serve the published roster when there is one: cacheable, and the same week everyone else sees
+        versions = roster_version()
+        if versions != (None, None):
+            try:
+                return cached_json(("nurse_schedule", nurse_id), (versions, snapshot.version),
+                                   lambda: published_nurse_schedule(nurse))
+            except LookupError:
+                return jsonify({"error": "Schedule not found for nurse"}), 404
+        
+        # Nothing published yet: generate current week schedule (simplified)
         df = pd.read_csv("dataset/covid_dataset.csv", parse_dates=["Date"], dayfirst=True)
-        with open("csv/nurse_database.json", "r", encoding="utf-8") as f:
-            nurses = json.load(f)
+        nurses = list(directory.snapshot().nurses)
         
-        week_demand = predict_next_week(df, models, days=7)
+        from scheduling_ai import predict_next_week, schedule_nurses_optimized
+        week_demand = predict_next_week(df, get_models(), days=7)
         wards = ["ED", "GW", "ICU"]
         shifts = ["Morning", "Evening", "Night"]
         schedule_df, _, _ = schedule_nurses_optimized(week_demand, nurses, wards, shifts)
         
         if schedule_df is not None:
-            # Find nurse by ID
-            nurse = next((n for n in nurses if str(n["id"]) == str(nurse_id)), None)
-            if not nurse:
-                return jsonify({"error": "Nurse not found"}), 404
-            
             nurse_name = nurse.get("name", f"ID {nurse['id']}")
-            if nurse_name in schedule_df.index:
-                nurse_schedule = schedule_df.loc[nurse_name].to_dict()
+            # Match on Nurse_ID: the frame is indexed by name and names repeat
+            nurse_rows = schedule_df[schedule_df['Nurse_ID'].astype(str) == str(nurse['id'])]
+            if not nurse_rows.empty:
+                nurse_schedule = nurse_rows.iloc[0].to_dict()
                 return jsonify({
                     "nurse_id": nurse_id,
                     "nurse_name": nurse_name,
@@ -75,6 +75,7 @@ async function loadStatus() {
             }
             
             updateStatusDisplay(data);
+            subscribeToEvents();
         } else {
             window.location.href = 'login.html';
         }
@@ -747,7 +748,7 @@ async function viewEmergencyCalls() {
         if (response.ok) {
             if (data.count === 0) {
                 document.getElementById('adminResults').innerHTML = `
-                    <div class="success">✅ No active emergency calls</div>
+                    <div class="success emergency-calls-empty">✅ No active emergency calls</div>
                 `;
             } else {
                 let html = `<div class="emergency-calls-list"><h4>🚨 Active Emergency Calls (${data.count})</h4>`;
@@ -788,7 +789,57 @@ async function viewEmergencyCalls() {
     hideLoading();
 }
 
+// Live updates (server-sent events)
+let eventSource = null;
+
+function subscribeToEvents() {
+    if (eventSource || !window.EventSource || !currentUser) {
+        return;
+    }
+    
+    // The browser resends Last-Event-ID on reconnect, so missed events are replayed
+    eventSource = new EventSource(`${API_BASE}/events`, { withCredentials: true });
+    
+    eventSource.addEventListener('emergency_call', (e) => {
+        const call = JSON.parse(e.data);
+        showNotification(`🚨 ${(call.emergency_type || 'Emergency').toUpperCase()} - ${call.ward} Ward (${call.nurse_name})`);
+        refreshEmergencyListIfOpen();
+    });
+    
+    eventSource.addEventListener('emergency_solved', () => {
+        refreshEmergencyListIfOpen();
+    });
+    
+    eventSource.addEventListener('schedule_published', (e) => {
+        const info = JSON.parse(e.data);
+        showNotification(`📅 New schedule published${info.week_start ? ' for week starting ' + info.week_start : ''}`);
+    });
+    
+    eventSource.addEventListener('resync', () => {
+        refreshEmergencyListIfOpen();
+    });
+    
+    // A 503 (stream slots full) closes the EventSource for good; try again later
+    eventSource.onerror = () => {
+        if (eventSource && eventSource.readyState === EventSource.CLOSED) {
+            eventSource = null;
+            setTimeout(subscribeToEvents, 30000);
+        }
+    };
+}
+
+function refreshEmergencyListIfOpen() {
+    if (document.querySelector('#adminResults .emergency-calls-list, #adminResults .emergency-calls-empty')) {
+        viewEmergencyCalls();
+    }
+}
+
 async function logout() {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
+
     try {
         await fetch(`${API_BASE}/logout`, {
             method: 'POST',
@@ -0,0 +1,138 @@
+import bisect
+import difflib
+import json
+import os
+import re
+import threading
+
+# ---------------- Config ----------------
+NURSE_JSON = "csv/nurse_database.json"
+FUZZY_CUTOFF = 0.75   # difflib ratio for typo-tolerant name matches
+
+
+class FrozenRecord(dict):
+    """Read-only nurse record. Still a dict, so jsonify and json.dumps work unchanged."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("nurse directory records are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        # dict's default pickling replays __setitem__, which is blocked here
+        return (FrozenRecord, (dict(self),))
+
+
+def _freeze(nurse):
+    return FrozenRecord({k: tuple(v) if isinstance(v, list) else v for k, v in nurse.items()})
+
+
+def normalize_name(name):
+    """Lowercase and strip punctuation so 'Nur  Syuhada' and 'nur syuhada,' compare equal."""
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", str(name).lower()).split())
+
+
+class DirectorySnapshot:
+    """Immutable view of the nurse database with precomputed indexes."""
+
+    def __init__(self, nurses, version):
+        self.version = version
+        self.nurses = tuple(_freeze(n) for n in nurses)
+        self.by_id = {str(n["id"]): n for n in self.nurses}
+
+        by_ward, by_grade = {}, {}
+        for n in self.nurses:
+            by_ward.setdefault(n.get("department"), []).append(n)
+            by_grade.setdefault(n.get("grade"), []).append(n)
+        self.by_ward = {k: tuple(v) for k, v in by_ward.items()}
+        self.by_grade = {k: tuple(v) for k, v in by_grade.items()}
+
+        # Sorted (token, id) pairs: a prefix query is one bisect plus a short scan
+        tokens = set()
+        for n in self.nurses:
+            for token in normalize_name(n.get("name", "")).split():
+                tokens.add((token, str(n["id"])))
+        self._tokens = sorted(tokens)
+        self._token_keys = [t for t, _ in self._tokens]
+        self._vocabulary = sorted(set(self._token_keys))
+
+    def __len__(self):
+        return len(self.nurses)
+
+    def get(self, nurse_id):
+        return self.by_id.get(str(nurse_id))
+
+    def in_ward(self, ward):
+        return self.by_ward.get(ward, ())
+
+    def with_grade(self, grade):
+        return self.by_grade.get(grade, ())
+
+    def _ids_with_prefix(self, prefix):
+        ids = set()
+        i = bisect.bisect_left(self._token_keys, prefix)
+        while i < len(self._tokens) and self._token_keys[i].startswith(prefix):
+            ids.add(self._tokens[i][1])
+            i += 1
+        return ids
+
+    def search_name(self, query, fuzzy=True):
+        """Return nurses whose name tokens start with every token of the query.
+
+        'nur sy' matches 'Nur Syuhada'. When nothing matches by prefix and
+        fuzzy is set, each query token is widened to close spellings.
+        """
+        query_tokens = normalize_name(query).split()
+        if not query_tokens:
+            return ()
+
+        matched = None
+        for token in query_tokens:
+            ids = self._ids_with_prefix(token)
+            if not ids and fuzzy:
+                for close in difflib.get_close_matches(token, self._vocabulary, n=5, cutoff=FUZZY_CUTOFF):
+                    ids |= self._ids_with_prefix(close)
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                return ()
+
+        # Keep database order so results are stable between calls
+        return tuple(n for n in self.nurses if str(n["id"]) in matched)
+
+
+class NurseDirectory:
+    """Loads the nurse database once and reloads it only when the file's mtime changes."""
+
+    def __init__(self, path=NURSE_JSON):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _file_version(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def snapshot(self):
+        """Return the current snapshot, rebuilding it if the file changed on disk."""
+        version = self._file_version()
+        current = self._snapshot
+        if current is not None and current.version == version:
+            return current
+
+        with self._lock:
+            if self._snapshot is not None and self._snapshot.version == version:
+                return self._snapshot
+            if version is None:
+                nurses = []
+            else:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    nurses = json.load(f)
+            self._snapshot = DirectorySnapshot(nurses, version)
+            return self._snapshot
+
+
+directory = NurseDirectory()
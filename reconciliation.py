@@ -0,0 +1,377 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+from attendance_analytics import (ATTENDANCE_FILE, CONFIG_FILE, DEFAULT_PAGE_SIZE, LATE_GRACE_MINUTES, MAX_PAGE_SIZE,
+                                  _file_version)
+from lazy_imports import lazy_import
+from nurse_directory import directory
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ---------------- Config ----------------
+ROSTER_CSV = "output_schedule.csv"
+ROSTER_EXCEL = "output_schedule.xlsx"
+PARTIAL_THRESHOLD = 0.9        # worked share of a shift below which it is flagged partial
+SLOT_PATTERN = re.compile(r"^\w+ (\d{4}-\d{2}-\d{2}) (\w+)$")   # "Monday 2025-10-20 Night"
+
+STATUSES = ("completed", "partial", "no_show", "missing_checkout", "in_progress", "not_checked_in",
+            "upcoming", "unscheduled")
+
+
+def shift_windows(path=CONFIG_FILE):
+    """{shift: (start minute of day, length in minutes)}; a Night shift 23:00-07:00 is 480 minutes long."""
+    with open(path, 'r') as f:
+        shifts = json.load(f).get("shifts", {})
+    windows = {}
+    for name, times in shifts.items():
+        start = sum(int(x) * m for x, m in zip(times["start"].split(":")[:2], (60, 1)))
+        end = sum(int(x) * m for x, m in zip(times["end"].split(":")[:2], (60, 1)))
+        windows[name] = (start, (end - start) % (24 * 60) or 24 * 60)
+    return windows
+
+
+def roster_version():
+    """(Excel, CSV) file versions of the published roster; (None, None) when none is published."""
+    return (_file_version(ROSTER_EXCEL), _file_version(ROSTER_CSV))
+
+
+def load_roster():
+    if os.path.exists(ROSTER_CSV):
+        return pd.read_csv(ROSTER_CSV)
+    if os.path.exists(ROSTER_EXCEL):
+        return pd.read_excel(ROSTER_EXCEL, sheet_name="Schedule")
+    return None
+
+
+def expand_roster(roster, windows):
+    """Turn the wide roster (one column per day+shift) into one row per rostered shift interval."""
+    columns = ["nurse_id", "ward", "shift", "start", "end"]
+    if roster is None or "Nurse_ID" not in roster:
+        return pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c in ("start", "end") else object)
+                             for c in columns})
+    slots = [c for c in roster.columns if SLOT_PATTERN.match(str(c))]
+    long = roster.melt(id_vars=["Nurse_ID"], value_vars=slots, var_name="slot", value_name="assignment")
+    assignment = long["assignment"].astype(str)
+    long = long[assignment.str.startswith("On Duty")]
+    parts = long["slot"].str.extract(r"(\d{4}-\d{2}-\d{2}) (\w+)$")
+    shift = parts[1]
+    known = shift.isin(list(windows))
+    long, parts, shift = long[known], parts[known], shift[known]
+
+    start = pd.to_datetime(parts[0], format="%Y-%m-%d") + pd.to_timedelta(shift.map(lambda s: windows[s][0]), unit="m")
+    end = start + pd.to_timedelta(shift.map(lambda s: windows[s][1]), unit="m")
+    return pd.DataFrame({
+        "nurse_id": long["Nurse_ID"].astype(str).to_numpy(),
+        "ward": long["assignment"].str.replace("On Duty - ", "", regex=False).to_numpy(),
+        "shift": shift.to_numpy(),
+        "start": start.to_numpy(),
+        "end": end.to_numpy(),
+    }, columns=columns)
+
+
+def attendance_intervals(attendance, first_id=0):
+    """One [checkin, checkout) interval per attendance record; checkout is NaT while still checked in.
+
+    Records are keyed by check-in date. A check-out on the next day (Night
+    shift) is taken from checkout_date, or inferred for older records whose
+    check-out time is earlier than the check-in time.
+    """
+    records = [(nurse_id, day, r['checkin'], r.get('checkout'), r.get('checkout_date') or day)
+               for nurse_id, days in attendance.items() for day, r in days.items() if r.get('checkin')]
+    df = pd.DataFrame(records, columns=["nurse_id", "date", "checkin", "checkout", "checkout_date"])
+    checkin = pd.to_datetime(df["date"] + " " + df["checkin"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    checkout = pd.to_datetime(df["checkout_date"] + " " + df["checkout"].fillna(""),
+                              format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    checkout = checkout.where(~(checkout < checkin), checkout + pd.Timedelta(days=1))
+    events = pd.DataFrame({"nurse_id": df["nurse_id"].astype(str), "checkin": checkin, "checkout": checkout})
+    events = events.dropna(subset=["checkin"]).reset_index(drop=True)
+    events["event_id"] = np.arange(first_id, first_id + len(events))
+    return events
+
+
+def _ns(values):
+    return values.to_numpy(dtype="datetime64[ns]").view("i8")
+
+
+_NAT = -(1 << 63)   # NaT as int64 (np.iinfo(np.int64).min), literal so the import stays lazy
+
+
+def match_shifts(shifts, events):
+    """Interval join: attach to each shift the attendance interval that overlaps it most.
+
+    Two as-of joins per nurse give the candidates: the last check-in at or
+    before the shift start (on time, early, or one long double shift) and
+    the first check-in after it (late arrivals). Returns shifts with
+    event_id/checkin/checkout, NaN/NaT when nothing overlaps.
+    """
+    left = shifts.sort_values("start").reset_index(drop=True)
+    right = events.sort_values("checkin")[["nurse_id", "checkin", "checkout", "event_id"]]
+    if left.empty or right.empty:
+        return left.assign(event_id=np.nan, checkin=pd.NaT, checkout=pd.NaT).astype(
+            {"event_id": float, "checkin": "datetime64[ns]", "checkout": "datetime64[ns]"})
+    start, end = _ns(left["start"]), _ns(left["end"])
+    candidates = []
+    for direction in ("backward", "forward"):
+        joined = pd.merge_asof(left, right, left_on="start", right_on="checkin", by="nurse_id", direction=direction)
+        checkin, checkout = _ns(joined["checkin"]), _ns(joined["checkout"])
+        # An open check-in covers the shift up to its end for matching purposes
+        out = np.where(checkout == _NAT, end, np.minimum(checkout, end))
+        overlap = np.where(checkin == _NAT, 0, np.clip(out - np.maximum(checkin, start), 0, None))
+        candidates.append((joined["event_id"].to_numpy(dtype=float), checkin, checkout, overlap))
+    (b_id, b_in, b_out, b_overlap), (f_id, f_in, f_out, f_overlap) = candidates
+    forward = f_overlap > b_overlap
+    none = np.maximum(b_overlap, f_overlap) <= 0
+    left["event_id"] = np.where(none, np.nan, np.where(forward, f_id, b_id))
+    left["checkin"] = np.where(none, _NAT, np.where(forward, f_in, b_in)).view("datetime64[ns]")
+    left["checkout"] = np.where(none, _NAT, np.where(forward, f_out, b_out)).view("datetime64[ns]")
+    return left
+
+
+def classify(matches, events, now, partial_threshold=PARTIAL_THRESHOLD, grace=LATE_GRACE_MINUTES):
+    """Vectorized status per rostered shift, plus one 'unscheduled' row per attendance outside every shift."""
+    m = matches
+    now_ns = pd.Timestamp(now).value
+    start, end, checkin, checkout = _ns(m["start"]), _ns(m["end"]), _ns(m["checkin"]), _ns(m["checkout"])
+    matched = checkin != _NAT
+    open_checkin = matched & (checkout == _NAT)
+    started = start <= now_ns
+    ended = end <= now_ns
+
+    out = np.where(checkout == _NAT, np.minimum(end, now_ns), checkout)
+    worked = np.where(matched, np.clip(np.minimum(out, end) - np.maximum(checkin, start), 0, None), 0) / 1e9
+    coverage = worked / ((end - start) / 1e9) if len(m) else np.zeros(0)
+    late = np.where(matched, (checkin - start) / 6e10, 0)
+
+    status = np.select(
+        [~started,
+         open_checkin & ~ended,
+         open_checkin & ended,
+         matched & (coverage >= partial_threshold),
+         matched,
+         ended],
+        ["upcoming", "in_progress", "missing_checkout", "completed", "partial", "no_show"],
+        default="not_checked_in",
+    )
+    shifts = pd.DataFrame({
+        "nurse_id": m["nurse_id"].to_numpy(),
+        "ward": m["ward"].to_numpy(),
+        "shift": m["shift"].to_numpy(),
+        "start": m["start"].to_numpy(),
+        "end": m["end"].to_numpy(),
+        "checkin": m["checkin"].to_numpy(),
+        "checkout": m["checkout"].to_numpy(),
+        "status": status,
+        "worked_hours": worked / 3600,
+        "coverage": coverage,
+        "late_minutes": np.where(late > grace, late, 0.0),
+    })
+
+    extra = events[~events["event_id"].isin(m["event_id"].dropna().to_numpy())]
+    extra_in, extra_out = _ns(extra["checkin"]), _ns(extra["checkout"])
+    unscheduled = pd.DataFrame({
+        "nurse_id": extra["nurse_id"].to_numpy(),
+        "ward": None,
+        "shift": None,
+        "start": pd.NaT,
+        "end": pd.NaT,
+        "checkin": extra["checkin"].to_numpy(),
+        "checkout": extra["checkout"].to_numpy(),
+        "status": "unscheduled",
+        "worked_hours": (np.where(extra_out == _NAT, now_ns, extra_out) - extra_in) / 3.6e12,
+        "coverage": np.nan,
+        "late_minutes": 0.0,
+    })
+    return pd.concat([shifts, unscheduled], ignore_index=True) if len(unscheduled) else shifts
+
+
+class Reconciler:
+    """Keeps the roster/attendance join up to date incrementally.
+
+    Inputs are reparsed only when their files change. Attendance intervals
+    and the join are kept per nurse and rebuilt only for nurses whose
+    attendance records or rostered shifts changed, so a new check-in re-joins
+    one nurse. Classification depends on the current time and is recomputed,
+    vectorized, on every call.
+    """
+
+    def __init__(self, attendance_path=ATTENDANCE_FILE, config_path=CONFIG_FILE):
+        self.attendance_path = attendance_path
+        self.config_path = config_path
+        self._versions = (None, None)
+        self._shifts = None   # empty frames are built on first use, so importing this module stays cheap
+        self._shift_fingerprints = {}
+        self._attendance = {}
+        self._events = None
+        self._matches = None
+        self._next_event_id = 0
+        self._lock = threading.Lock()
+
+    def _ensure_frames(self):
+        if self._shifts is None:
+            self._shifts = expand_roster(None, {})
+            self._events = attendance_intervals({})
+            self._matches = match_shifts(self._shifts, self._events)
+
+    def refresh(self):
+        """Reload whichever input files changed and re-join the nurses they affect. Returns the number re-joined."""
+        roster_version = tuple(_file_version(p) for p in (self.config_path, ROSTER_CSV, ROSTER_EXCEL))
+        attendance_version = _file_version(self.attendance_path)
+        if (roster_version, attendance_version) == self._versions:
+            return 0
+        shifts = None
+        if roster_version != self._versions[0]:
+            shifts = expand_roster(load_roster(), shift_windows(self.config_path))
+        attendance = None
+        if attendance_version != self._versions[1]:
+            attendance = {}
+            if attendance_version is not None:
+                with open(self.attendance_path, 'r') as f:
+                    attendance = json.load(f)
+        changed = self.update(shifts, attendance)
+        self._versions = (roster_version, attendance_version)
+        return changed
+
+    def update(self, shifts=None, attendance=None):
+        """Re-join only the nurses whose shifts or attendance records differ from the last update.
+
+        `attendance` is the raw {nurse_id: {date: record}} dict. Nurses are
+        compared by their record dicts, so pass new dicts for changed nurses
+        rather than mutating the previous ones in place.
+        """
+        with self._lock:
+            self._ensure_frames()
+            changed = set()
+            if shifts is not None:
+                fingerprints = pd.util.hash_pandas_object(shifts, index=False).groupby(
+                    shifts["nurse_id"].to_numpy()).sum().to_dict()
+                changed |= {n for n in fingerprints.keys() | self._shift_fingerprints.keys()
+                            if fingerprints.get(n) != self._shift_fingerprints.get(n)}
+                self._shifts, self._shift_fingerprints = shifts, fingerprints
+            if attendance is not None:
+                touched = {n for n in attendance.keys() | self._attendance.keys()
+                           if attendance.get(n) != self._attendance.get(n)}
+                fresh = attendance_intervals({n: attendance[n] for n in touched if n in attendance},
+                                             first_id=self._next_event_id)
+                self._next_event_id += len(fresh)
+                kept = self._events[~self._events["nurse_id"].isin(touched)]
+                self._events = pd.concat([kept, fresh], ignore_index=True) if len(fresh) else kept
+                self._attendance = attendance
+                changed |= touched
+            if not changed:
+                return 0
+
+            redo = match_shifts(self._shifts[self._shifts["nurse_id"].isin(changed)],
+                                self._events[self._events["nurse_id"].isin(changed)])
+            kept = self._matches[~self._matches["nurse_id"].isin(changed)]
+            self._matches = pd.concat([kept, redo], ignore_index=True) if len(redo) else kept
+            return len(changed)
+
+    def results(self, now=None):
+        """Classify the current join as of `now`."""
+        with self._lock:
+            self._ensure_frames()
+            matches, events = self._matches, self._events
+        return classify(matches, events, now or datetime.now())
+
+    def report(self, nurse_id=None, ward=None, start=None, end=None, status=None, page=1, per_page=DEFAULT_PAGE_SIZE):
+        """Filtered, paginated reconciliation rows with a count per status."""
+        page = max(int(page), 1)
+        per_page = min(max(int(per_page), 1), MAX_PAGE_SIZE)
+        if status and status not in STATUSES:
+            raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+        self.refresh()
+        rows = self.results()
+        when = rows["start"].fillna(rows["checkin"])
+        mask = np.ones(len(rows), dtype=bool)
+        if nurse_id:
+            mask &= (rows["nurse_id"] == nurse_id).to_numpy()
+        if ward:
+            ids = [str(n["id"]) for n in directory.snapshot().in_ward(ward)]
+            mask &= ((rows["ward"] == ward) | (rows["ward"].isna() & rows["nurse_id"].isin(ids))).to_numpy()
+        if start:
+            mask &= (when >= pd.Timestamp(start)).to_numpy()
+        if end:
+            mask &= (when < pd.Timestamp(end) + pd.Timedelta(days=1)).to_numpy()
+        rows = rows[mask]
+        counts = rows["status"].value_counts().to_dict()
+        if status:
+            rows = rows[rows["status"] == status]
+        rows = rows.assign(_when=when[mask]).sort_values(["_when", "nurse_id"], ascending=[False, True])
+        total = len(rows)
+        page_rows = rows.iloc[(page - 1) * per_page:page * per_page].drop(columns="_when")
+        return {
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "pages": -(-total // per_page),
+            "counts": {s: int(counts.get(s, 0)) for s in STATUSES},
+            "rows": [_json_row(r) for r in page_rows.to_dict("records")],
+        }
+
+
+def _json_row(row):
+    out = {}
+    for key, value in row.items():
+        if value is None or value is pd.NaT or (isinstance(value, float) and np.isnan(value)):
+            value = None
+        elif isinstance(value, pd.Timestamp):
+            value = value.strftime("%Y-%m-%d %H:%M:%S")
+        elif isinstance(value, (float, np.floating)):
+            value = round(float(value), 2)
+        out[key] = value
+    return out
+
+
+reconciler = Reconciler()
+
+
+if __name__ == "__main__":
+    # Synthetic month for a 1,000-nurse hospital: full build, then one new check-in
+    import time
+
+    nurses, days = 1000, 30
+    rng = np.random.default_rng(7)
+    windows = shift_windows()
+    names = list(windows)
+    base = pd.Timestamp("2025-10-01")
+    columns = {"Nurse_ID": [f"N{i:05d}" for i in range(nurses)]}
+    for d in range(days):
+        day = base + pd.Timedelta(days=d)
+        pick = rng.integers(0, 4, nurses)   # 0-2: that shift, 3: off
+        for s, name in enumerate(names):
+            columns[f"{day:%A} {day:%Y-%m-%d} {name}"] = np.where(pick == s, "On Duty - GW", "Off")
+    roster = pd.DataFrame(columns)
+
+    t = time.perf_counter()
+    shifts = expand_roster(roster, windows)
+    attendance = {}
+    for row in shifts.itertuples():
+        if rng.random() < 0.05:
+            continue   # no-show
+        checkin = row.start + pd.Timedelta(minutes=int(rng.integers(-20, 30)))
+        checkout = row.end + pd.Timedelta(minutes=int(rng.integers(-60, 30)))
+        attendance.setdefault(row.nurse_id, {})[f"{checkin:%Y-%m-%d}"] = {
+            "checkin": f"{checkin:%H:%M:%S}", "checkout": f"{checkout:%H:%M:%S}",
+            "checkout_date": f"{checkout:%Y-%m-%d}", "status": "checked_out"}
+    print(f"Synthetic data: {len(shifts)} rostered shifts, "
+          f"{sum(len(v) for v in attendance.values())} attendance records ({time.perf_counter() - t:.1f}s to generate)")
+
+    reconciler = Reconciler()
+    now = base + pd.Timedelta(days=days)
+    t = time.perf_counter()
+    reconciler.update(shifts, attendance)
+    rows = reconciler.results(now)
+    print(f"Full reconciliation: {(time.perf_counter() - t) * 1000:.0f} ms")
+    print(rows["status"].value_counts().to_dict())
+
+    nurse = shifts["nurse_id"].iloc[0]
+    day = f"{base + pd.Timedelta(days=days - 1):%Y-%m-%d}"
+    attendance = dict(attendance, **{nurse: dict(attendance.get(nurse, {}), **{day: {"checkin": "06:55:00"}})})
+    t = time.perf_counter()
+    redone = reconciler.update(attendance=attendance)
+    reconciler.results(now)
+    print(f"Incremental (1 new check-in, {redone} nurse re-joined): {(time.perf_counter() - t) * 1000:.0f} ms")
@@ -0,0 +1,294 @@
+import json
+import threading
+from datetime import date, datetime, timedelta
+
+from attendance_analytics import CONFIG_FILE, _file_version
+from availability import availability
+from lazy_imports import lazy_import
+from mc_store import store as mc_store, window_dates
+from nurse_directory import NURSE_JSON, directory
+from reconciliation import ROSTER_CSV, ROSTER_EXCEL, shift_windows
+from swap_matcher import FORBIDDEN_SEQUENCES, can_work_ward, matcher as swap_matcher
+
+np = lazy_import("numpy")
+
+# ---------------- Config ----------------
+DEFAULT_LIMIT = 10
+NOT_ON_LADDER = 32767   # int16 max, kept literal so importing this module does not load numpy
+
+
+def load_grade_ladder(path=CONFIG_FILE):
+    """{grade: (grade, substitutes...)} from grade_replacement; a grade always covers itself first."""
+    with open(path, 'r') as f:
+        ladder = json.load(f).get("grade_replacement", {})
+    return {grade: (grade,) + tuple(g for g in subs if g != grade) for grade, subs in ladder.items()}
+
+
+def slot_at(now, windows):
+    """(date, shift) running at `now`; a Night shift after midnight belongs to the previous date."""
+    minute = now.hour * 60 + now.minute
+    for shift, (start, length) in windows.items():
+        since = (minute - start) % (24 * 60)
+        if since < length:
+            return ((now - timedelta(minutes=since)).date().isoformat(), shift)
+    return None
+
+
+class ReplacementIndex:
+    """Precomputed availability bitmap and grade ladder for replacement queries.
+
+    on_duty is a nurses x days x shifts boolean array over `dates` built
+    from `duty` ({nurse_id: [(date, shift)]}), and MC absences are a nurses x days array. Weekly hours and shift
+    counts are summed once. A query is then a handful of vectorized mask
+    operations over all nurses plus a sort of the survivors.
+    """
+
+    def __init__(self, nurses, dates, duty, windows, ladder, unavailability, max_weekly_hours):
+        self.nurses = list(nurses)
+        self.ids = np.array([str(n["id"]) for n in self.nurses], dtype=object)
+        self.position = {nurse_id: i for i, nurse_id in enumerate(self.ids)}
+        self.shifts = list(windows)
+        self.shift_hours = np.array([windows[s][1] / 60 for s in self.shifts])
+        self.max_weekly_hours = max_weekly_hours
+        self.dates = list(dates)
+        self.day_index = {day: i for i, day in enumerate(self.dates)}
+
+        count, days = len(self.nurses), len(self.dates)
+        self.on_duty = np.zeros((count, days, len(self.shifts)), dtype=bool)
+        shift_index = {s: i for i, s in enumerate(self.shifts)}
+        for nurse_id, duties in duty.items():
+            i = self.position.get(nurse_id)
+            if i is None:
+                continue
+            for day, shift in duties:
+                if day in self.day_index and shift in shift_index:
+                    self.on_duty[i, self.day_index[day], shift_index[shift]] = True
+        self.busy_day = self.on_duty.any(axis=2)
+
+        weeks = sorted({_week(day) for day in self.dates})
+        self.week_index = {week: i for i, week in enumerate(weeks)}
+        day_week = np.array([self.week_index[_week(day)] for day in self.dates], dtype=int)
+        per_day_hours = (self.on_duty * self.shift_hours).sum(axis=2)
+        self.week_hours = np.zeros((count, len(weeks)))
+        self.week_shifts = np.zeros((count, len(weeks)), dtype=int)
+        for w in range(len(weeks)):
+            self.week_hours[:, w] = per_day_hours[:, day_week == w].sum(axis=1)
+            self.week_shifts[:, w] = self.busy_day[:, day_week == w].sum(axis=1)
+
+        # MC absences inside the roster go in the bitmap; ones outside it are kept per date
+        self.absent = np.zeros((count, days), dtype=bool)
+        self.absent_outside = {}
+        for window in unavailability:
+            i = self.position.get(window["nurse_id"])
+            dates = window_dates(window) if i is not None else None
+            if dates is None:
+                continue
+            day, last = dates
+            while day <= last:
+                iso = day.isoformat()
+                if iso in self.day_index:
+                    self.absent[i, self.day_index[iso]] = True
+                else:
+                    self.absent_outside.setdefault(iso, set()).add(i)
+                day += timedelta(days=1)
+
+        self.grades = np.array([n.get("grade") for n in self.nurses], dtype=object)
+        self.departments = np.array([n.get("department") for n in self.nurses], dtype=object)
+        self.preferred = np.array([n.get("preferred_shifts") for n in self.nurses], dtype=object)
+        self.seniority = np.array([n.get("seniority") or 0 for n in self.nurses], dtype=float)
+        self.max_shifts = np.array([n.get("max_shifts_per_week", 7) for n in self.nurses], dtype=int)
+
+        # Grade ladder -> per-nurse rank (0 = same grade), one array per required grade
+        self.ladder_rank = {}
+        for grade in set(self.grades) | set(ladder):
+            allowed = ladder.get(grade, (grade,))
+            rank = {g: r for r, g in enumerate(allowed)}
+            self.ladder_rank[grade] = np.array([rank.get(g, NOT_ON_LADDER) for g in self.grades], dtype=np.int16)
+        self._ward_masks = {}
+
+    def ward_mask(self, ward):
+        mask = self._ward_masks.get(ward)
+        if mask is None:
+            mask = np.array([can_work_ward(n, ward) for n in self.nurses], dtype=bool)
+            self._ward_masks[ward] = mask
+        return mask
+
+    def find(self, ward, day, shift, grade=None, exclude=(), limit=DEFAULT_LIMIT):
+        """Ranked nurses who can cover `shift` on `day` (ISO date) in `ward`.
+
+        Eligible means: can work the ward, not rostered that day, no
+        Night -> Morning conflict with a neighbouring day, within the weekly
+        hours cap, no approved MC that day, and (given `grade`) on that
+        grade's substitution ladder. Ranking prefers the closest ladder step,
+        then nurses still under their max_shifts_per_week, their own ward,
+        their preferred shift, the most hours left in the week, and seniority.
+        """
+        if shift not in self.shifts:
+            raise ValueError(f"shift must be one of {', '.join(self.shifts)}")
+        try:
+            when = date.fromisoformat(day)
+        except (TypeError, ValueError):
+            raise ValueError("date must be YYYY-MM-DD")
+        hours = self.shift_hours[self.shifts.index(shift)]
+
+        mask = self.ward_mask(ward).copy()
+        ladder_rank = self.ladder_rank.get(grade) if grade else None
+        if grade:
+            if ladder_rank is None:
+                ladder_rank = np.where(self.grades == grade, 0, NOT_ON_LADDER).astype(np.int16)
+            mask &= ladder_rank < NOT_ON_LADDER
+        else:
+            ladder_rank = np.zeros(len(self.nurses), dtype=np.int16)
+
+        d = self.day_index.get(day)
+        if d is not None:
+            mask &= ~self.busy_day[:, d]
+            mask &= ~self.absent[:, d]
+        elif day in self.absent_outside:
+            mask[list(self.absent_outside[day])] = False
+        for first, second in FORBIDDEN_SEQUENCES:
+            if shift == second:
+                before = self.day_index.get((when - timedelta(days=1)).isoformat())
+                if before is not None:
+                    mask &= ~self.on_duty[:, before, self.shifts.index(first)]
+            if shift == first:
+                after = self.day_index.get((when + timedelta(days=1)).isoformat())
+                if after is not None:
+                    mask &= ~self.on_duty[:, after, self.shifts.index(second)]
+
+        w = self.week_index.get(_week(day))
+        if w is not None:
+            hours_left = self.max_weekly_hours - self.week_hours[:, w]
+            mask &= hours_left >= hours
+            extra_shift = self.week_shifts[:, w] >= self.max_shifts
+        else:
+            hours_left = np.full(len(self.nurses), float(self.max_weekly_hours))
+            extra_shift = np.zeros(len(self.nurses), dtype=bool)
+        for nurse_id in exclude:
+            i = self.position.get(str(nurse_id))
+            if i is not None:
+                mask[i] = False
+
+        idx = np.flatnonzero(mask)
+        # lexsort sorts by the last key first
+        order = np.lexsort((
+            -self.seniority[idx],
+            -hours_left[idx],
+            self.preferred[idx] != shift,
+            self.departments[idx] != ward,
+            extra_shift[idx],
+            ladder_rank[idx],
+        ))
+        top = idx[order[:limit]]
+        return {
+            "ward": ward,
+            "date": day,
+            "shift": shift,
+            "grade": grade,
+            "eligible": int(len(idx)),
+            "candidates": [{
+                "nurse_id": self.ids[i],
+                "name": self.nurses[i].get("name"),
+                "grade": self.grades[i],
+                "department": self.departments[i],
+                "preferred_shift": self.preferred[i],
+                "hours_remaining": round(float(hours_left[i] - hours), 2),
+                "beyond_contracted_shifts": bool(extra_shift[i]),
+                "ladder_step": int(ladder_rank[i]),
+            } for i in top],
+        }
+
+
+def _week(day):
+    d = date.fromisoformat(day)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+class ReplacementFinder:
+    """Keeps a ReplacementIndex current, rebuilding it only when the roster, swaps, nurses, config or MCs change.
+
+    Duties come from the availability index, so matched swaps count: a
+    nurse who swapped out of a shift is free for it, and busy in the one
+    they swapped into.
+    """
+
+    def __init__(self, config_path=CONFIG_FILE):
+        self.config_path = config_path
+        self._version = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        version = (_file_version(ROSTER_CSV), _file_version(ROSTER_EXCEL), _file_version(self.config_path),
+                   _file_version(NURSE_JSON), _file_version(mc_store.path), _file_version(availability.swap_path))
+        with self._lock:
+            if self._index is None or version != self._version:
+                from scheduling_ai import MAX_WEEKLY_HOURS
+                dates = swap_matcher.roster().dates
+                span = (date.fromisoformat(dates[-1]) - date.fromisoformat(dates[0])).days + 1 if dates else 0
+                duty = availability.duty(dates[0], span) if dates else {}
+                self._index = ReplacementIndex(directory.snapshot().nurses, dates, duty,
+                                               shift_windows(self.config_path), load_grade_ladder(self.config_path),
+                                               mc_store.unavailability(), MAX_WEEKLY_HOURS)
+                self._version = version
+            return self._index
+
+    def find(self, ward, day, shift, grade=None, exclude=(), limit=DEFAULT_LIMIT):
+        return self.index().find(ward, day, shift, grade=grade, exclude=exclude, limit=limit)
+
+    def for_absence(self, nurse_id, day=None, shift=None, limit=DEFAULT_LIMIT, now=None):
+        """Cover for a nurse calling in sick: their ward and grade, at the given slot or the one running now."""
+        nurse = directory.snapshot().get(nurse_id)
+        if nurse is None:
+            raise ValueError(f"unknown nurse {nurse_id}")
+        if not (day and shift):
+            day, shift = slot_at(now or datetime.now(), shift_windows(self.config_path))
+        return self.find(nurse.get("department"), day, shift, grade=nurse.get("grade"), exclude=(nurse_id,),
+                         limit=limit)
+
+
+finder = ReplacementFinder()
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from swap_matcher import Roster
+
+    # Synthetic 2,000-nurse roster: five shifts a week each, a sprinkling of MCs
+    rng = random.Random(11)
+    windows = shift_windows()
+    ladder = load_grade_ladder()
+    grades = sorted(set(ladder) | {g for subs in ladder.values() for g in subs})
+    wards = ["ED", "GW", "ICU"]
+    nurses = []
+    for i in range(2000):
+        ward = rng.choice(wards)
+        nurses.append({"id": f"N{10000 + i}", "name": f"Nurse {i}", "department": ward, "grade": rng.choice(grades),
+                       "skills": [ward], "max_shifts_per_week": 5, "preferred_shifts": rng.choice(list(windows)),
+                       "seniority": rng.randint(0, 30)})
+    start = date(2025, 10, 20)
+    roster = Roster(None, windows)
+    roster.dates = [(start + timedelta(days=d)).isoformat() for d in range(28)]
+    for n in nurses:
+        duties = roster.duty.setdefault(n["id"], {})
+        for week in range(4):
+            for d in rng.sample(range(7), 5):
+                duties[(roster.dates[week * 7 + d], rng.choice(list(windows)))] = n["department"]
+    mcs = [{"nurse_id": n["id"], "start_date": roster.dates[d], "end_date": roster.dates[min(d + 2, 27)]}
+           for n in rng.sample(nurses, 100) for d in [rng.randrange(28)]]
+
+    started = time.perf_counter()
+    index = ReplacementIndex(nurses, roster.dates, roster.duty, windows, ladder, mcs, 60)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    latencies, eligible = [], 0
+    for _ in range(2000):
+        query = (rng.choice(wards), rng.choice(roster.dates), rng.choice(list(windows)), rng.choice(grades))
+        started = time.perf_counter()
+        eligible += index.find(*query)["eligible"]
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    print(f"🩺 2000 nurses: index built in {build_ms:.0f} ms; query p50 {latencies[len(latencies) // 2]:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms ({eligible / len(latencies):.0f} eligible per query)")
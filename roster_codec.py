@@ -0,0 +1,187 @@
+import struct
+from datetime import date, timedelta
+
+from lazy_imports import lazy_import
+from reconciliation import SLOT_PATTERN
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ---------------- Config ----------------
+MAGIC = b"NRST"
+FORMAT_VERSION = 1
+MIMETYPE = "application/vnd.nurse-roster"
+OFF = "Off"
+ON_DUTY = "On Duty - "
+MAX_SHIFTS = 3      # 2-bit shift codes: 0 is off, 1-3 index the shift dictionary
+MAX_WARDS = 255     # 1-byte ward codes: 0 is off, 1-255 index the ward dictionary
+EPOCH = date(1970, 1, 1)
+
+# magic, version, start day (days since 1970-01-01), days, nurses, shifts, wards, string table bytes
+HEADER = struct.Struct("<4sBIHIBBI")
+
+
+class PackedRoster:
+    """A decoded roster: dictionaries plus (nurses, days) arrays of shift and ward codes."""
+
+    def __init__(self, start, shifts, wards, nurse_ids, names, shift_codes, ward_codes):
+        self.start = start
+        self.shifts = shifts
+        self.wards = wards
+        self.nurse_ids = nurse_ids
+        self.names = names
+        self.shift_codes = shift_codes
+        self.ward_codes = ward_codes
+
+    @property
+    def days(self):
+        return [self.start + timedelta(days=d) for d in range(self.shift_codes.shape[1])]
+
+    def columns(self):
+        """Slot columns in roster order, e.g. 'Monday 2025-10-20 Morning'."""
+        return [f"{day:%A} {day:%Y-%m-%d} {shift}" for day in self.days for shift in self.shifts]
+
+    def records(self):
+        """The roster as schedule_df.to_dict('records') returns it, without the index column."""
+        columns = self.columns()
+        shifts, days = len(self.shifts), len(self.days)
+        labels = [ON_DUTY + w for w in self.wards]
+        records = []
+        for i, (nurse_id, name) in enumerate(zip(self.nurse_ids, self.names)):
+            cells = [OFF] * (days * shifts)
+            for d in np.flatnonzero(self.shift_codes[i]).tolist():
+                cells[d * shifts + int(self.shift_codes[i, d]) - 1] = labels[int(self.ward_codes[i, d]) - 1]
+            record = {"Nurse_ID": nurse_id, "Name": name}
+            record.update(zip(columns, cells))
+            records.append(record)
+        return records
+
+
+def _slot_grid(frame):
+    """(first day, days, shift names, grid columns); ValueError unless every day has every shift."""
+    parsed = {}
+    for column in frame.columns:
+        match = SLOT_PATTERN.match(str(column))
+        if match:
+            parsed[column] = (date.fromisoformat(match.group(1)), match.group(2))
+    if not parsed:
+        raise ValueError("roster has no slot columns")
+    shifts = list(dict.fromkeys(shift for _, shift in parsed.values()))
+    if len(shifts) > MAX_SHIFTS:
+        raise ValueError(f"roster has {len(shifts)} shifts per day; the packed format holds {MAX_SHIFTS}")
+    first = min(day for day, _ in parsed.values())
+    days = (max(day for day, _ in parsed.values()) - first).days + 1
+    by_slot = {slot: column for column, slot in parsed.items()}
+    grid = []
+    for d in range(days):
+        for shift in shifts:
+            column = by_slot.get((first + timedelta(days=d), shift))
+            if column is None:
+                raise ValueError(f"roster has no column for {first + timedelta(days=d)} {shift}")
+            grid.append(column)
+    return first, days, shifts, grid
+
+
+def encode_roster(frame):
+    """Pack a wide roster frame (Nurse_ID, Name, one column per day+shift) into bytes.
+
+    Layout after the header and a NUL-separated UTF-8 string table (shift
+    names, ward names, nurse IDs, nurse names): one 2-bit shift code per
+    nurse per day, four days to a byte, then one ward code byte per nurse
+    per day. Raises ValueError for cells other than 'Off' / 'On Duty - <ward>'
+    or a nurse on more than one shift in a day.
+    """
+    first, days, shifts, grid = _slot_grid(frame)
+    nurses = len(frame)
+    cells = frame[grid].fillna(OFF).to_numpy(dtype=str).reshape(nurses, days, len(shifts))
+
+    on = cells != OFF
+    unsupported = on & ~np.char.startswith(cells, ON_DUTY)
+    if unsupported.any():
+        raise ValueError(f"unsupported roster values: {sorted(set(cells[unsupported].tolist()))[:5]}")
+    if (on.sum(axis=2) > 1).any():
+        raise ValueError("a nurse is on more than one shift in a day")
+    worked = on.any(axis=2)
+    shift_codes = np.where(worked, on.argmax(axis=2) + 1, 0).astype(np.uint8)
+
+    assignment = np.take_along_axis(cells, on.argmax(axis=2)[..., None], axis=2)[..., 0]
+    wards, index = np.unique(np.char.replace(assignment[worked], ON_DUTY, "", count=1),
+                             return_inverse=True)
+    if len(wards) > MAX_WARDS:
+        raise ValueError(f"roster has {len(wards)} wards; the packed format holds {MAX_WARDS}")
+    ward_codes = np.zeros((nurses, days), dtype=np.uint8)
+    ward_codes[worked] = index + 1
+
+    padded = np.zeros((nurses, -(-days // 4) * 4), dtype=np.uint8)
+    padded[:, :days] = shift_codes
+    packed = (padded.reshape(nurses, -1, 4) << np.array([0, 2, 4, 6], dtype=np.uint8)).sum(axis=2, dtype=np.uint8)
+
+    nurse_ids = frame["Nurse_ID"].astype(str).tolist() if "Nurse_ID" in frame else [""] * nurses
+    names = frame["Name"].fillna("").astype(str).tolist() if "Name" in frame else [""] * nurses
+    strings = "\0".join(shifts + wards.tolist() + nurse_ids + names).encode("utf-8")
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, (first - EPOCH).days, days, nurses, len(shifts), len(wards), len(strings))
+    return b"".join((header, strings, packed.tobytes(), ward_codes.tobytes()))
+
+
+def decode_roster(data):
+    """PackedRoster from encode_roster() output; ValueError if the bytes are not a packed roster."""
+    if len(data) < HEADER.size:
+        raise ValueError("packed roster is truncated")
+    magic, version, start, days, nurses, shifts, wards, string_bytes = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("not a packed roster (or an unsupported version)")
+    offset = HEADER.size
+    row_bytes = -(-days // 4)
+    if len(data) != offset + string_bytes + nurses * (row_bytes + days):
+        raise ValueError("packed roster is truncated")
+
+    strings = data[offset:offset + string_bytes].decode("utf-8").split("\0")
+    offset += string_bytes
+    shift_names, strings = strings[:shifts], strings[shifts:]
+    ward_names, strings = strings[:wards], strings[wards:]
+    nurse_ids, names = strings[:nurses], strings[nurses:2 * nurses]
+
+    packed = np.frombuffer(data, dtype=np.uint8, count=nurses * row_bytes, offset=offset).reshape(nurses, row_bytes)
+    offset += nurses * row_bytes
+    shift_codes = ((packed[..., None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3).reshape(nurses, -1)[:, :days]
+    ward_codes = np.frombuffer(data, dtype=np.uint8, count=nurses * days, offset=offset).reshape(nurses, days)
+    return PackedRoster(EPOCH + timedelta(days=start), shift_names, ward_names, nurse_ids, names,
+                        shift_codes, ward_codes)
+
+
+if __name__ == "__main__":
+    # Synthetic 1,000-nurse, 4-week roster: packed vs the JSON /api/schedule/full sends
+    import json
+    import time
+
+    nurses, days = 1000, 28
+    rng = np.random.default_rng(7)
+    base = pd.Timestamp("2025-10-20")
+    columns = {"Nurse_ID": [f"N{i:05d}" for i in range(nurses)], "Name": [f"Nurse {i}" for i in range(nurses)]}
+    for d in range(days):
+        day = base + pd.Timedelta(days=d)
+        pick = rng.integers(0, 5, nurses)   # 0-2: that shift, 3-4: off
+        ward = rng.choice(["ICU", "ED", "GW"], nurses)
+        for s, name in enumerate(["Morning", "Evening", "Night"]):
+            columns[f"{day:%A} {day:%Y-%m-%d} {name}"] = np.where(pick == s, np.char.add(ON_DUTY, ward), OFF)
+    roster = pd.DataFrame(columns)
+
+    t = time.perf_counter()
+    as_json = json.dumps({"schedule": roster.to_dict("records")}).encode()
+    json_encode = time.perf_counter() - t
+    t = time.perf_counter()
+    json.loads(as_json)
+    json_decode = time.perf_counter() - t
+
+    t = time.perf_counter()
+    packed = encode_roster(roster)
+    packed_encode = time.perf_counter() - t
+    t = time.perf_counter()
+    decoded = decode_roster(packed)
+    packed_decode = time.perf_counter() - t
+    assert decoded.records() == roster.to_dict("records")
+
+    print(f"{'format':8} {'bytes':>10} {'encode ms':>10} {'decode ms':>10}")
+    print(f"{'json':8} {len(as_json):10,} {json_encode * 1000:10.1f} {json_decode * 1000:10.1f}")
+    print(f"{'packed':8} {len(packed):10,} {packed_encode * 1000:10.1f} {packed_decode * 1000:10.1f}")
+    print(f"{len(as_json) / len(packed):.0f}x smaller, decode {json_decode / packed_decode:.0f}x faster")
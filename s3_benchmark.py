@@ -0,0 +1,156 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import s3_operations
+from local_s3 import LocalS3Client
+
+# ---------------- Legacy restore (before paginated restore) ----------------
+def legacy_restore(s3_client, bucket):
+    """The original restore: one unpaginated listing, serial in-place downloads."""
+    response = s3_client.list_objects_v2(Bucket=bucket)
+    if 'Contents' not in response:
+        return None
+    latest_backup = None
+    for obj in response['Contents']:
+        key = obj['Key']
+        if key.startswith('backup_'):
+            timestamp = key.split('/')[0].replace('backup_', '')
+            if not latest_backup or timestamp > latest_backup:
+                latest_backup = timestamp
+    if not latest_backup:
+        return None
+    objects = s3_client.list_objects_v2(Bucket=bucket, Prefix=f'backup_{latest_backup}/')
+    for obj in objects['Contents']:
+        filename = obj['Key'].split('/')[-1]
+        local_path = s3_operations.local_path_for_legacy_key(filename)
+        if os.path.dirname(local_path):
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        s3_client.download_file(bucket, obj['Key'], local_path)
+    return f"backup_{latest_backup}"
+
+
+def seed_legacy_snapshots(root, bucket, snapshots):
+    """Write old-layout snapshots straight to disk: 10 objects each, hourly from 2024-01-01."""
+    base = os.path.join(root, bucket)
+    for i in range(snapshots):
+        day, hour = divmod(i, 24)
+        stamp = f"2024{1 + day // 28:02d}{1 + day % 28:02d}_{hour:02d}0000"
+        folder = os.path.join(base, f"backup_{stamp}")
+        os.makedirs(folder, exist_ok=True)
+        for path in s3_operations.FILES_TO_BACKUP:
+            with open(os.path.join(folder, path.replace('/', '_')), 'w') as f:
+                f.write(f"{path} @ {stamp}\n")
+
+
+def make_workdir(source_dir):
+    """Copy the tracked data files into a scratch directory the benchmark can overwrite."""
+    workdir = tempfile.mkdtemp(prefix='s3bench_work_')
+    for path in s3_operations.FILES_TO_BACKUP:
+        src = os.path.join(source_dir, path)
+        if os.path.exists(src):
+            os.makedirs(os.path.join(workdir, os.path.dirname(path)), exist_ok=True)
+            shutil.copyfile(src, os.path.join(workdir, path))
+    return workdir
+
+
+def measure(client, fn):
+    client.stats.clear()
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started, dict(client.stats)
+
+
+@contextmanager
+def local_bucket(latency, source_dir):
+    """Point s3_operations at a fresh local bucket and chdir into a scratch copy of the data."""
+    root = tempfile.mkdtemp(prefix='s3bench_bucket_')
+    workdir = make_workdir(source_dir)
+    client = LocalS3Client(root, latency=latency)
+    original_client = s3_operations.get_s3_client
+    original_state = s3_operations.BACKUP_STATE_FILE
+    s3_operations.get_s3_client = lambda: client
+    s3_operations.BACKUP_STATE_FILE = os.path.join(workdir, 'data', 's3_backup_state.json')
+    os.chdir(workdir)
+    try:
+        client.create_bucket(Bucket=s3_operations.BUCKET_NAME)
+        yield client, root
+    finally:
+        os.chdir(source_dir)
+        s3_operations.get_s3_client = original_client
+        s3_operations.BACKUP_STATE_FILE = original_state
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def next_second():
+    """Backup ids have one-second resolution; keep consecutive snapshots distinct."""
+    time.sleep(1 - time.time() % 1 + 0.01)
+
+
+def run_restore_benchmark(snapshots, latency):
+    bucket = s3_operations.BUCKET_NAME
+    with local_bucket(latency, os.getcwd()) as (client, root):
+        seed_legacy_snapshots(root, bucket, snapshots)
+        ok, expected = s3_operations.backup_to_s3()
+        assert ok, expected
+        total = sum(len(files) for _, _, files in os.walk(os.path.join(root, bucket)))
+
+        print(f"Bucket: {total} objects ({snapshots} legacy snapshots + latest {expected}), "
+              f"{latency * 1000:.0f} ms simulated latency per request")
+        print("-" * 72)
+        rows = [
+            ("legacy (1 listing page)", lambda: legacy_restore(client, bucket)),
+            ("catalog + parallel", lambda: s3_operations.restore_from_s3()[1]),
+        ]
+        for name, fn in rows:
+            result, elapsed, stats = measure(client, fn)
+            correct = expected in str(result)
+            print(f"{name:26} {elapsed * 1000:8.1f} ms  {stats.get('requests', 0):5d} requests  "
+                  f"{'correct' if correct else 'WRONG'}: {result}")
+
+
+def run_transfer_benchmark(latency, changed_file='data/attendance.json'):
+    """Per-file vs bundle mode: bytes, requests and time for backups and restores."""
+    print(f"\nPer-file vs bundle mode, {latency * 1000:.0f} ms simulated latency per request")
+    print(f"{'mode':7} {'operation':24} {'time':>9} {'requests':>9} {'bytes up':>10} {'bytes down':>11}")
+    print("-" * 75)
+    original_mode = s3_operations.BACKUP_MODE
+    try:
+        for mode in ('files', 'bundle'):
+            s3_operations.BACKUP_MODE = mode
+            with local_bucket(latency, os.getcwd()) as (client, _):
+                def touch_and_backup():
+                    with open(changed_file, 'a') as f:
+                        f.write(' ')
+                    return s3_operations.backup_to_s3()
+
+                steps = [
+                    ("full backup", s3_operations.backup_to_s3),
+                    ("backup, 1 file changed", touch_and_backup),
+                    ("full restore", s3_operations.restore_from_s3),
+                    ("restore 1 file", lambda: s3_operations.restore_from_s3(paths=[changed_file])),
+                ]
+                for name, fn in steps:
+                    next_second()
+                    (ok, message), elapsed, stats = measure(client, fn)
+                    assert ok, message
+                    print(f"{mode:7} {name:24} {elapsed * 1000:7.1f} ms {stats.get('requests', 0):9d} "
+                          f"{stats.get('bytes_in', 0):10d} {stats.get('bytes_out', 0):11d}")
+    finally:
+        s3_operations.BACKUP_MODE = original_mode
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark S3 restore against the local S3 stand-in")
+    parser.add_argument('--snapshots', type=int, default=1000, help='legacy snapshots to seed (10 objects each)')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated per-request latency')
+    parser.add_argument('--only', choices=['restore', 'transfer'], help='run just one of the benchmarks')
+    args = parser.parse_args()
+    if args.only != 'transfer':
+        run_restore_benchmark(args.snapshots, args.latency_ms / 1000)
+    if args.only != 'restore':
+        run_transfer_benchmark(args.latency_ms / 1000)
@@ -0,0 +1,161 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+# ---------------- Config ----------------
+BUNDLE_NAME = 'bundle.zip'
+RANGE_BLOCK_SIZE = 64 * 1024           # minimum bytes per ranged GET (covers the archive index)
+WHOLE_BUNDLE_RATIO = 0.5               # fetch the whole archive once selected members exceed this share
+STORED_SUFFIXES = ('.xlsx', '.zip', '.gz')  # already compressed; deflating them again only costs CPU
+
+
+def _compression(path):
+    return zipfile.ZIP_STORED if path.endswith(STORED_SUFFIXES) else zipfile.ZIP_DEFLATED
+
+
+def build_bundle(manifest, bundle_path, bundle_key):
+    """Stream every manifest file into a zip at bundle_path with the manifest embedded as manifest.json.
+
+    Hashes are taken from the bytes actually written, so a file that changes
+    mid-backup cannot leave the archive disagreeing with its manifest. Each
+    entry is repointed at the bundle and records its member's compressed size.
+    """
+    files = {}
+    with zipfile.ZipFile(bundle_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for path in manifest['files']:
+            sha, size = hashlib.sha256(), 0
+            info = zipfile.ZipInfo.from_file(path, arcname=path)
+            info.compress_type = _compression(path)
+            with open(path, 'rb') as src, zf.open(info, 'w') as dst:
+                for block in iter(lambda: src.read(1024 * 1024), b''):
+                    sha.update(block)
+                    size += len(block)
+                    dst.write(block)
+            files[path] = {
+                "sha256": sha.hexdigest(),
+                "size": size,
+                "key": bundle_key,
+                "member": path,
+                "compressed_size": zf.getinfo(path).compress_size
+            }
+        bundled = dict(manifest, files=files)
+        zf.writestr('manifest.json', json.dumps(bundled, indent=2))
+    return bundled
+
+
+class S3RangeReader(io.RawIOBase):
+    """Seekable read-only view of an S3 object that fetches ranges on demand.
+
+    Keeps one window of at least RANGE_BLOCK_SIZE bytes. Reads near the end
+    of the object widen the window backwards, so zipfile's end-of-archive and
+    central-directory reads cost a single GET; prefetch() loads a known span
+    (one archive member) in a single GET.
+    """
+
+    def __init__(self, s3_client, bucket, key, block_size=RANGE_BLOCK_SIZE):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.block_size = block_size
+        self._pos = 0
+        # A suffix range learns the object size and prefetches the tail zipfile reads first
+        response = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes=-{block_size}")
+        self._window = response['Body'].read()
+        self.size = int(response['ContentRange'].split('/')[-1])
+        self._window_start = self.size - len(self._window)
+
+    @property
+    def fully_cached(self):
+        return self._window_start == 0 and len(self._window) == self.size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = self.size + offset
+        return self._pos
+
+    def prefetch(self, start, length):
+        if start < self._window_start or start + length > self._window_start + len(self._window):
+            self._fetch(start, length)
+
+    def _fetch(self, start, length):
+        end = min(self.size, start + max(length, self.block_size))
+        start = max(0, min(start, end - self.block_size))
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end - 1}")
+        self._window_start, self._window = start, response['Body'].read()
+
+    def readinto(self, buffer):
+        length = min(len(buffer), self.size - self._pos)
+        if length <= 0:
+            return 0
+        offset = self._pos - self._window_start
+        if offset < 0 or offset + length > len(self._window):
+            self._fetch(self._pos, length)
+            offset = self._pos - self._window_start
+        buffer[:length] = self._window[offset:offset + length]
+        self._pos += length
+        return length
+
+
+def extract_members(s3_client, bucket, key, entries, staging_dir, transfer_config=None, bundle_size=None):
+    """Extract the given bundle members into staging_dir. Returns {local_path: staged_file}.
+
+    Small selections are read with one ranged GET for the archive index and
+    one per member; once they make up most of the bundle (bundle_size, the
+    summed compressed size of all members), one full download is cheaper.
+    """
+    wanted = sum(e.get('compressed_size') or e['size'] for e in entries.values())
+    archive_path = None
+    try:
+        if bundle_size is None or wanted >= bundle_size * WHOLE_BUNDLE_RATIO:
+            archive_path = os.path.join(staging_dir, BUNDLE_NAME)
+            s3_client.download_file(bucket, key, archive_path, Config=transfer_config)
+            source = reader = archive_path
+        else:
+            source = reader = S3RangeReader(s3_client, bucket, key)
+
+        staged = {}
+        with zipfile.ZipFile(source) as zf:
+            for local_path, entry in entries.items():
+                info = zf.getinfo(entry['member'])
+                if isinstance(reader, S3RangeReader):
+                    # Local header (30 bytes + name + extra, allow slack for a differing extra) + data
+                    header = 30 + len(info.filename.encode('utf-8')) + len(info.extra) + 1024
+                    reader.prefetch(info.header_offset, header + info.compress_size)
+                target = os.path.join(staging_dir, local_path.replace('/', '__'))
+                with zf.open(info) as src, open(target, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                staged[local_path] = target
+        return staged
+    finally:
+        if archive_path and os.path.exists(archive_path):
+            os.remove(archive_path)
+
+
+def upload_bundle(s3_client, bucket, manifest, transfer_config=None):
+    """Bundle the manifest's files and upload them as backup_<id>/bundle.zip. Returns the bundled manifest."""
+    bundle_key = f"{manifest['backup_id']}/{BUNDLE_NAME}"
+    fd, bundle_path = tempfile.mkstemp(prefix='.bundle_', suffix='.zip', dir='.')
+    os.close(fd)
+    try:
+        bundled = build_bundle(manifest, bundle_path, bundle_key)
+        s3_client.upload_file(bundle_path, bucket, bundle_key, Config=transfer_config)
+        return bundled
+    finally:
+        os.remove(bundle_path)
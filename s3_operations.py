@@ -1,14 +1,64 @@
 import boto3
+import hashlib
+import io
+import json
 import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from file_lock import locked
+from metrics import metrics
+from s3_bundle import BUNDLE_NAME, extract_members, upload_bundle
+
 # AWS S3 Configuration
 AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
 BUCKET_NAME = os.environ.get('S3_BUCKET_NAME', 'nurse-scheduler-backup')
 AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+S3_LOCAL_DIR = os.environ.get('S3_LOCAL_DIR')  # directory-backed S3 stand-in for local testing
+
+FILES_TO_BACKUP = [
+    'csv/nurse_database.json',
+    'csv/hospital_config.json',
+    'dataset/covid_dataset.csv',
+    'data/attendance.json',
+    'data/emergency_calls.json',
+    'data/mc_requests.json',
+    'data/shift_swaps.json',
+    'current_week.txt',
+    'output_schedule.xlsx',
+    'output_schedule.csv'
+]
+
+# Snapshots are a manifest under backup_<timestamp>/ pointing at content-addressed
+# objects, so an unchanged file is never uploaded twice
+OBJECTS_PREFIX = 'objects/'
+MANIFEST_NAME = 'manifest.json'
+BACKUP_STATE_FILE = 'data/s3_backup_state.json'  # last manifest, to skip unchanged backups
+# The app rewrites the stores under data/ with load -> modify -> save under file_lock.locked();
+# a restore takes the same lock so an in-flight save cannot overwrite the restored file
+LOCKED_PREFIX = 'data/'
+# 'files': one content-addressed object per changed file (incremental)
+# 'bundle': every file in one compressed zip per snapshot (fewer requests and bytes, no dedup)
+BACKUP_MODE = os.environ.get('S3_BACKUP_MODE', 'files')
+
+UPLOAD_WORKERS = int(os.environ.get('S3_UPLOAD_WORKERS', 4))
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4
+)
 
 def get_s3_client():
+    if S3_LOCAL_DIR:
+        from local_s3 import LocalS3Client
+        return LocalS3Client(S3_LOCAL_DIR)
     if not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY:
         return None
     return boto3.client(
@@ -18,86 +68,354 @@ def get_s3_client():
         region_name=AWS_REGION
     )
 
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def object_key(sha256):
+    return f"{OBJECTS_PREFIX}{sha256[:2]}/{sha256}"
+
+def read_files(files=FILES_TO_BACKUP):
+    """{path: bytes} for every tracked file that exists, each read exactly once.
+
+    Hashing and uploading both use these bytes, so a file rewritten while a
+    backup runs cannot be stored under a hash that does not match it.
+    """
+    contents = {}
+    for file_path in files:
+        try:
+            with open(file_path, 'rb') as f:
+                contents[file_path] = f.read()
+        except FileNotFoundError:
+            continue
+    return contents
+
+def build_manifest(backup_id, contents):
+    """Hash the contents read by read_files() into a snapshot manifest."""
+    entries = {}
+    for file_path, data in contents.items():
+        sha = hashlib.sha256(data).hexdigest()
+        entries[file_path] = {
+            "sha256": sha,
+            "size": len(data),
+            "key": object_key(sha)
+        }
+    return {
+        "backup_id": backup_id,
+        "created_at": datetime.now().isoformat(),
+        "bucket": BUCKET_NAME,
+        "files": entries
+    }
+
+def content_of(manifest):
+    """What a snapshot contains, independent of how it was stored."""
+    return {path: (e['sha256'], e['size']) for path, e in manifest['files'].items()}
+
+def load_backup_state():
+    if os.path.exists(BACKUP_STATE_FILE):
+        try:
+            with open(BACKUP_STATE_FILE, 'r') as f:
+                state = json.load(f)
+            if state.get('bucket') == BUCKET_NAME:
+                return state
+        except (OSError, ValueError):
+            pass
+    return None
+
+def save_backup_state(manifest):
+    os.makedirs(os.path.dirname(BACKUP_STATE_FILE), exist_ok=True)
+    tmp = BACKUP_STATE_FILE + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, BACKUP_STATE_FILE)
+
+def object_exists(s3_client, key):
+    try:
+        s3_client.head_object(Bucket=BUCKET_NAME, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+def upload_missing_objects(s3_client, manifest, contents, known_hashes=()):
+    """Upload each distinct content hash the bucket does not have yet, from the bytes it was hashed from.
+
+    Returns the number uploaded.
+    """
+    pending = {}
+    for file_path, entry in manifest['files'].items():
+        if entry['sha256'] not in known_hashes:
+            pending.setdefault(entry['sha256'], (file_path, entry['key']))
+    if not pending:
+        return 0
+
+    def upload(item):
+        file_path, key = item
+        if object_exists(s3_client, key):
+            return 0
+        s3_client.upload_fileobj(io.BytesIO(contents[file_path]), BUCKET_NAME, key, Config=TRANSFER_CONFIG)
+        return 1
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        return sum(pool.map(upload, pending.values()))
+
 def backup_to_s3():
     """Backup all data files to S3"""
+    with metrics.stage("s3_backup"):
+        success, message = _backup_to_s3()
+    result = "error" if not success else "unchanged" if message.endswith("(no changes)") else "ok"
+    metrics.inc("s3_backups_total", result=result)
+    return success, message
+
+def _backup_to_s3():
     try:
         s3_client = get_s3_client()
-        
-        files_to_backup = [
-            'csv/nurse_database.json',
-            'csv/hospital_config.json',
-            'dataset/covid_dataset.csv',
-            'data/attendance.json',
-            'data/emergency_calls.json',
-            'data/mc_requests.json',
-            'data/shift_swaps.json',
-            'current_week.txt',
-            'output_schedule.xlsx',
-            'output_schedule.csv'
-        ]
-        
+        if s3_client is None:
+            return False, "AWS credentials not configured"
+
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        for file_path in files_to_backup:
-            if os.path.exists(file_path):
-                s3_key = f"backup_{timestamp}/{file_path.replace('/', '_')}"
-                s3_client.upload_file(file_path, BUCKET_NAME, s3_key)
-        
-        return True, f"backup_{timestamp}"
+        backup_id = f"backup_{timestamp}"
+        contents = read_files()
+        manifest = build_manifest(backup_id, contents)
+
+        # Nothing changed since the last snapshot: no uploads, no new manifest
+        last = load_backup_state()
+        if last and content_of(last) == content_of(manifest):
+            return True, f"{last['backup_id']} (no changes)"
+
+        if BACKUP_MODE == 'bundle':
+            manifest = upload_bundle(s3_client, BUCKET_NAME, manifest, TRANSFER_CONFIG)
+        else:
+            # Only hashes the last snapshot stored under objects/ are known to be in the bucket
+            known = set()
+            if last:
+                known = {e['sha256'] for e in last['files'].values() if e['key'] == object_key(e['sha256'])}
+            upload_missing_objects(s3_client, manifest, contents, known)
+
+        # The manifest goes last so a snapshot is never visible before its objects
+        s3_client.put_object(
+            Bucket=BUCKET_NAME,
+            Key=f"{backup_id}/{MANIFEST_NAME}",
+            Body=json.dumps(manifest, indent=2).encode('utf-8'),
+            ContentType='application/json'
+        )
+        save_backup_state(manifest)
+
+        # The snapshot is already safe; a stale catalog can be rebuilt from the manifests
+        from backup_catalog import record_snapshot
+        try:
+            record_snapshot(s3_client, manifest)
+        except Exception as e:
+            print(f"⚠️ Backup catalog not updated for {backup_id}: {e}")
+
+        return True, backup_id
     except Exception as e:
         return False, str(e)
 
-def restore_from_s3():
-    """Restore latest backup from S3"""
+class BackgroundBackup:
+    """Runs backup_to_s3 on a worker thread, folding back-to-back triggers into one follow-up run."""
+
+    def __init__(self, backup_fn=backup_to_s3):
+        self.backup_fn = backup_fn
+        self.last_result = None
+        self.last_finished_at = None
+        self._running = False
+        self._pending = False
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        with self._lock:
+            return self._running
+
+    def trigger(self):
+        """Start a backup, or mark one pending if a backup is already running. Returns True if a new run started."""
+        with self._lock:
+            if self._running:
+                self._pending = True
+                return False
+            self._running = True
+        threading.Thread(target=self._run, name="s3-backup", daemon=True).start()
+        return True
+
+    def _run(self):
+        while True:
+            result = self.backup_fn()
+            with self._lock:
+                self.last_result = result
+                self.last_finished_at = datetime.now().isoformat()
+                if not self._pending:
+                    self._running = False
+                    return
+                self._pending = False
+
+background_backup = BackgroundBackup()
+
+def request_backup():
+    """Queue a background backup after a data change. Returns False when S3 is not configured."""
+    if not S3_LOCAL_DIR and (not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY):
+        return False
+    background_backup.trigger()
+    return True
+
+def local_path_for_legacy_key(filename):
+    """Map a pre-manifest backup object name (e.g. data_attendance.json) back to its path."""
+    if filename.startswith('csv_'):
+        return f"csv/{filename[4:]}"
+    elif filename.startswith('data_'):
+        return f"data/{filename[5:]}"
+    elif filename.startswith('dataset_'):
+        return f"dataset/{filename[8:]}"
+    return filename
+
+def iter_objects(s3_client, prefix=''):
+    """Yield every object under prefix, following continuation tokens past the 1,000-key page limit."""
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj
+
+def list_backup_ids(s3_client):
+    """Return every backup_<timestamp> snapshot id, oldest first.
+
+    Listing with a '/' delimiter returns one entry per snapshot folder
+    rather than one per object, so this stays cheap as backups pile up.
+    """
+    paginator = s3_client.get_paginator('list_objects_v2')
+    backup_ids = []
+    for page in paginator.paginate(Bucket=BUCKET_NAME, Prefix='backup_', Delimiter='/'):
+        for common in page.get('CommonPrefixes', []):
+            backup_ids.append(common['Prefix'].rstrip('/'))
+    return sorted(backup_ids)
+
+def find_latest_backup(s3_client):
+    backup_ids = list_backup_ids(s3_client)
+    return backup_ids[-1] if backup_ids else None
+
+def load_manifest(s3_client, backup_id):
+    """Fetch a snapshot's manifest; pre-manifest backups get one synthesized from the listing."""
+    try:
+        body = s3_client.get_object(Bucket=BUCKET_NAME, Key=f"{backup_id}/{MANIFEST_NAME}")['Body'].read()
+        return json.loads(body)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+            raise
+
+    entries = {}
+    for obj in iter_objects(s3_client, prefix=f"{backup_id}/"):
+        filename = obj['Key'].split('/')[-1]
+        if filename == BUNDLE_NAME:
+            continue  # bundle uploaded but its manifest never written
+        local_path = local_path_for_legacy_key(filename)
+        if not local_path:
+            continue
+        etag = obj.get('ETag', '').strip('"')
+        entries[local_path] = {
+            "key": obj['Key'],
+            "size": obj['Size'],
+            # Single-part uploads have the MD5 as ETag; multipart ETags ("...-N") cannot be verified
+            "md5": etag if etag and '-' not in etag else None
+        }
+    if not entries:
+        return None
+    return {"backup_id": backup_id, "files": entries}
+
+def verify_file(path, entry):
+    """Check a downloaded file against the size and hash recorded for it."""
+    if entry.get('size') is not None and os.path.getsize(path) != entry['size']:
+        return False
+    if entry.get('sha256'):
+        return file_sha256(path) == entry['sha256']
+    if entry.get('md5'):
+        md5 = hashlib.md5()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                md5.update(block)
+        return md5.hexdigest() == entry['md5']
+    return True
+
+def download_verified(s3_client, manifest, staging_dir, paths=None):
+    """Download the selected manifest entries concurrently into staging_dir and verify them.
+
+    Returns {local_path: staged_file}. Raises ValueError on a checksum mismatch.
+    """
+    selected = {p: e for p, e in manifest['files'].items() if paths is None or p in paths}
+    for local_path in selected:
+        # Manifests come from the bucket; never let one write outside the app directory
+        if os.path.isabs(local_path) or '..' in local_path.replace('\\', '/').split('/'):
+            raise ValueError(f"Refusing to restore unsafe path {local_path!r}")
+
+    # Bundle snapshots keep their files as members of one archive object
+    bundles = {}
+    for local_path, entry in selected.items():
+        if entry.get('member'):
+            bundles.setdefault(entry['key'], {})[local_path] = entry
+
+    def fetch(item):
+        local_path, entry = item
+        staged = os.path.join(staging_dir, local_path.replace('/', '__'))
+        s3_client.download_file(BUCKET_NAME, entry['key'], staged, Config=TRANSFER_CONFIG)
+        return {local_path: staged}
+
+    def extract(item):
+        key, entries = item
+        bundle_size = sum(e.get('compressed_size') or 0 for e in manifest['files'].values() if e['key'] == key)
+        return extract_members(s3_client, BUCKET_NAME, key, entries, staging_dir, TRANSFER_CONFIG,
+                               bundle_size=bundle_size or None)
+
+    staged = {}
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as pool:
+        plain = [(p, e) for p, e in selected.items() if not e.get('member')]
+        for result in list(pool.map(fetch, plain)) + list(pool.map(extract, bundles.items())):
+            staged.update(result)
+    for local_path, path in staged.items():
+        if not verify_file(path, selected[local_path]):
+            raise ValueError(f"Checksum mismatch for {local_path}")
+    return staged
+
+def swap_in(staged_files):
+    """Move verified files over the live ones; each os.replace is atomic."""
+    for local_path, staged in staged_files.items():
+        dir_path = os.path.dirname(local_path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        if local_path.startswith(LOCKED_PREFIX):
+            with locked(local_path):
+                os.replace(staged, local_path)
+        else:
+            os.replace(staged, local_path)
+
+def restore_from_s3(backup_id=None, paths=None, as_of=None):
+    """Restore latest backup from S3 (or backup_id / the snapshot current at as_of; optionally only `paths`)"""
+    staging_dir = None
     try:
         s3_client = get_s3_client()
-        
-        # Get all backup folders
-        response = s3_client.list_objects_v2(Bucket=BUCKET_NAME)
-        if 'Contents' not in response:
-            return False, "No backups found"
-        
-        # Find latest backup
-        latest_backup = None
-        for obj in response['Contents']:
-            key = obj['Key']
-            if key.startswith('backup_'):
-                timestamp = key.split('/')[0].replace('backup_', '')
-                if not latest_backup or timestamp > latest_backup:
-                    latest_backup = timestamp
-        
-        if not latest_backup:
-            return False, "No backup folders found"
-        
-        # Download files from latest backup
-        objects = s3_client.list_objects_v2(Bucket=BUCKET_NAME, Prefix=f'backup_{latest_backup}/')
-        
-        for obj in objects['Contents']:
-            key = obj['Key']
-            filename = key.split('/')[-1]
-            
-            # Map back to original paths
-            if filename.startswith('csv_'):
-                local_path = f"csv/{filename[4:]}"
-            elif filename.startswith('data_'):
-                local_path = f"data/{filename[5:]}"
-            elif filename.startswith('dataset_'):
-                local_path = f"dataset/{filename[8:]}"
-            else:
-                local_path = filename
-            
-            # Skip empty filenames
-            if not local_path or local_path == '':
-                continue
-                
-            # Create directories if needed
-            dir_path = os.path.dirname(local_path)
-            if dir_path:
-                os.makedirs(dir_path, exist_ok=True)
-            
-            # Download file
-            s3_client.download_file(BUCKET_NAME, key, local_path)
-        
-        return True, f"Restored from backup_{latest_backup}"
+        if s3_client is None:
+            return False, "AWS credentials not configured"
+
+        from backup_catalog import resolve_snapshot
+        manifest = resolve_snapshot(s3_client, backup_id, as_of)
+        if not manifest:
+            if backup_id:
+                return False, f"{backup_id} not found"
+            return False, "No backup folders found" if as_of is None else f"No backup taken before {as_of}"
+        backup_id = manifest['backup_id']
+
+        # Stage next to the live files so the final os.replace never crosses filesystems.
+        # Nothing live is touched until every file has downloaded and verified.
+        staging_dir = tempfile.mkdtemp(prefix='.restore_', dir='.')
+        staged = download_verified(s3_client, manifest, staging_dir, paths)
+        if paths is not None and not staged:
+            return False, f"{', '.join(paths)} not found in {backup_id}"
+        swap_in(staged)
+
+        return True, f"Restored {len(staged)} file(s) from {backup_id}"
     except Exception as e:
-        return False, str(e)
\ No newline at end of file
+        return False, str(e)
+    finally:
+        if staging_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
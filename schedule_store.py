@@ -0,0 +1,165 @@
+import os
+import threading
+from datetime import date
+
+from attendance_analytics import MAX_PAGE_SIZE
+from lazy_imports import lazy_import
+from reconciliation import ROSTER_CSV, ROSTER_EXCEL, SLOT_PATTERN, roster_version, shift_windows
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ---------------- Config ----------------
+LAYOUTS = ("records", "columns")   # records: one dict per nurse, as before; columns: one array per column
+ON_DUTY = "On Duty - "
+
+
+def read_published_roster():
+    """The published roster frame, Excel first like /api/schedule/full always has."""
+    if os.path.exists(ROSTER_EXCEL):
+        return pd.read_excel(ROSTER_EXCEL, sheet_name="Schedule")
+    return pd.read_csv(ROSTER_CSV)
+
+
+class ScheduleIndex:
+    """One roster version as arrays: nurses x slot columns of integer cell codes, plus per-column day and shift."""
+
+    def __init__(self, frame):
+        slots = [(c, SLOT_PATTERN.match(str(c))) for c in frame.columns]
+        slots = [(c, m) for c, m in slots if m]
+        # Nurse_ID, Name and any other descriptive columns; "Unnamed: 0" is a saved index
+        self.info = [c for c in frame.columns if not SLOT_PATTERN.match(str(c)) and not str(c).startswith("Unnamed:")]
+        self.columns = [c for c, _ in slots]
+        self.days = np.array([m.group(1) for _, m in slots], dtype="datetime64[D]")
+        self.shifts = np.array([m.group(2) for _, m in slots], dtype=object)
+
+        info = frame[self.info].astype(object)
+        self.info_values = info.where(info.notna(), None).to_numpy()
+        self.nurse_ids = (frame["Nurse_ID"].astype(str).to_numpy() if "Nurse_ID" in frame
+                          else np.array([""] * len(frame), dtype=object))
+        # Cells as codes into one label table; NaN factorizes to -1, which picks the trailing None
+        codes, labels = pd.factorize(frame[self.columns].to_numpy().ravel())
+        self.labels = np.array(list(labels) + [None], dtype=object)
+        self.codes = codes.astype(np.int32).reshape(len(frame), len(self.columns))
+        self.ward_codes = {str(label)[len(ON_DUTY):]: code for code, label in enumerate(labels)
+                           if str(label).startswith(ON_DUTY)}
+
+    def select(self, ward=None, nurse_ids=(), start=None, end=None, shifts=()):
+        """(row indices, column indices) matching the filters, in roster order."""
+        cols = np.ones(len(self.columns), dtype=bool)
+        if start:
+            cols &= self.days >= np.datetime64(start)
+        if end:
+            cols &= self.days <= np.datetime64(end)
+        if shifts:
+            cols &= np.isin(self.shifts, list(shifts))
+        cols = np.flatnonzero(cols)
+        rows = np.isin(self.nurse_ids, list(nurse_ids)) if nurse_ids else np.ones(len(self.nurse_ids), dtype=bool)
+        if ward:
+            # Nurses rostered in this ward at least once in the selected slots
+            code = self.ward_codes.get(ward)
+            if code is None:
+                rows[:] = False
+            else:
+                rows &= (self.codes[:, cols] == code).any(axis=1)
+        return np.flatnonzero(rows), cols
+
+
+class ScheduleStore:
+    """The published roster kept indexed in memory, rebuilt only when the roster files change."""
+
+    def __init__(self, loader=read_published_roster):
+        self.loader = loader
+        self._index = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        """The current ScheduleIndex; LookupError when no roster is published."""
+        version = roster_version()
+        if version == (None, None):
+            raise LookupError("no published roster")
+        with self._lock:
+            if self._index is None or version != self._version:
+                self._index = ScheduleIndex(self.loader())
+                self._version = version
+            return self._index
+
+    def query(self, ward=None, nurse_ids=(), start=None, end=None, shifts=(), page=None, per_page=None,
+              layout="records"):
+        """Filtered slice of the roster; paginated when page or per_page is given, otherwise every match."""
+        index = self.index()
+        rows, cols = index.select(ward, nurse_ids, start, end, shifts)
+        total = len(rows)
+        result = {"success": True, "total_nurses": total}
+        if page is not None or per_page is not None:
+            page = page or 1
+            per_page = per_page or MAX_PAGE_SIZE
+            rows = rows[(page - 1) * per_page:page * per_page]
+            result.update(page=page, per_page=per_page, pages=-(-total // per_page))
+
+        names = index.info + [index.columns[c] for c in cols]
+        cells = index.labels[index.codes[np.ix_(rows, cols)]]
+        info = index.info_values[rows]
+        if layout == "columns":
+            result["columns"] = names
+            result["data"] = [info[:, i].tolist() for i in range(len(index.info))] + \
+                             [cells[:, j].tolist() for j in range(len(cols))]
+        else:
+            result["schedule"] = [dict(zip(names, a + b)) for a, b in zip(info.tolist(), cells.tolist())]
+        return result
+
+
+def parse_query(args):
+    """Validated, normalized query parameters for ScheduleStore.query(); ValueError on bad input.
+
+    ward, nurse_id (comma-separated), start/end (YYYY-MM-DD, inclusive),
+    shift (comma-separated), page, per_page and format=records|columns.
+    """
+    def listed(name):
+        return tuple(sorted({v.strip() for v in (args.get(name) or "").split(",") if v.strip()}))
+
+    def day(name):
+        value = args.get(name)
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value).isoformat()
+        except ValueError:
+            raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+
+    def positive(name):
+        value = args.get(name)
+        if value in (None, ""):
+            return None
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a positive integer")
+        if value < 1:
+            raise ValueError(f"{name} must be a positive integer")
+        return value
+
+    start, end = day('start'), day('end')
+    if start and end and end < start:
+        raise ValueError("end must not be before start")
+    shifts, known = listed('shift'), shift_windows()
+    if any(s not in known for s in shifts):
+        raise ValueError(f"shift must be one of {', '.join(known)}")
+    layout = args.get('format') or "records"
+    if layout not in LAYOUTS:
+        raise ValueError(f"format must be one of {', '.join(LAYOUTS)}")
+    per_page = positive('per_page')
+    return {
+        "ward": (args.get('ward') or "").strip() or None,
+        "nurse_ids": listed('nurse_id'),
+        "start": start,
+        "end": end,
+        "shifts": shifts,
+        "page": positive('page'),
+        "per_page": min(per_page, MAX_PAGE_SIZE) if per_page else None,
+        "layout": layout,
+    }
+
+
+schedule_store = ScheduleStore()
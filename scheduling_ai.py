@@ -7,6 +7,11 @@ from openpyxl import load_workbook
 from openpyxl.styles import PatternFill
 from ortools.linear_solver import pywraplp
 import random
+import sys
+import time
+from metrics import metrics, SCHEDULER_METRICS_FILE
+from solver_history import history as solver_history, solve_record
+from memprofile import memprofile
 
 
 
@@ -60,22 +65,24 @@ def predict_next_week(df, models, days=7):
     return pd.DataFrame(preds)
 
 # ---------------- Scheduling with Optimization ----------------
-def get_next_week_start():
-    """Get the start date for next week, advancing by 7 days each generation"""
-    # Check if there's a saved current week date
+def peek_next_week_start():
+    """The start date the next generation will use, without advancing it"""
     week_file = 'current_week.txt'
     
     if os.path.exists(week_file):
         with open(week_file, 'r') as f:
             current_week_str = f.read().strip()
             current_week = datetime.strptime(current_week_str, '%Y-%m-%d').date()
-            next_week_start = current_week + timedelta(days=7)
-    else:
-        # First time - start from Monday Sept 22, 2025
-        next_week_start = datetime(2025, 9, 22).date()
+            return current_week + timedelta(days=7)
+    # First time - start from Monday Sept 22, 2025
+    return datetime(2025, 9, 22).date()
+
+def get_next_week_start():
+    """Get the start date for next week, advancing by 7 days each generation"""
+    next_week_start = peek_next_week_start()
     
     # Save the new week date
-    with open(week_file, 'w') as f:
+    with open('current_week.txt', 'w') as f:
         f.write(next_week_start.strftime('%Y-%m-%d'))
     
     print(f"Next week starts: {next_week_start}")
@@ -86,7 +93,35 @@ def get_next_monday():
     current_monday = get_current_monday()
     return current_monday + timedelta(days=7)
 
-def schedule_nurses_optimized(week_demand, nurses, wards, shifts, start_date=None, weeks=1):
+def _chosen(var):
+    return not isinstance(var, int) and var.solution_value() > 0.5
+
+def _uncovered_slots(solver, coverage, all_dates, wards, shifts):
+    """Re-solve an infeasible model with coverage allowed to fall short; returns the slots that still do.
+
+    Each coverage row gets a slack variable and the objective becomes the
+    total shortfall, so the answer names the ward/day/shift combinations the
+    available nurses cannot staff (one minimal set of them). None if even
+    that model cannot be solved.
+    """
+    short = {}
+    for key, constraint in coverage.items():
+        short[key] = solver.IntVar(0, 2, f'short[{key[0]},{key[1]},{key[2]}]')
+        constraint.SetCoefficient(short[key], 1)
+    solver.Minimize(solver.Sum(list(short.values())))
+    if solver.Solve() not in (pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE):
+        return None
+    return [{"date": all_dates[d].strftime('%Y-%m-%d'), "ward": wards[w_idx], "shift": shifts[s],
+             "missing": int(round(var.solution_value()))}
+            for (d, w_idx, s), var in sorted(short.items()) if var.solution_value() > 0.5]
+
+def schedule_nurses_optimized(week_demand, nurses, wards, shifts, start_date=None, weeks=1, unavailable=None,
+                              run_log=None, record=True):
+    """unavailable: {nurse_id: {(day offset, shift index)}} slots fixed to zero; defaults to approved MCs.
+
+    run_log: optional list that also receives this solve's telemetry record.
+    record: False keeps the solve out of data/solver_runs.jsonl (what-if runs are not real schedules).
+    """
     if start_date is None:
         start_date = get_next_week_start()
     
@@ -104,17 +139,28 @@ def schedule_nurses_optimized(week_demand, nurses, wards, shifts, start_date=Non
     # Use nurse ID as key to prevent missing/duplicate issues
     nurse_ids = [n["id"] for n in nurses]
 
+    mark = metrics.laps()
+    mem_mark = memprofile.laps()
+    build_started = time.perf_counter()
+
     # Create solver
     solver = pywraplp.Solver.CreateSolver('SCIP')
     if not solver:
         return None, None, None
 
-    # Decision variables
+    if unavailable is None:
+        from availability import availability
+        unavailable = availability.blocked_slots(nurse_ids, start_date, total_days, shifts)
+    if unavailable:
+        print(f"Fixing {sum(len(v) for v in unavailable.values())} unavailable nurse-slots to zero")
+
+    # Decision variables (unavailable slots are constant 0, so the solver never sees them)
     x = {}
     for n_idx in range(len(nurses)):
+        blocked = unavailable.get(nurse_ids[n_idx], ())
         for d in range(total_days):
             for s in range(total_shifts_per_day):
-                x[n_idx, d, s] = solver.BoolVar(f'x[{n_idx},{d},{s}]')
+                x[n_idx, d, s] = 0 if (d, s) in blocked else solver.BoolVar(f'x[{n_idx},{d},{s}]')
 
     # 1. One shift per nurse per day
     for n_idx in range(len(nurses)):
@@ -126,7 +172,8 @@ def schedule_nurses_optimized(week_demand, nurses, wards, shifts, start_date=Non
         for d in range(total_days - 1):
             solver.Add(x[n_idx, d, 2] + x[n_idx, d + 1, 0] <= 1)
 
-    # 3. Minimum 2 nurses per ward per shift
+    # 3. Minimum 2 nurses per ward per shift (rows kept to explain an infeasible roster)
+    coverage = {}
     for d in range(total_days):
         for w_idx, w in enumerate(wards):
             for s in range(total_shifts_per_day):
@@ -134,7 +181,11 @@ def schedule_nurses_optimized(week_demand, nurses, wards, shifts, start_date=Non
                                    if w in n.get("skills", []) or 
                                    any(f"{w} {role}" in n.get("skills", []) 
                                        for role in ["Nurse", "Specialist", "Charge Nurse", "Nursing Officer", "Senior Staff Nurse"])]
-                solver.Add(sum(x[n_idx, d, s] for n_idx in eligible_nurses) >= 2)
+                constraint = solver.RowConstraint(2, solver.infinity(), f'cover[{d},{w_idx},{s}]')
+                for n_idx in eligible_nurses:
+                    if not isinstance(x[n_idx, d, s], int):
+                        constraint.SetCoefficient(x[n_idx, d, s], 1)
+                coverage[d, w_idx, s] = constraint
 
     # 4. Max shifts per week and weekly hours
     for n_idx, nurse in enumerate(nurses):
@@ -153,9 +204,32 @@ def schedule_nurses_optimized(week_demand, nurses, wards, shifts, start_date=Non
     f"randomization/permutationseed=36"
 )
     solver.SetSolverSpecificParametersAsString(param_str)
+    mark("build")
+    mem_mark("build")
+    build_seconds = time.perf_counter() - build_started
 
     # Solve
+    solve_started, cpu_started = time.perf_counter(), time.process_time()
     status = solver.Solve()
+    mark("solve")
+    mem_mark("solve")
+    run = solve_record(solver, status, rand_seed, build_seconds, time.perf_counter() - solve_started,
+                       time.process_time() - cpu_started, nurses=len(nurses), days=total_days,
+                       fixed_to_zero=sum(len(v) for v in unavailable.values()), start_date=str(start_date))
+    if status == pywraplp.Solver.INFEASIBLE:
+        run["uncovered"] = _uncovered_slots(solver, coverage, all_dates, wards, shifts)
+        for slot in run["uncovered"] or []:
+            print(f"⚠️ Cannot cover {slot['ward']} {slot['date']} {slot['shift']}: "
+                  f"{slot['missing']} nurse(s) short of the minimum")
+    if run_log is not None:
+        run_log.append(run)
+    if record:
+        try:
+            solver_history.record(run)
+        except OSError as e:
+            print(f"⚠️ Solver run not recorded: {e}")
+    print(f"Solve: {run['status']} in {run['wall_seconds']}s, {run['variables']} vars, "
+          f"{run['constraints']} constraints, {run['nodes']} nodes, gap {run['gap']}, seed {rand_seed}")
 
     if status in [pywraplp.Solver.OPTIMAL, pywraplp.Solver.FEASIBLE]:
         # Build schedule with calendar days
@@ -179,7 +253,7 @@ def schedule_nurses_optimized(week_demand, nurses, wards, shifts, start_date=Non
                 for s in shifts:
                     s_idx = shift_indices[s]
                     assigned = sum(1 for n_idx in range(len(nurses)) 
-                                   if x[n_idx, d, s_idx].solution_value() > 0.5 and 
+                                   if _chosen(x[n_idx, d, s_idx]) and 
                                    (w in nurses[n_idx].get("skills", []) or any(f"{w} {role}" in nurses[n_idx].get("skills", []) for role in ["Nurse", "Specialist", "Charge Nurse", "Nursing Officer", "Senior Staff Nurse"])))
                     day_result[f"{w}_{s}_predicted"] = int(week_demand.iloc[d][w])
                     day_result[f"{w}_{s}_assigned"] = assigned
@@ -188,7 +262,7 @@ def schedule_nurses_optimized(week_demand, nurses, wards, shifts, start_date=Non
 
             for n_idx, nurse in enumerate(nurses):
                 for s_idx, s in enumerate(shifts):
-                    if x[n_idx, d, s_idx].solution_value() > 0.5:
+                    if _chosen(x[n_idx, d, s_idx]):
                         ward = next((w for w in wards if w in nurse.get("skills", []) or any(f"{w} {role}" in nurse.get("skills", []) for role in ["Nurse", "Specialist", "Charge Nurse", "Nursing Officer", "Senior Staff Nurse"])), None)
                         if ward:
                             date_str = all_dates[d].strftime('%Y-%m-%d')
@@ -210,6 +284,8 @@ def schedule_nurses_optimized(week_demand, nurses, wards, shifts, start_date=Non
         # Add nurse ID column and Name column
         schedule_df.insert(0, 'Nurse_ID', [n['id'] for n in nurses])
         schedule_df.insert(1, 'Name', nurse_names)
+        mark("extract")
+        mem_mark("extract")
 
         return schedule_df, pd.DataFrame(results_summary), nurse_hours
 
@@ -219,41 +295,63 @@ def schedule_nurses_optimized(week_demand, nurses, wards, shifts, start_date=Non
 
 # ---------------- Main ----------------
 if __name__ == "__main__":
-    
+    memprofile.begin("scheduling_ai")   # no-op unless MEMPROFILE=1
+
     print("Loading models...")
-    models = load_models()
+    with metrics.stage("load_models"), memprofile.stage("load_models"):
+        models = load_models()
 
     print("Loading dataset...")
-    df = pd.read_csv(DATASET_CSV, parse_dates=["Date"], dayfirst=True)
+    with metrics.stage("load_dataset"), memprofile.stage("load_dataset"):
+        df = pd.read_csv(DATASET_CSV, parse_dates=["Date"], dayfirst=True)
 
     print("Loading nurses database...")
-    with open(NURSE_JSON, "r", encoding="utf-8") as f:
-        nurses = json.load(f)
+    with metrics.stage("load_nurses"), memprofile.stage("load_nurses"):
+        with open(NURSE_JSON, "r", encoding="utf-8") as f:
+            nurses = json.load(f)
     print(f"Loaded {len(nurses)} nurses from {NURSE_JSON}")
 
     print("Predicting next 7 days demand...")
-    week_demand = predict_next_week(df, models, days=7)
+    with metrics.stage("predict"), memprofile.stage("predict"):
+        week_demand = predict_next_week(df, models, days=7)
 
     print("Scheduling nurses for next week...")
-    schedule_df, summary_df, nurse_hours = schedule_nurses_optimized(week_demand, nurses, wards, shifts, weeks=1)
+    runs = []
+    schedule_df, summary_df, nurse_hours = schedule_nurses_optimized(week_demand, nurses, wards, shifts, weeks=1,
+                                                                     run_log=runs)
 
     if schedule_df is not None:
-        # Save to Excel
-        with pd.ExcelWriter(OUTPUT_EXCEL, engine="openpyxl") as writer:
-            schedule_df.to_excel(writer, sheet_name="Schedule")
-            summary_df.to_excel(writer, sheet_name="Summary", index=False)
-            pd.DataFrame(list(nurse_hours.items()), columns=["Nurse ID", "Hours"]).to_excel(writer, sheet_name="Hours", index=False)
-
-        # Apply coloring
-        wb = load_workbook(OUTPUT_EXCEL)
-        ws = wb["Schedule"]
-
-        for row in ws.iter_rows(min_row=2, min_col=2):  # skip header and index col
-            for cell in row:
-                if isinstance(cell.value, str) and cell.value.startswith("On Duty"):
-                    cell.fill = fill_on_duty
-                elif cell.value == "Off":
-                    cell.fill = fill_off
-
-        wb.save(OUTPUT_EXCEL)
+        with metrics.stage("excel_write"):
+            # Save to Excel
+            with memprofile.stage("excel_write"), pd.ExcelWriter(OUTPUT_EXCEL, engine="openpyxl") as writer:
+                schedule_df.to_excel(writer, sheet_name="Schedule")
+                summary_df.to_excel(writer, sheet_name="Summary", index=False)
+                pd.DataFrame(list(nurse_hours.items()), columns=["Nurse ID", "Hours"]).to_excel(writer, sheet_name="Hours", index=False)
+
+            # Apply coloring
+            with memprofile.stage("excel_recolor"):
+                wb = load_workbook(OUTPUT_EXCEL)
+                ws = wb["Schedule"]
+
+                for row in ws.iter_rows(min_row=2, min_col=2):  # skip header and index col
+                    for cell in row:
+                        if isinstance(cell.value, str) and cell.value.startswith("On Duty"):
+                            cell.fill = fill_on_duty
+                        elif cell.value == "Off":
+                            cell.fill = fill_off
+
+                wb.save(OUTPUT_EXCEL)
         print(f"Schedule saved to {OUTPUT_EXCEL} successfully. All nurses included!")
+
+    # Hand this run's stage timings to the app that spawned us
+    metrics.dump(SCHEDULER_METRICS_FILE)
+    memprofile.finish()
+
+    if schedule_df is None:
+        # The app reports stderr; without this it would report the previous week's roster as new
+        run = runs[-1] if runs else {}
+        reason = f"No schedule: solver status {run.get('status', 'not_solved')}"
+        if run.get("uncovered"):
+            reason += "; cannot cover " + ", ".join(f"{u['ward']} {u['date']} {u['shift']} (short {u['missing']})"
+                                                    for u in run["uncovered"])
+        sys.exit(reason)
@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+# ---------------- Config ----------------
+RUNS_FILE = "data/solver_runs.jsonl"
+MAX_RUNS = 5000                 # oldest runs are dropped once the file holds twice this many
+STATUS_NAMES = {0: "optimal", 1: "feasible", 2: "infeasible", 3: "unbounded", 4: "abnormal",
+                5: "model_invalid", 6: "not_solved"}   # pywraplp.Solver result codes
+
+
+def solve_record(solver, status, seed, build_seconds, wall_seconds, cpu_seconds, **extra):
+    """Telemetry for one pywraplp solve: model size, timings, status, objective, bound, gap and nodes."""
+    record = {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "status": STATUS_NAMES.get(status, str(status)),
+        "seed": seed,
+        "variables": solver.NumVariables(),
+        "constraints": solver.NumConstraints(),
+        "build_seconds": round(build_seconds, 4),
+        "wall_seconds": round(wall_seconds, 4),
+        "cpu_seconds": round(cpu_seconds, 4),
+        "objective": None,
+        "best_bound": None,
+        "gap": None,
+        "nodes": solver.nodes(),
+        "iterations": solver.iterations(),
+    }
+    if status in (0, 1):
+        objective = solver.Objective()
+        value, bound = objective.Value(), objective.BestBound()
+        record["objective"] = value
+        record["best_bound"] = bound
+        record["gap"] = round(abs(value - bound) / max(abs(value), 1e-9), 6)
+    record.update(extra)
+    return record
+
+
+class SolverHistory:
+    """Append-only JSON-lines log of solver runs with simple trend queries."""
+
+    def __init__(self, path=RUNS_FILE, max_runs=MAX_RUNS):
+        self.path = path
+        self.max_runs = max_runs
+        self._count = None   # lines in the file, counted once then tracked
+        self._lock = threading.Lock()
+
+    def record(self, run):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._lock:
+            if self._count is None:
+                self._count = len(self._read())
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(run) + "\n")
+            self._count += 1
+            if self._count > 2 * self.max_runs:
+                runs = self._read()[-self.max_runs:]
+                tmp = self.path + '.tmp'
+                with open(tmp, 'w') as f:
+                    f.writelines(json.dumps(r) + "\n" for r in runs)
+                os.replace(tmp, self.path)
+                self._count = len(runs)
+        return run
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        runs = []
+        for line in lines:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue   # a torn last line from an interrupted write
+        return runs
+
+    def query(self, status=None, seed=None, since=None, limit=50):
+        """Newest-first runs plus a summary: solve-time percentiles, averages by roster size and per seed."""
+        with self._lock:
+            runs = self._read()
+        if status:
+            runs = [r for r in runs if r.get("status") == status]
+        if seed is not None:
+            runs = [r for r in runs if r.get("seed") == seed]
+        if since:
+            runs = [r for r in runs if r.get("run_at", "") >= since]
+
+        walls = sorted(r["wall_seconds"] for r in runs if r.get("wall_seconds") is not None)
+        by_seed = {}
+        for r in runs:
+            entry = by_seed.setdefault(r.get("seed"), {"runs": 0, "wall_seconds": 0.0, "nodes": 0})
+            entry["runs"] += 1
+            entry["wall_seconds"] += r.get("wall_seconds") or 0
+            entry["nodes"] += r.get("nodes") or 0
+        seeds = [{"seed": seed, "runs": e["runs"], "mean_wall_seconds": round(e["wall_seconds"] / e["runs"], 4),
+                  "mean_nodes": round(e["nodes"] / e["runs"], 1)} for seed, e in by_seed.items()]
+        seeds.sort(key=lambda e: e["mean_wall_seconds"], reverse=True)
+        by_size = {}
+        for r in runs:
+            by_size.setdefault((r.get("nurses"), r.get("days")), []).append(r)
+        sizes = [{"nurses": nurses, "days": days, "runs": len(group),
+                  "mean_variables": round(sum(r.get("variables") or 0 for r in group) / len(group), 1),
+                  "mean_wall_seconds": round(sum(r.get("wall_seconds") or 0 for r in group) / len(group), 4)}
+                 for (nurses, days), group in by_size.items()]
+        sizes.sort(key=lambda e: (e["nurses"] or 0, e["days"] or 0))
+        return {
+            "total": len(runs),
+            "summary": {
+                "wall_seconds_p50": _percentile(walls, 0.5),
+                "wall_seconds_p95": _percentile(walls, 0.95),
+                "wall_seconds_max": walls[-1] if walls else None,
+                "statuses": _counts(r.get("status") for r in runs),
+                "by_roster_size": sizes,
+                "slowest_seeds": seeds[:10],
+            },
+            "runs": runs[::-1][:limit],
+        }
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def _counts(values):
+    counts = {}
+    for v in values:
+        counts[v] = counts.get(v, 0) + 1
+    return counts
+
+
+history = SolverHistory()
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+
+from attendance_analytics import _file_version
+from lazy_imports import lazy_import
+from reconciliation import shift_windows
+from schedule_store import schedule_store
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ---------------- Config ----------------
+DATASET_CSV = "dataset/covid_dataset.csv"
+MODELS_DIR = "models"
+WARDS = ("ED", "GW", "ICU")
+WARD_TARGETS = {"ED": "ED_Nurses", "GW": "GW_Nurses", "ICU": "ICU_Nurses"}   # as trained in ML.py
+FEATURES = ["New case", "ICU", "Admission"]
+MIN_NURSES = 2                 # predict_next_week never asks for fewer per ward and shift
+METHODS = ("trees", "residuals")
+DEFAULT_TRAJECTORIES = 10000
+MAX_TRAJECTORIES = 100000
+DEFAULT_SEED = 7               # fixed, so the same roster and models give the same (cacheable) answer
+
+
+def model_path(ward):
+    return os.path.join(MODELS_DIR, f"{ward}_nurse_demand.pkl")
+
+
+def inputs_version():
+    """File versions the forecast depends on: the ward models and the dataset."""
+    return tuple(_file_version(model_path(w)) for w in WARDS) + (_file_version(DATASET_CSV),)
+
+
+class DemandModel:
+    """What the simulator needs from the RandomForests, computed once per model/dataset version.
+
+    tree_predictions: (wards, trees) per-tree forecasts for the latest
+    dataset row, the spread predict_next_week averages away.
+    point: (wards,) the forests' point forecasts.
+    residuals: (wards, rows) forecast errors on the dataset, padded with
+    NaN; residual_counts says how many are real. Out-of-bag errors when the
+    pickled forests still expose their bootstrap samples, in-sample
+    otherwise (which understates the spread).
+    """
+
+    def __init__(self, models, dataset):
+        latest = dataset[FEATURES].fillna(0).iloc[[-1]].to_numpy(dtype=float)
+        self.tree_predictions = np.stack([
+            np.array([tree.predict(latest)[0] for tree in models[w].estimators_]) for w in WARDS])
+        self.point = self.tree_predictions.mean(axis=1)
+
+        X = dataset[FEATURES].fillna(0).to_numpy(dtype=float)
+        residuals, self.residual_source = [], "out_of_bag"
+        for w in WARDS:
+            y = dataset[WARD_TARGETS[w]].to_numpy(dtype=float)
+            known = ~np.isnan(y)
+            per_tree = np.stack([tree.predict(X) for tree in models[w].estimators_])
+            try:
+                in_bag = np.zeros(per_tree.shape, dtype=bool)
+                for t, samples in enumerate(models[w].estimators_samples_):
+                    in_bag[t, samples] = True
+                votes = (~in_bag).sum(axis=0)
+                predicted = np.where(votes > 0, (per_tree * ~in_bag).sum(axis=0) / np.maximum(votes, 1), np.nan)
+            except (AttributeError, ValueError):
+                # Forests pickled by another scikit-learn version cannot rebuild their bootstrap samples
+                predicted, self.residual_source = per_tree.mean(axis=0), "in_sample"
+            error = (y - predicted)[known & ~np.isnan(predicted)]
+            residuals.append(error)
+        self.residual_counts = np.array([len(r) for r in residuals])
+        self.residuals = np.full((len(WARDS), max(self.residual_counts.max(), 1)), np.nan)
+        for i, r in enumerate(residuals):
+            self.residuals[i, :len(r)] = r
+
+    def draw(self, rng, trajectories, days, method="trees"):
+        """(trajectories, wards, days) nurses required per shift, rounded and floored like predict_next_week.
+
+        trees: each trajectory picks one tree per ward and keeps its forecast
+        for every day, as predict_next_week applies one forecast to the whole
+        week; the spread is between trajectories, not between days.
+        residuals: each day adds an independent forecast error, which treats
+        day-to-day errors as uncorrelated. Real errors persist across a week,
+        so this understates the chance of a sustained shortfall and
+        overstates the chance of a shortfall on at least one day.
+        """
+        shape = (trajectories, len(WARDS), days)
+        ward = np.arange(len(WARDS))[None, :, None]
+        if method == "trees":
+            picks = rng.integers(0, self.tree_predictions.shape[1], size=(trajectories, len(WARDS), 1))
+            demand = np.broadcast_to(self.tree_predictions[ward, picks], shape)
+        else:
+            picks = (rng.random(shape) * self.residual_counts[None, :, None]).astype(np.int64)
+            demand = self.point[None, :, None] + np.nan_to_num(self.residuals[ward, picks])
+        return np.maximum(np.rint(demand), MIN_NURSES).astype(np.int16)
+
+
+def roster_headcounts(index, shift_names):
+    """(day strings, (wards, days, shifts) nurses rostered) from a ScheduleIndex."""
+    days = np.unique(index.days)
+    counts = np.zeros((len(WARDS), len(days), len(shift_names)), dtype=np.int16)
+    day_of = np.searchsorted(days, index.days)
+    shift_of = np.array([shift_names.index(s) if s in shift_names else -1 for s in index.shifts], dtype=np.int64)
+    usable = shift_of >= 0
+    for w, ward in enumerate(WARDS):
+        code = index.ward_codes.get(ward)
+        if code is None:
+            continue
+        on_duty = (index.codes == code).sum(axis=0)
+        counts[w, day_of[usable], shift_of[usable]] = on_duty[usable]
+    return [str(d) for d in days], counts
+
+
+def simulate(demand_model, headcounts, trajectories=DEFAULT_TRAJECTORIES, method="trees", seed=DEFAULT_SEED):
+    """Shortfall statistics for `trajectories` demand draws against (wards, days, shifts) headcounts."""
+    rng = np.random.default_rng(seed)
+    required = demand_model.draw(rng, trajectories, headcounts.shape[1], method)   # (n, wards, days)
+    gap = required[..., None] - headcounts[None]                                 # (n, wards, days, shifts)
+    short = gap > 0
+    return {
+        "p_any_shortfall": float(short.any(axis=(1, 2, 3)).mean()),
+        "p_short_slot": short.mean(axis=0),                           # (wards, days, shifts)
+        "p_short_any_day": short.any(axis=2).mean(axis=0),            # (wards, shifts)
+        "expected_short_days": short.sum(axis=2).mean(axis=0),        # (wards, shifts)
+        "expected_gap": np.maximum(gap, 0).mean(axis=(0, 2)),         # (wards, shifts) nurses per shift
+        "demand_quantiles": np.percentile(required, [50, 90], axis=0),   # (2, wards, days)
+    }
+
+
+class StaffingRisk:
+    """Monte Carlo shortfall risk of the published roster under the demand models' uncertainty."""
+
+    def __init__(self):
+        self._model = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def demand_model(self):
+        """DemandModel for the current model and dataset files, rebuilt only when they change."""
+        version = inputs_version()
+        with self._lock:
+            if self._model is None or version != self._version:
+                import joblib
+                models = {w: joblib.load(model_path(w)) for w in WARDS}
+                self._model = DemandModel(models, pd.read_csv(DATASET_CSV))
+                self._version = version
+            return self._model
+
+    def report(self, trajectories=DEFAULT_TRAJECTORIES, method="trees", seed=DEFAULT_SEED):
+        """Shortfall probabilities per ward and shift, and per slot, for the published roster."""
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {', '.join(METHODS)}")
+        trajectories = int(trajectories)
+        if not 1 <= trajectories <= MAX_TRAJECTORIES:
+            raise ValueError(f"trajectories must be between 1 and {MAX_TRAJECTORIES}")
+        shift_names = list(shift_windows())
+        days, headcounts = roster_headcounts(schedule_store.index(), shift_names)
+        model = self.demand_model()
+
+        started = time.perf_counter()
+        result = simulate(model, headcounts, trajectories, method, seed)
+        seconds = time.perf_counter() - started
+
+        by_ward_shift, slots = [], []
+        for w, ward in enumerate(WARDS):
+            for s, shift in enumerate(shift_names):
+                by_ward_shift.append({
+                    "ward": ward, "shift": shift,
+                    "p_short_any_day": round(float(result["p_short_any_day"][w, s]), 4),
+                    "p_short_per_day": round(float(result["p_short_slot"][w, :, s].mean()), 4),
+                    "expected_short_days": round(float(result["expected_short_days"][w, s]), 3),
+                    "expected_gap": round(float(result["expected_gap"][w, s]), 3),
+                })
+                for d, day in enumerate(days):
+                    slots.append({
+                        "date": day, "ward": ward, "shift": shift,
+                        "rostered": int(headcounts[w, d, s]),
+                        "demand_p50": int(result["demand_quantiles"][0, w, d]),
+                        "demand_p90": int(result["demand_quantiles"][1, w, d]),
+                        "p_short": round(float(result["p_short_slot"][w, d, s]), 4),
+                    })
+        return {
+            "method": method,
+            "residuals": model.residual_source if method == "residuals" else None,
+            "trajectories": trajectories,
+            "days": len(days),
+            "seed": seed,
+            "simulation_seconds": round(seconds, 4),
+            "point_forecast": {ward: round(float(model.point[w]), 2) for w, ward in enumerate(WARDS)},
+            "p_any_shortfall": round(result["p_any_shortfall"], 4),
+            "by_ward_shift": by_ward_shift,
+            "slots": slots,
+        }
+
+
+staffing_risk = StaffingRisk()
+
+
+if __name__ == "__main__":
+    # 10,000 trajectories against a synthetic 28-day roster of 90 nurses
+    demand_model = staffing_risk.demand_model()
+    rng = np.random.default_rng(0)
+    headcounts = rng.integers(2, 6, size=(len(WARDS), 28, 3)).astype(np.int16)
+    for method in METHODS:
+        simulate(demand_model, headcounts, 100, method)   # warm up
+        started = time.perf_counter()
+        result = simulate(demand_model, headcounts, DEFAULT_TRAJECTORIES, method)
+        print(f"{method:10} {DEFAULT_TRAJECTORIES} x 28 days in {time.perf_counter() - started:.3f}s, "
+              f"P(any shortfall) = {result['p_any_shortfall']:.3f}")
+    print(f"residuals: {demand_model.residual_source}")
@@ -0,0 +1,123 @@
+import argparse
+import http.cookiejar
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from load_test import free_port
+
+# ---------------- Config ----------------
+HEAVY_MODULES = ("pandas", "numpy", "sklearn", "ortools", "openpyxl", "google.generativeai")
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+ADMIN_ID = "N1001"
+COVER_FOR = "N1002"   # first /api/replacements call builds the roster and replacement indexes
+
+
+def measure_import(lazy, runs):
+    """Median wall time of `import app` in fresh interpreters, and which heavy modules it pulled in."""
+    env = dict(os.environ, LAZY_IMPORTS='1' if lazy else '0', LLM_BACKEND='stub')
+    samples, loaded = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', IMPORT_PROBE], env=env, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded = result["loaded"]
+    return {"import_seconds": round(statistics.median(samples), 3), "heavy_modules_loaded": loaded}
+
+
+def server_command(mode, port):
+    if mode.startswith("gunicorn"):
+        return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', 'app:app']
+    warm = "warm_state(); " if mode == "flask-warm" else ""
+    return [sys.executable, '-c',
+            f"from app import app, warm_state; {warm}app.run(host='127.0.0.1', port={port}, threaded=True)"]
+
+
+def timed_request(opener, url, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(url, data=data, method='POST' if data else 'GET',
+                                 headers={"Content-Type": "application/json"} if data else {})
+    started = time.perf_counter()
+    try:
+        with opener.open(req, timeout=120) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def measure_first_request(mode):
+    """Spawn a server and time spawn -> first answered login, then the first hit on each kind of route."""
+    port = free_port()
+    env = dict(os.environ, LLM_BACKEND='stub', FLASK_ENV='production', PORT=str(port),
+               LAZY_IMPORTS='0' if mode == "flask-eager" else '1', PRELOAD='0' if mode == "gunicorn" else '1')
+    base = f"http://127.0.0.1:{port}"
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    started = time.perf_counter()
+    process = subprocess.Popen(server_command(mode, port), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{mode} server exited during startup")
+            if time.perf_counter() - started > 180:
+                raise RuntimeError(f"{mode} server did not answer within 180s")
+            try:
+                status, _ = timed_request(opener, base + '/api/login',
+                                          {"nurse_id": ADMIN_ID, "password": f"{ADMIN_ID}_Hack"})
+                break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.05)
+        result = {"mode": mode, "time_to_first_request_seconds": round(time.perf_counter() - started, 3),
+                  "login_status": status}
+        # First hits: a light route, then the ones that need pandas and the roster caches
+        for name, route in (("status", '/api/status'), ("schedule_full", '/api/schedule/full'),
+                            ("replacements", f'/api/replacements?nurse_id={COVER_FOR}')):
+            status, seconds = timed_request(opener, base + route)
+            result[f"first_{name}_ms"] = round(seconds * 1000, 1)
+            result[f"first_{name}_status"] = status
+        return result
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure app import time and time-to-first-request")
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per import measurement')
+    parser.add_argument('--json', help='also write the results as JSON to this path')
+    args = parser.parse_args()
+
+    modes = ["flask-eager", "flask-lazy", "flask-warm"]
+    if importlib.util.find_spec("gunicorn") is not None:
+        modes += ["gunicorn", "gunicorn-preload"]
+    else:
+        print("gunicorn not installed - skipping the preload comparison")
+
+    results = {"import": {"eager": measure_import(False, args.runs), "lazy": measure_import(True, args.runs)},
+               "servers": [measure_first_request(mode) for mode in modes]}
+
+    print(f"{'import app':18} {'seconds':>8}  heavy modules loaded")
+    for name, r in results["import"].items():
+        print(f"{name:18} {r['import_seconds']:8.3f}  {', '.join(r['heavy_modules_loaded']) or '-'}")
+    print("-" * 80)
+    print(f"{'server':18} {'first req s':>11} {'status ms':>10} {'schedule ms':>12} {'replacements ms':>16}")
+    for r in results["servers"]:
+        print(f"{r['mode']:18} {r['time_to_first_request_seconds']:11.3f} {r['first_status_ms']:10.1f} "
+              f"{r['first_schedule_full_ms']:12.1f} {r['first_replacements_ms']:16.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
@@ -0,0 +1,352 @@
+import re
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+
+from attendance_analytics import CONFIG_FILE, _file_version
+from mc_store import store as mc_store, window_dates
+from nurse_directory import directory
+from reconciliation import ROSTER_CSV, ROSTER_EXCEL, SLOT_PATTERN, load_roster, shift_windows
+
+# ---------------- Config ----------------
+# Same ward eligibility as schedule_nurses_optimized: the ward itself or "<ward> <role>" among the skills
+WARD_ROLES = ("Nurse", "Specialist", "Charge Nurse", "Nursing Officer", "Senior Staff Nurse")
+FORBIDDEN_SEQUENCES = (("Night", "Morning"),)   # (shift on day d, shift on day d+1) that cannot follow each other
+DAY_LABEL = re.compile(r"^Day (\d+) (\w+)$")                       # "Day 3 Night" from the chat swap form
+DATED_LABEL = re.compile(r"(\d{4}-\d{2}-\d{2}) (\w+)$")            # "Monday 2025-10-20 Night" or "2025-10-20 Night"
+
+
+def can_work_ward(nurse, ward):
+    skills = nurse.get("skills", ())
+    return ward in skills or any(f"{ward} {role}" in skills for role in WARD_ROLES)
+
+
+def _week(day):
+    d = date.fromisoformat(day)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+class Roster:
+    """The published roster as {nurse_id: {(date, shift): ward}} plus slot label resolution."""
+
+    def __init__(self, frame, windows):
+        self.shifts = list(windows)
+        self.hours = {s: length / 60 for s, (_, length) in windows.items()}
+        self.duty = {}
+        self.dates = []
+        if frame is None or "Nurse_ID" not in frame:
+            return
+        slots = {}
+        for column in frame.columns:
+            m = SLOT_PATTERN.match(str(column))
+            if m and m.group(2) in windows:
+                slots[column] = (m.group(1), m.group(2))
+        self.dates = sorted({day for day, _ in slots.values()})
+        for row in frame.to_dict("records"):
+            duties = self.duty.setdefault(str(row["Nurse_ID"]), {})
+            for column, slot in slots.items():
+                value = str(row[column])
+                if value.startswith("On Duty"):
+                    duties[slot] = value.split(" - ", 1)[1] if " - " in value else None
+
+    def resolve(self, label):
+        """Map a swap label onto a roster slot (date, shift); "Day N" counts from the roster's first day."""
+        label = str(label or "").strip()
+        m = DAY_LABEL.match(label)
+        if m:
+            index = int(m.group(1)) - 1
+            if 0 <= index < len(self.dates) and m.group(2) in self.shifts:
+                return (self.dates[index], m.group(2))
+            return None
+        m = DATED_LABEL.search(label)
+        if m and m.group(2) in self.shifts:
+            return (m.group(1), m.group(2))
+        return None
+
+    def order(self, slot):
+        return (slot[0], self.shifts.index(slot[1]))
+
+    @staticmethod
+    def column(slot):
+        return f"{date.fromisoformat(slot[0]).strftime('%A')} {slot[0]} {slot[1]}"
+
+
+def hopcroft_karp(adjacency, right_count):
+    """Maximum bipartite matching. adjacency[u] lists the right vertices left vertex u may pair with.
+
+    Returns match_left, where match_left[u] is u's partner or -1. Runs in
+    O(E * sqrt(V)): each phase finds a maximal set of shortest augmenting
+    paths with one BFS and iterative DFS passes.
+    """
+    INF = float("inf")
+    left_count = len(adjacency)
+    match_left = [-1] * left_count
+    match_right = [-1] * right_count
+
+    # Greedy start: most vertices pair directly, leaving few for the phases
+    for u, neighbours in enumerate(adjacency):
+        for v in neighbours:
+            if match_right[v] == -1:
+                match_left[u], match_right[v] = v, u
+                break
+
+    while True:
+        dist = [INF] * left_count
+        queue = deque(u for u in range(left_count) if match_left[u] == -1)
+        for u in queue:
+            dist[u] = 0
+        found = False
+        while queue:
+            u = queue.popleft()
+            for v in adjacency[u]:
+                w = match_right[v]
+                if w == -1:
+                    found = True
+                elif dist[w] == INF:
+                    dist[w] = dist[u] + 1
+                    queue.append(w)
+        if not found:
+            return match_left
+
+        cursor = [0] * left_count
+        for root in range(left_count):
+            if match_left[root] != -1:
+                continue
+            path = [root]
+            while path:
+                u = path[-1]
+                if cursor[u] == len(adjacency[u]):
+                    dist[u] = INF          # dead end for this phase
+                    path.pop()
+                    continue
+                v = adjacency[u][cursor[u]]
+                cursor[u] += 1
+                w = match_right[v]
+                if w == -1:
+                    # Augment along the path: each left vertex takes the right vertex it stepped through
+                    for x in reversed(path):
+                        previous = match_left[x]
+                        match_left[x], match_right[v] = v, x
+                        v = previous
+                    break
+                if dist[w] == dist[u] + 1:
+                    path.append(w)
+
+
+class SwapMatcher:
+    """Pairs pending swap requests against the published roster, with matched swaps applied.
+
+    Two requests are compatible when each nurse is rostered on the shift the
+    other wants, can work the other's ward, and after the swap still has one
+    shift per day, no Night followed by a Morning, stays within the weekly
+    shift and hours caps and has no approved MC on the new day. Requests
+    are oriented by which of their two slots comes first, so every candidate
+    pair has one request on each side and a maximum matching over all of
+    them is a bipartite matching.
+    """
+
+    def __init__(self, config_path=CONFIG_FILE):
+        self.config_path = config_path
+        self._version = None
+        self._roster = None
+        self._lock = threading.Lock()
+
+    @property
+    def max_weekly_hours(self):
+        from scheduling_ai import MAX_WEEKLY_HOURS
+        return MAX_WEEKLY_HOURS
+
+    def roster(self):
+        """The parsed roster, reloaded only when the roster or config files change."""
+        version = (_file_version(ROSTER_CSV), _file_version(ROSTER_EXCEL), _file_version(self.config_path))
+        with self._lock:
+            if self._roster is None or version != self._version:
+                self._roster = Roster(load_roster(), shift_windows(self.config_path))
+                self._version = version
+            return self._roster
+
+    def resolve(self, request, roster=None):
+        """(current slot, desired slot) of a request, preferring the dated slots stored at submission."""
+        roster = roster or self.roster()
+        return (roster.resolve(request.get("current_slot") or request.get("current_shift")),
+                roster.resolve(request.get("desired_slot") or request.get("desired_shift")))
+
+    def duty(self, requests, roster=None):
+        """{nurse_id: {slot: ward}} of the published roster with the "matched" swaps in `requests` applied.
+
+        Each side of a matched pair takes the ward its counterpart was rostered
+        in, so the caps and "rostered on the current shift" checks see who
+        actually works each slot.
+        """
+        roster = roster or self.roster()
+        duty = {nurse_id: dict(slots) for nurse_id, slots in roster.duty.items()}
+        for request in requests:
+            if request.get("status") != "matched":
+                continue
+            current, desired = self.resolve(request, roster)
+            if current is None or desired is None:
+                continue
+            ward = roster.duty.get(request.get("counterpart_nurse_id"), {}).get(desired)
+            duties = duty.setdefault(request["nurse_id"], {})
+            duties.pop(current, None)
+            duties[desired] = ward
+        return duty
+
+    def _fits(self, nurse, duties, give, take, ward, unavailable, roster):
+        """Whether `nurse`, rostered on `duties`, can give up slot `give` and work `take` in `ward`."""
+        if nurse is None or not can_work_ward(nurse, ward):
+            return False
+        if take[0] in unavailable.get(nurse["id"], ()):
+            return False
+        after = [slot for slot in duties if slot != give]
+        if any(day == take[0] for day, _ in after):
+            return False
+        before_day = (date.fromisoformat(take[0]) - timedelta(days=1)).isoformat()
+        after_day = (date.fromisoformat(take[0]) + timedelta(days=1)).isoformat()
+        for first, second in FORBIDDEN_SEQUENCES:
+            if take[1] == second and (before_day, first) in after:
+                return False
+            if take[1] == first and (after_day, second) in after:
+                return False
+        week = _week(take[0])
+        same_week = [slot for slot in after if _week(slot[0]) == week] + [take]
+        if len(same_week) > nurse.get("max_shifts_per_week", 7):
+            return False
+        return sum(roster.hours[s] for _, s in same_week) <= self.max_weekly_hours
+
+    def match(self, requests):
+        """Find a maximum set of mutually compatible pending swaps.
+
+        Returns {"pairs": [(request, counterpart, current slot, desired slot)],
+        "unmatched": {request id: reason}, "elapsed_ms": ...}.
+        """
+        started = time.perf_counter()
+        roster = self.roster()
+        duty = self.duty(requests, roster)
+        snapshot = directory.snapshot()
+        unmatched = {}
+        candidates = []   # (request, nurse_id, current slot, desired slot, ward)
+        for request in requests:
+            if request.get("status") != "pending":
+                continue
+            current, desired = self.resolve(request, roster)
+            if current is None or desired is None:
+                unmatched[request["id"]] = "shift not in the published roster"
+            elif current == desired:
+                unmatched[request["id"]] = "current and desired shift are the same"
+            elif current not in duty.get(request["nurse_id"], {}):
+                unmatched[request["id"]] = "not rostered on the current shift"
+            else:
+                ward = duty[request["nurse_id"]][current]
+                candidates.append((request, request["nurse_id"], current, desired, ward))
+
+        unavailable = {}
+        if candidates and roster.dates:
+            for window in mc_store.unavailability(roster.dates[0], roster.dates[-1]):
+                dates = window_dates(window)
+                if dates is None:
+                    continue
+                day, last = dates
+                while day <= last:
+                    unavailable.setdefault(window["nurse_id"], set()).add(day.isoformat())
+                    day += timedelta(days=1)
+
+        # Orient each request by slot order; compatible requests sit on opposite sides of the same slot pair
+        left, right, right_by_pair = [], [], {}
+        for candidate in sorted(candidates, key=lambda c: (c[0].get("submitted_at") or "", c[0]["id"])):
+            _, _, current, desired, _ = candidate
+            if roster.order(current) < roster.order(desired):
+                left.append(candidate)
+            else:
+                right_by_pair.setdefault((desired, current), []).append(len(right))
+                right.append(candidate)
+
+        fits = {}
+
+        def fits_cached(nurse_id, give, take, ward):
+            key = (nurse_id, give, take, ward)
+            if key not in fits:
+                duties = duty.get(nurse_id, {})
+                fits[key] = self._fits(snapshot.get(nurse_id), duties, give, take, ward, unavailable, roster)
+            return fits[key]
+
+        adjacency = []
+        for _, nurse_id, current, desired, ward in left:
+            adjacency.append([
+                j for j in right_by_pair.get((current, desired), ())
+                if right[j][1] != nurse_id
+                and fits_cached(nurse_id, current, desired, right[j][4])
+                and fits_cached(right[j][1], desired, current, ward)
+            ])
+        match_left = hopcroft_karp(adjacency, len(right))
+
+        # Pairs were checked against the roster one at a time; re-check them applied together
+        duties = {nurse_id: dict(slots) for nurse_id, slots in duty.items()}
+        pairs, matched = [], set()
+        for i, j in enumerate(match_left):
+            if j == -1:
+                continue
+            a, b = left[i], right[j]
+            if (self._fits(snapshot.get(a[1]), duties.get(a[1], {}), a[2], a[3], b[4], unavailable, roster) and
+                    self._fits(snapshot.get(b[1]), duties.get(b[1], {}), b[2], b[3], a[4], unavailable, roster)):
+                for nurse_id, give, take, ward in ((a[1], a[2], a[3], b[4]), (b[1], b[2], b[3], a[4])):
+                    duties[nurse_id].pop(give, None)
+                    duties[nurse_id][take] = ward
+                pairs.append((a[0], b[0], a[2], a[3]))
+                matched.update((a[0]["id"], b[0]["id"]))
+        for request, *_ in candidates:
+            if request["id"] not in matched:
+                unmatched[request["id"]] = "no compatible counterpart"
+
+        return {
+            "pairs": pairs,
+            "unmatched": unmatched,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+
+def apply_matches(requests, pairs, matched_by):
+    """Mark each matched pair (dicts from `requests`) as "matched" and cross-reference them."""
+    matched_at = datetime.now().isoformat()
+    for a, b, current, desired in pairs:
+        for record, other, give, take in ((a, b, current, desired), (b, a, desired, current)):
+            record.update({
+                "status": "matched",
+                "matched_with": other["id"],
+                "counterpart_nurse_id": other["nurse_id"],
+                "current_slot": Roster.column(give),
+                "desired_slot": Roster.column(take),
+                "matched_by": matched_by,
+                "matched_at": matched_at,
+            })
+    return requests
+
+
+matcher = SwapMatcher()
+
+
+if __name__ == "__main__":
+    import random
+
+    # Synthetic load: rostered shifts traded in reciprocal pairs within a ward, a quarter of them one-sided
+    roster = matcher.roster()
+    by_ward = {}
+    for nurse_id, duties in roster.duty.items():
+        for slot, ward in duties.items():
+            by_ward.setdefault(ward, []).append((nurse_id, slot))
+    wards = [w for w, shifts in by_ward.items() if len(shifts) > 1]
+    all_slots = [(day, s) for day in roster.dates for s in roster.shifts]
+    rng = random.Random(7)
+    synthetic = []
+    for n in range(200):
+        (a, x), (b, y) = rng.sample(by_ward[rng.choice(wards)], 2)
+        for nurse_id, give, take in ((a, x, y), (b, y, x)):
+            synthetic.append({"id": f"SWAP_{len(synthetic)}", "nurse_id": nurse_id, "status": "pending",
+                              "submitted_at": f"{len(synthetic):05d}", "current_slot": Roster.column(give),
+                              "desired_slot": Roster.column(take if n % 4 else rng.choice(all_slots))})
+    matcher.max_weekly_hours       # warm the scheduler config import
+    matcher.match(synthetic[:2])
+    result = matcher.match(synthetic)
+    print(f"🔄 {len(synthetic)} requests: {len(result['pairs'])} pairs matched, "
+          f"{len(result['unmatched'])} unmatched in {result['elapsed_ms']} ms")
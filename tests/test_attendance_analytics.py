@@ -0,0 +1,108 @@
+import json
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import attendance_analytics
+import reconciliation
+from attendance_analytics import AttendanceAnalytics, build_daily, split_attendance
+
+STARTS = {"Morning": 420, "Evening": 900, "Night": 1380}
+MONDAY = date(2025, 10, 20)
+
+
+def test_lateness_uses_the_rostered_shift_and_falls_back_to_the_nearest():
+    attendance = {"N1": {"2025-10-20": {"checkin": "12:30:00", "checkout": "15:00:00"},
+                         "2025-10-21": {"checkin": "07:20:00", "checkout": "15:00:00"}},
+                  "N2": {"2025-10-20": {"checkin": "23:10:00", "checkout": "07:05:00"},
+                         "2025-10-21": {"checkout": "07:00:00"}}}
+    rostered = pd.DataFrame({"nurse_id": ["N1"], "date": [pd.Timestamp("2025-10-20")], "shift": ["Morning"]})
+    daily = build_daily(attendance, STARTS, grace=5, rostered=rostered).set_index(["nurse_id", "date"])
+
+    rostered_row = daily.loc[("N1", pd.Timestamp("2025-10-20"))]
+    # 12:30 is nearer the Evening start, but the nurse was rostered for Morning
+    assert (rostered_row["shift"], rostered_row["shift_source"], rostered_row["late_minutes"]) == ("Morning", "roster", 330)
+    guessed = daily.loc[("N1", pd.Timestamp("2025-10-21"))]
+    assert (guessed["shift"], guessed["shift_source"], guessed["late_minutes"]) == ("Morning", "nearest", 20)
+    night = daily.loc[("N2", pd.Timestamp("2025-10-20"))]
+    assert night["shift"] == "Night" and night["hours"] == pytest.approx(7 + 55 / 60) and night["late_minutes"] == 10
+    no_checkin = daily.loc[("N2", pd.Timestamp("2025-10-21"))]
+    assert pd.isna(no_checkin["shift"]) and not no_checkin["late"] and no_checkin["hours"] == 0
+
+
+def test_split_keeps_the_sunday_before_the_cutoff_open():
+    closed, recent = split_attendance({"N1": {"2025-10-18": 1, "2025-10-19": 2, "2025-10-20": 3}}, "2025-10-19")
+    assert closed == {"N1": {"2025-10-18": 1}} and recent == {"N1": {"2025-10-19": 2, "2025-10-20": 3}}
+
+
+@pytest.fixture
+def analytics(tmp_path, monkeypatch):
+    monkeypatch.setattr(attendance_analytics, "open_week_start", lambda: MONDAY)
+    monkeypatch.setattr(attendance_analytics, "rostered_shifts", lambda config_path: pd.DataFrame(
+        {"nurse_id": ["N1"], "date": [pd.Timestamp("2025-10-13")], "shift": ["Evening"]}))
+    monkeypatch.setattr(reconciliation, "roster_version", lambda: (None, None))
+    return AttendanceAnalytics(path=str(tmp_path / "attendance.json"))
+
+
+def write(analytics, attendance):
+    with open(analytics.path, "w") as f:
+        json.dump(attendance, f)
+
+
+def shift(checkin, checkout="15:00:00"):
+    return {"checkin": checkin, "checkout": checkout, "status": "present"}
+
+
+def rebuilt_from_scratch(analytics):
+    fresh = AttendanceAnalytics(path=analytics.path)
+    return fresh.daily().sort_values(["nurse_id", "date"]).reset_index(drop=True), fresh
+
+
+def test_check_ins_only_rebuild_the_open_week(analytics):
+    attendance = {"N1": {"2025-10-13": shift("15:10:00", "23:00:00"), "2025-10-19": shift("23:00:00", None)},
+                  "N2": {"2025-10-14": shift("07:00:00")}}
+    write(analytics, attendance)
+    analytics.daily()
+    closed_rows = analytics._closed[2]
+    assert list(closed_rows["nurse_id"]) == ["N1", "N2"]
+
+    # Sunday night's check-out on Monday and a Monday check-in
+    attendance["N1"]["2025-10-19"]["checkout"] = "07:00:00"
+    attendance["N2"]["2025-10-20"] = shift("07:30:00")
+    write(analytics, attendance)
+    daily = analytics.daily()
+    assert analytics._closed[2] is closed_rows
+    expected, fresh = rebuilt_from_scratch(analytics)
+    pd.testing.assert_frame_equal(daily.sort_values(["nurse_id", "date"]).reset_index(drop=True), expected)
+    assert analytics._fingerprints == fresh._fingerprints
+    sunday = daily[daily["date"] == pd.Timestamp("2025-10-19")].iloc[0]
+    assert sunday["hours"] == 8 and sunday["week"] == pd.Timestamp("2025-10-13")
+    # The rostered Evening shift made 15:10 ten minutes late, not the nearest-start guess
+    monday = daily[daily["date"] == pd.Timestamp("2025-10-13")].iloc[0]
+    assert monday["shift_source"] == "roster" and monday["late_minutes"] == 10
+
+
+def test_edits_to_closed_weeks_are_picked_up(analytics):
+    attendance = {"N1": {"2025-10-06": shift("07:00:00"), "2025-10-20": shift("07:00:00")}}
+    write(analytics, attendance)
+    analytics.daily()
+    closed_rows = analytics._closed[2]
+    attendance["N1"]["2025-10-06"] = shift("07:30:00")
+    write(analytics, attendance)
+    daily = analytics.daily()
+    assert analytics._closed[2] is not closed_rows
+    assert daily.loc[daily["date"] == pd.Timestamp("2025-10-06"), "late_minutes"].item() == 30
+    report = analytics.report(group="week", nurse_id="N1")
+    assert [(r["period"], r["late_checkins"]) for r in report["rows"]] == [("2025-10-20", 0), ("2025-10-06", 1)]
+
+
+def test_weekly_report_matches_a_fresh_build(analytics):
+    attendance = {f"N{n}": {f"2025-10-{d:02d}": shift("07:0%d:00" % (d % 10)) for d in range(1, 24)} for n in range(3)}
+    write(analytics, attendance)
+    analytics.report(group="week")
+    attendance["N0"]["2025-10-21"] = shift("08:00:00")
+    write(analytics, attendance)
+    _, fresh = rebuilt_from_scratch(analytics)
+    for group in ("day", "week", "month"):
+        assert analytics.report(group=group, per_page=500) == fresh.report(group=group, per_page=500)
@@ -0,0 +1,118 @@
+import json
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import availability as availability_module
+import scheduling_ai
+import swap_matcher as swap_matcher_module
+from availability import EPOCH, Availability, AvailabilityIndex
+from mc_store import MCStore
+from swap_matcher import SwapMatcher
+
+SHIFTS = ["Morning", "Evening", "Night"]
+WEEK = ["2025-10-20", "2025-10-21", "2025-10-22", "2025-10-23", "2025-10-24", "2025-10-25", "2025-10-26"]
+
+
+def test_slot_bits_count_shifts_from_the_epoch():
+    index = AvailabilityIndex(SHIFTS)
+    assert index.slot(EPOCH.isoformat(), "Morning") == 0
+    assert index.slot("2024-01-02", "Night") == 5
+    # 2024 is a leap year: 2025-01-01 is day 366
+    assert index.slot("2025-01-01", "Evening") == 366 * 3 + 1
+    with pytest.raises(ValueError, match="not tracked"):
+        index.slot("2023-12-31", "Night")
+    with pytest.raises(ValueError, match="shift must be one of"):
+        index.slot("2024-01-01", "Noon")
+
+
+def test_masks_and_decoding_round_trip_across_month_and_year_ends():
+    index = AvailabilityIndex(SHIFTS)
+    mask = index.mask("2024-12-31", 2)
+    assert mask == 0b111111 << index.slot("2024-12-31", "Morning")
+    assert index.slots(mask) == [(day, s) for day in ("2024-12-31", "2025-01-01") for s in SHIFTS]
+    bits = (1 << index.slot("2024-02-29", "Night")) | (1 << index.slot("2024-03-01", "Morning"))
+    assert index.slots(bits) == [("2024-02-29", "Night"), ("2024-03-01", "Morning")]
+
+
+def test_free_checks_both_layers():
+    index = AvailabilityIndex(SHIFTS)
+    assert index.replace_layer("rostered", {"N1": 1 << index.slot("2025-10-20", "Morning")}) == {"N1"}
+    index.replace_layer("absent", {"N2": index.mask("2025-10-21")})
+    assert not index.is_free("N1", "2025-10-20", "Morning") and index.is_free("N1", "2025-10-20", "Evening")
+    assert index.free(["N1", "N2", "N3"], index.mask("2025-10-21")) == ["N1", "N3"]
+    assert index.free(["N1", "N2", "N3"], index.mask("2025-10-20", 7)) == ["N3"]
+    generation = index.generation
+    assert index.replace_layer("absent", {"N2": index.mask("2025-10-21")}) == set()
+    assert index.generation == generation
+
+
+@pytest.fixture
+def mcs(tmp_path, monkeypatch):
+    store = MCStore(str(tmp_path / "mc_requests.json"))
+    monkeypatch.setattr(availability_module, "mc_store", store)
+    return store
+
+
+@pytest.fixture
+def avail(tmp_path, monkeypatch, mcs):
+    roster = pd.DataFrame({"Nurse_ID": ["N1", "N2"],
+                           "Monday 2025-10-20 Morning": ["On Duty - ICU", "Off"],
+                           "Monday 2025-10-20 Night": ["Off", "On Duty - ED"]})
+    monkeypatch.setattr(swap_matcher_module, "load_roster", lambda: roster)
+    monkeypatch.setattr(availability_module, "swap_matcher", SwapMatcher())
+    tracker = Availability(swap_path=str(tmp_path / "shift_swaps.json"))
+    monkeypatch.setattr(availability_module, "availability", tracker)
+    return tracker
+
+
+def approve(store, mc_id, nurse_id, start, end):
+    store.submit({"id": mc_id, "nurse_id": nurse_id, "start_date": start, "end_date": end,
+                  "status": "pending", "submitted_at": mc_id})
+    store.decide([mc_id], "approved", "N1001")
+
+
+def test_matched_swaps_move_rostered_bits(avail):
+    assert avail.duty("2025-10-20", 1) == {"N1": [("2025-10-20", "Morning")], "N2": [("2025-10-20", "Night")]}
+    with open(avail.swap_path, "w") as f:
+        json.dump([{"id": "S1", "nurse_id": "N1", "status": "matched",
+                    "current_slot": "Monday 2025-10-20 Morning", "desired_slot": "Monday 2025-10-20 Night"}], f)
+    assert avail.duty("2025-10-20", 1)["N1"] == [("2025-10-20", "Night")]
+
+
+def test_blocked_slots_are_offsets_into_the_new_roster(avail, mcs):
+    approve(mcs, "MC1", "N1", "2025-10-19", "2025-10-21")   # starts before the roster week
+    approve(mcs, "MC2", "N2", "2025-10-26", "2025-10-30")   # ends after it
+    blocked = avail.blocked_slots(["N1", "N2", "N3"], date(2025, 10, 20), 7, ["Morning", "Night"])
+    assert blocked == {"N1": {(d, s) for d in (0, 1) for s in (0, 1)}, "N2": {(6, 0), (6, 1)}}
+
+
+def test_malformed_mc_window_is_skipped(avail, mcs, capsys):
+    approve(mcs, "MC1", "N1", "2025-10-20", "2025-10-20")
+    # Approved before submit validated dates
+    with open(mcs.path) as f:
+        data = json.load(f)
+    data["N2"] = [{"id": "MC2", "nurse_id": "N2", "start_date": "22/09/2025", "end_date": "2025-10-21",
+                   "status": "approved", "submitted_at": "MC2"}]
+    with open(mcs.path, "w") as f:
+        json.dump(data, f)
+    blocked = avail.blocked_slots(["N1", "N2"], date(2025, 10, 20), 7, SHIFTS)
+    assert blocked == {"N1": {(0, 0), (0, 1), (0, 2)}}
+    assert "Skipping MC MC2" in capsys.readouterr().out
+
+
+def test_solver_leaves_blocked_slots_empty(avail, mcs):
+    nurses = [{"id": f"N{ward}{i}", "skills": [ward], "max_shifts_per_week": 7}
+              for ward in ("ED", "GW", "ICU") for i in range(8)]
+    approve(mcs, "MC1", "NICU0", "2025-10-20", "2025-10-22")
+    approve(mcs, "MC2", "NED3", "2025-10-26", "2025-10-26")
+    demand = pd.DataFrame({"ED": [2] * 7, "GW": [2] * 7, "ICU": [2] * 7})
+    schedule, _, _ = scheduling_ai.schedule_nurses_optimized(demand, nurses, ["ED", "GW", "ICU"], SHIFTS,
+                                                             start_date=date(2025, 10, 20), record=False)
+    assert schedule is not None
+    row = schedule.set_index("Nurse_ID")
+    for nurse_id, days in (("NICU0", WEEK[:3]), ("NED3", WEEK[6:])):
+        for day in days:
+            columns = [c for c in row.columns if day in c]
+            assert len(columns) == 3 and all(row.loc[nurse_id, c] == "Off" for c in columns)
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import backup_catalog
+import s3_operations
+from backup_catalog import BackupCatalog, prune_backups
+from file_lock import locked
+from local_s3 import LocalS3Client
+from s3_operations import (BUCKET_NAME, MANIFEST_NAME, download_verified, iter_objects, object_key, verify_file)
+
+
+@pytest.fixture
+def s3(tmp_path):
+    client = LocalS3Client(str(tmp_path / "s3"))
+    client.create_bucket(Bucket=BUCKET_NAME)
+    return client
+
+
+def put_snapshot(s3, backup_id, files):
+    """Store content-addressed objects and a manifest; returns the manifest."""
+    entries = {}
+    for path, data in files.items():
+        sha = hashlib.sha256(data).hexdigest()
+        s3.put_object(Bucket=BUCKET_NAME, Key=object_key(sha), Body=data)
+        entries[path] = {"sha256": sha, "size": len(data), "key": object_key(sha)}
+    manifest = {"backup_id": backup_id, "files": entries}
+    s3.put_object(Bucket=BUCKET_NAME, Key=f"{backup_id}/{MANIFEST_NAME}", Body=json.dumps(manifest).encode())
+    return manifest
+
+
+def keys(s3, prefix=""):
+    return {obj["Key"] for obj in iter_objects(s3, prefix=prefix)}
+
+
+# ---------------- verify ----------------
+def test_verify_file_checks_size_and_hashes(tmp_path):
+    path = tmp_path / "f.json"
+    path.write_bytes(b"hello")
+    sha = hashlib.sha256(b"hello").hexdigest()
+    assert verify_file(str(path), {"size": 5, "sha256": sha})
+    assert not verify_file(str(path), {"size": 4, "sha256": sha})
+    assert not verify_file(str(path), {"size": 5, "sha256": "0" * 64})
+    assert verify_file(str(path), {"size": 5, "md5": hashlib.md5(b"hello").hexdigest()})
+    assert not verify_file(str(path), {"size": 5, "md5": "0" * 32})
+
+
+def test_download_verified_rejects_corrupt_objects(s3, tmp_path):
+    manifest = put_snapshot(s3, "backup_20250101_000000", {"data/a.json": b"{}"})
+    s3.put_object(Bucket=BUCKET_NAME, Key=manifest["files"]["data/a.json"]["key"], Body=b"[]")
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        download_verified(s3, manifest, str(tmp_path))
+
+
+def test_download_verified_refuses_paths_outside_the_app(s3, tmp_path):
+    manifest = put_snapshot(s3, "backup_20250101_000000", {"../evil.txt": b"x"})
+    with pytest.raises(ValueError, match="unsafe path"):
+        download_verified(s3, manifest, str(tmp_path))
+
+
+@pytest.mark.parametrize("mode", ["files", "bundle"])
+def test_backup_objects_match_their_hashes_and_restore(s3, tmp_path, monkeypatch, mode):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(s3_operations, "get_s3_client", lambda: s3)
+    monkeypatch.setattr(s3_operations, "BACKUP_MODE", mode)
+    os.makedirs("csv")
+    with open("csv/hospital_config.json", "w") as f:
+        f.write('{"shifts": {}}')
+    with open("current_week.txt", "w") as f:
+        f.write("2025-10-20")
+
+    ok, backup_id = s3_operations.backup_to_s3()
+    assert ok, backup_id
+    for key in keys(s3, "objects/"):
+        body = s3.get_object(Bucket=BUCKET_NAME, Key=key)["Body"].read()
+        assert key == object_key(hashlib.sha256(body).hexdigest())
+    assert s3_operations.backup_to_s3()[1].endswith("(no changes)")
+
+    with open("current_week.txt", "w") as f:
+        f.write("changed")
+    ok, message = s3_operations.restore_from_s3(backup_id)
+    assert ok, message
+    with open("current_week.txt") as f:
+        assert f.read() == "2025-10-20"
+
+
+def test_restore_waits_for_an_in_flight_save(s3, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(s3_operations, "get_s3_client", lambda: s3)
+    os.makedirs("data")
+    with open("data/attendance.json", "w") as f:
+        f.write('["backed up"]')
+    ok, backup_id = s3_operations.backup_to_s3()
+    assert ok, backup_id
+
+    results = []
+    with locked("data/attendance.json"):
+        # A request that loaded the file before the restore started
+        restore = threading.Thread(target=lambda: results.append(s3_operations.restore_from_s3(backup_id)))
+        restore.start()
+        time.sleep(0.2)
+        assert restore.is_alive()
+        with open("data/attendance.json", "w") as f:
+            f.write('["saved by request"]')
+    restore.join(5)
+    assert results and results[0][0], results
+    with open("data/attendance.json") as f:
+        assert f.read() == '["backed up"]'
+
+
+# ---------------- prune ----------------
+def test_prune_keeps_objects_of_kept_snapshots(s3):
+    put_snapshot(s3, "backup_20240101_000000", {"a": b"old", "b": b"shared"})
+    put_snapshot(s3, "backup_20250101_000000", {"a": b"new", "b": b"shared"})
+    result = prune_backups(s3, retention={"daily": 1}, grace_seconds=0)
+    assert result["expired_snapshots"] == ["backup_20240101_000000"]
+    assert keys(s3, "objects/") == {object_key(hashlib.sha256(d).hexdigest()) for d in (b"new", b"shared")}
+    assert keys(s3, "backup_20240101_000000/") == set()
+
+
+def test_prune_dry_run_deletes_nothing(s3):
+    put_snapshot(s3, "backup_20240101_000000", {"a": b"old"})
+    put_snapshot(s3, "backup_20250101_000000", {"a": b"new"})
+    before = keys(s3)
+    result = prune_backups(s3, retention={"daily": 1}, dry_run=True, grace_seconds=0)
+    assert result["objects_to_delete"] == 2 and result["objects_deleted"] == 0
+    assert keys(s3) == before
+
+
+def test_prune_protects_snapshots_missing_from_a_stale_catalog(s3):
+    put_snapshot(s3, "backup_20250101_000000", {"a": b"one"})
+    BackupCatalog.rebuild(s3).save(s3)
+    # Recorded in the bucket but never in the catalog (record_snapshot failed)
+    put_snapshot(s3, "backup_20250102_000000", {"a": b"two"})
+    prune_backups(s3, retention={"daily": 7}, grace_seconds=0)
+    assert object_key(hashlib.sha256(b"two").hexdigest()) in keys(s3, "objects/")
+    assert "backup_20250102_000000" in BackupCatalog.load(s3)._ids
+
+
+def test_prune_aborts_when_a_manifest_is_unreadable(s3):
+    put_snapshot(s3, "backup_20240101_000000", {"a": b"old"})
+    put_snapshot(s3, "backup_20250101_000000", {"a": b"new"})
+    s3.put_object(Bucket=BUCKET_NAME, Key=f"backup_20250101_000000/{MANIFEST_NAME}", Body=b"{not json")
+    before = keys(s3)
+    with pytest.raises(RuntimeError, match="backup_20250101_000000"):
+        prune_backups(s3, retention={"daily": 1}, grace_seconds=0)
+    assert keys(s3) == before
+
+
+def test_prune_leaves_young_unreferenced_objects(s3):
+    put_snapshot(s3, "backup_20250101_000000", {"a": b"kept"})
+    s3.put_object(Bucket=BUCKET_NAME, Key=object_key("f" * 64), Body=b"in flight")
+    prune_backups(s3, grace_seconds=backup_catalog.GC_GRACE_SECONDS)
+    assert object_key("f" * 64) in keys(s3, "objects/")
@@ -0,0 +1,99 @@
+import json
+
+import pandas as pd
+import pytest
+
+import change_log as change_log_module
+from change_log import KIND_EMERGENCY, KIND_MC, KIND_SCHEDULE, ChangeLog
+
+
+@pytest.fixture
+def log(tmp_path):
+    return ChangeLog(path=str(tmp_path / "change_log.jsonl"), cells_path=str(tmp_path / "roster_cells.json"),
+                     max_changes=5)
+
+
+def mc(mc_id, status="pending"):
+    return {"id": mc_id, "status": status}
+
+
+def test_cursor_returns_only_newer_changes(log):
+    first = log.record([(KIND_MC, "N1", "ICU", mc("MC1"))])
+    log.record([(KIND_MC, "N1", "ICU", mc("MC2"))])
+    result = log.changes_since(first, nurse_id="N1")
+    assert not result["resync"]
+    assert [r["id"] for r in result["mc"]] == ["MC2"]
+    assert result["cursor"] == log.head == 2
+    assert log.changes_since(result["cursor"], nurse_id="N1")["mc"] == []
+
+
+def test_changes_coalesce_to_latest_state(log):
+    log.record([(KIND_MC, "N1", "ICU", mc("MC1"))])
+    log.record([(KIND_MC, "N1", "ICU", mc("MC1", "approved"))])
+    assert log.changes_since(0, nurse_id="N1")["mc"] == [mc("MC1", "approved")]
+
+
+def test_visibility_by_nurse_ward_and_admin(log):
+    log.record([(KIND_MC, "N1", "ICU", mc("MC1")),
+                (KIND_SCHEDULE, "N2", "ED", {"Monday 2025-10-20 Morning": "Off"}),
+                (KIND_EMERGENCY, "N3", "ED", {"id": "E1"})])
+    nurse = log.changes_since(0, nurse_id="N2", ward="ED")
+    assert nurse["mc"] == [] and nurse["schedule"] == {"Monday 2025-10-20 Morning": "Off"}
+    assert [e["id"] for e in nurse["emergencies"]] == ["E1"]
+    assert log.changes_since(0, nurse_id="N9", ward="GW")["emergencies"] == []
+    admin = log.changes_since(0, nurse_id="N9", is_admin=True)
+    assert [r["id"] for r in admin["mc"]] == ["MC1"] and admin["schedule"] == {}
+
+
+def test_missing_or_future_cursor_asks_for_resync(log):
+    log.record([(KIND_MC, "N1", None, mc("MC1"))])
+    assert log.changes_since(None)["resync"]
+    assert log.changes_since(99)["resync"]
+    assert log.changes_since(99)["cursor"] == 1
+
+
+def test_cursor_older_than_the_compacted_log_resyncs(log):
+    for i in range(11):   # more than 2 * max_changes triggers compaction down to 5
+        log.record([(KIND_MC, "N1", None, mc(f"MC{i}"))])
+    assert log.head == 11
+    stale = log.changes_since(2, nurse_id="N1")
+    assert stale["resync"] and stale["cursor"] == 11
+    fresh = log.changes_since(6, nurse_id="N1")
+    assert not fresh["resync"] and [r["id"] for r in fresh["mc"]] == [f"MC{i}" for i in range(6, 11)]
+
+
+def test_paging_sets_more_until_caught_up(log):
+    log.record([(KIND_MC, "N1", None, mc(f"MC{i}")) for i in range(4)])
+    page = log.changes_since(0, nurse_id="N1", limit=3)
+    assert page["more"] and page["cursor"] == 3
+    rest = log.changes_since(page["cursor"], nurse_id="N1", limit=3)
+    assert not rest["more"] and [r["id"] for r in rest["mc"]] == ["MC3"]
+
+
+def test_other_instances_see_appends_and_compactions(log):
+    other = ChangeLog(path=log.path, cells_path=log.cells_path, max_changes=5)
+    log.record([(KIND_MC, "N1", None, mc("MC0"))])
+    assert other.head == 1
+    for i in range(1, 12):
+        log.record([(KIND_MC, "N1", None, mc(f"MC{i}"))])
+    assert other.head == 12
+    assert other.record([(KIND_MC, "N1", None, mc("MC12"))]) == 13
+    with open(log.path) as f:
+        seqs = [json.loads(line)["seq"] for line in f]
+    assert seqs == list(range(seqs[0], 14))
+
+
+def test_record_roster_logs_only_changed_cells(log, monkeypatch):
+    roster = pd.DataFrame({"Nurse_ID": ["N1", "N2"],
+                           "Monday 2025-10-20 Morning": ["On Duty - ICU", "Off"],
+                           "Monday 2025-10-20 Night": ["Off", "On Duty - ED"]})
+    monkeypatch.setattr(change_log_module, "load_roster", lambda: roster)
+    assert log.record_roster() == 2
+
+    changed = roster.copy()
+    changed.loc[1, "Monday 2025-10-20 Night"] = "Off"
+    monkeypatch.setattr(change_log_module, "load_roster", lambda: changed)
+    head = log.record_roster()
+    assert head == 3
+    assert log.changes_since(2, nurse_id="N2")["schedule"] == {"Monday 2025-10-20 Night": "Off"}
+    assert log.record_roster() == 3   # unchanged roster, nothing new
@@ -0,0 +1,95 @@
+import json
+import runpy
+
+import pytest
+
+import event_bus
+from event_bus import EventBus, parse_cursor, stream
+
+
+def frames(generator, count):
+    return [next(generator) for _ in range(count)]
+
+
+def event_ids(chunks):
+    return [int(c.split("\n")[0][4:]) for c in chunks if c.startswith("id: ")]
+
+
+def test_replay_from_cursor_filters_by_ward_and_type():
+    bus = EventBus()
+    bus.publish("emergency_call", {"n": 1}, ward="ICU")
+    bus.publish("emergency_call", {"n": 2}, ward="ED")
+    bus.publish("schedule_published", {"n": 3})
+    events, in_range, head = bus.events_since(0, ward="ICU")
+    assert [e["id"] for e in events] == [1, 3] and in_range and head == 3
+    events, _, _ = bus.events_since(1, types={"emergency_call"})
+    assert [e["id"] for e in events] == [2]
+
+
+def test_stream_replays_buffered_events_after_last_event_id():
+    bus = EventBus()
+    for n in range(3):
+        bus.publish("emergency_call", {"n": n}, ward="ICU")
+    retry, *replayed = frames(stream(bus, 1, ward="ICU"), 3)
+    assert retry.startswith("retry: ")
+    assert event_ids(replayed) == [2, 3]
+    assert json.loads(replayed[0].split("data: ")[1])["n"] == 1
+
+
+def test_cursor_outside_the_buffer_asks_for_resync():
+    bus = EventBus(buffer_size=2)
+    for n in range(5):
+        bus.publish("emergency_call", {"n": n})
+    _, resync, *replayed = frames(stream(bus, 1), 4)
+    assert resync.startswith("event: resync") and json.loads(resync.split("data: ")[1]) == {"last_id": 5}
+    assert event_ids(replayed) == [4, 5]
+    # A cursor ahead of the bus (worker restarted) also resyncs
+    assert not bus.events_since(99)[1]
+
+
+def test_new_subscriber_starts_at_the_head_and_sees_later_events():
+    bus = EventBus()
+    bus.publish("emergency_call", {"n": 0})
+    generator = stream(bus, None)
+    assert next(generator).startswith("retry: ")
+    bus.publish("emergency_call", {"n": 1})
+    assert event_ids([next(generator)]) == [2]
+
+
+def test_parse_cursor():
+    assert parse_cursor("7") == 7
+    assert parse_cursor("") is None and parse_cursor(None) is None and parse_cursor("abc") is None
+
+
+def test_stream_slots_are_capped():
+    bus = EventBus(max_streams=2)
+    assert bus.open_stream() and bus.open_stream() and not bus.open_stream()
+    bus.close_stream()
+    assert bus.open_streams == 1 and bus.open_stream()
+
+
+def test_events_route_refuses_streams_beyond_the_cap(monkeypatch):
+    from app import app, bus as app_bus
+
+    monkeypatch.setattr(app_bus, "max_streams", 1)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["nurse_id"] = "N1001"
+        session["is_admin"] = True
+    first = client.get("/api/events", buffered=False)
+    assert first.status_code == 200 and app_bus.open_streams == 1
+    refused = client.get("/api/events", buffered=False)
+    assert refused.status_code == 503 and refused.headers["Retry-After"] == "3"
+    assert refused.get_data(as_text=True).startswith("retry: ")
+    first.close()
+    assert app_bus.open_streams == 0
+    again = client.get("/api/events", buffered=False)
+    assert again.status_code == 200
+    again.close()
+
+
+@pytest.mark.parametrize("enabled, expected", [(True, 1), (False, 4)])
+def test_gunicorn_runs_one_worker_while_sse_is_enabled(monkeypatch, enabled, expected):
+    monkeypatch.setattr(event_bus, "SSE_ENABLED", enabled)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert runpy.run_path("gunicorn.conf.py")["workers"] == expected
@@ -0,0 +1,67 @@
+import gzip
+
+import pytest
+from flask import Flask
+
+import http_cache
+from http_cache import accepted_codings, cached_json, etag_for, negotiate
+
+
+@pytest.fixture
+def client(monkeypatch):
+    http_cache.bodies.clear()
+    state = {"version": 1, "builds": 0}
+
+    def build():
+        state["builds"] += 1
+        return {"rows": list(range(500)), "version": state["version"]}
+
+    app = Flask(__name__)
+
+    @app.route("/data")
+    def data():
+        return cached_json(("data",), (state["version"],), build)
+
+    test_client = app.test_client()
+    test_client.state = state
+    return test_client
+
+
+def test_matching_if_none_match_gets_304_without_building(client):
+    first = client.get("/data")
+    assert first.status_code == 200 and client.state["builds"] == 1
+    etag = first.headers["ETag"]
+    again = client.get("/data", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b"" and again.headers["ETag"] == etag
+    assert client.get("/data", headers={"If-None-Match": "W/" + etag}).status_code == 304
+    assert client.state["builds"] == 1
+
+
+def test_new_version_changes_the_etag_and_rebuilds(client):
+    etag = client.get("/data").headers["ETag"]
+    client.state["version"] = 2
+    response = client.get("/data", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert response.get_json()["version"] == 2 and client.state["builds"] == 2
+
+
+def test_body_is_reused_and_gzipped_on_request(client):
+    plain = client.get("/data")
+    zipped = client.get("/data", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.data) == plain.data
+    assert client.state["builds"] == 1
+
+
+def test_etag_depends_on_key_and_versions():
+    assert etag_for("a", (1,)) == etag_for("a", (1,))
+    assert etag_for("a", (1,)) != etag_for("a", (2,)) != etag_for("b", (2,))
+
+
+def test_content_negotiation(monkeypatch):
+    monkeypatch.setattr(http_cache, "brotli", None)
+    assert accepted_codings("gzip;q=0.5, br") == {"gzip": 0.5, "br": 1.0}
+    assert negotiate("gzip, br") == "gzip"
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("*") == "gzip"
+    assert negotiate(None) is None
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from mc_store import MCStore, parse_date_range
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MCStore(str(tmp_path / "data" / "mc_requests.json"))
+
+
+def mc(mc_id, nurse_id="N1", start="2025-10-20", end="2025-10-21", submitted="2025-10-01T08:00:00"):
+    return {"id": mc_id, "nurse_id": nurse_id, "start_date": start, "end_date": end,
+            "status": "pending", "submitted_at": submitted}
+
+
+def ids(rows):
+    return [r["id"] for r in rows]
+
+
+def test_pages_are_newest_first_per_status(store):
+    for i in range(5):
+        store.submit(mc(f"MC{i}", submitted=f"2025-10-0{i + 1}T08:00:00"))
+    rows, total = store.page("pending", page=1, per_page=2)
+    assert ids(rows) == ["MC4", "MC3"] and total == 5
+    assert ids(store.page("pending", page=3, per_page=2)[0]) == ["MC0"]
+    store.decide(["MC3"], "approved", "N1001")
+    assert ids(store.page("pending", per_page=10)[0]) == ["MC4", "MC2", "MC1", "MC0"]
+    assert ids(store.page(None, per_page=10)[0]) == ["MC4", "MC3", "MC2", "MC1", "MC0"]
+    assert store.counts() == {"pending": 4, "approved": 1, "rejected": 0}
+
+
+def test_date_filter_matches_overlapping_requests(store):
+    store.submit(mc("MC1", start="2025-10-01", end="2025-10-03"))
+    store.submit(mc("MC2", start="2025-10-10", end="2025-10-10", submitted="2025-10-02T08:00:00"))
+    rows, total = store.page(start="2025-10-03", end="2025-10-09")
+    assert ids(rows) == ["MC1"] and total == 1
+
+
+def test_batch_decision_reports_each_failure(store):
+    store.submit(mc("MC1"))
+    store.submit(mc("MC2", nurse_id="N2", start="2025-10-22", end="2025-10-24"))
+    store.decide(["MC2"], "rejected", "N1001")
+    updated, errors, windows = store.decide(["MC1", "MC2", "MC9", "MC1"], "approved", "N1001", note="ok")
+    assert ids(updated) == ["MC1"] and updated[0]["decision_note"] == "ok"
+    assert errors == {"MC2": "already rejected", "MC9": "not found"}
+    assert windows == [{"nurse_id": "N1", "start_date": "2025-10-20", "end_date": "2025-10-21",
+                        "source": "mc", "mc_id": "MC1"}]
+    with pytest.raises(ValueError):
+        store.decide("MC1", "approved", "N1001")
+    with pytest.raises(ValueError):
+        store.decide(["MC1"], "maybe", "N1001")
+
+
+def test_unavailability_uses_approved_windows_only(store):
+    store.submit(mc("MC1", start="2025-10-01", end="2025-10-20"))
+    store.submit(mc("MC2", start="2025-10-25", end="2025-10-25"))
+    store.submit(mc("MC3", start="2025-10-19", end="2025-10-19"))
+    store.decide(["MC1", "MC2"], "approved", "N1001")
+    assert [w["mc_id"] for w in store.unavailability("2025-10-18", "2025-10-24")] == ["MC1"]
+    assert [w["mc_id"] for w in store.unavailability()] == ["MC1", "MC2"]
+
+
+@pytest.mark.parametrize("start, end", [(None, "2025-10-20"), ("2025-10-20", ""), ("22/09/2025", "2025-10-20"),
+                                        ("2025-10-21", "2025-10-20"), (20251020, "2025-10-20")])
+def test_submit_rejects_bad_dates(store, start, end):
+    with pytest.raises(ValueError):
+        store.submit(mc("MC1", start=start, end=end))
+    assert store.counts()["pending"] == 0
+
+
+def test_submit_normalizes_dates(store):
+    record = store.submit(mc("MC1", start="20251020", end="20251021"))
+    assert (record["start_date"], record["end_date"]) == ("2025-10-20", "2025-10-21")
+
+
+def test_decide_refuses_to_approve_unparseable_dates(store):
+    store.submit(mc("MC1"))
+    # A record written before submit validated its dates
+    with open(store.path) as f:
+        data = json.load(f)
+    data["N1"].append(dict(mc("MC2"), start_date="22/09/2025"))
+    with open(store.path, "w") as f:
+        json.dump(data, f)
+    updated, errors, _ = store.decide(["MC1", "MC2"], "approved", "N1001")
+    assert ids(updated) == ["MC1"] and errors == {"MC2": "invalid start_date/end_date"}
+    assert ids(store.decide(["MC2"], "rejected", "N1001")[0]) == ["MC2"]
+
+
+def test_writes_from_two_instances_are_not_lost(store):
+    other = MCStore(store.path)
+    store.counts()
+    other.counts()
+    store.submit(mc("MC1"))
+    other.submit(mc("MC2", nurse_id="N2"))
+    store.decide(["MC2"], "approved", "N1001")
+    assert other.get("MC2")["status"] == "approved"
+    with open(store.path) as f:
+        assert sorted(r["id"] for records in json.load(f).values() for r in records) == ["MC1", "MC2"]
+
+
+def test_parse_date_range():
+    assert parse_date_range("2025-10-01", None) == ("2025-10-01", None)
+    with pytest.raises(ValueError, match="end must not be before start"):
+        parse_date_range("2025-10-02", "2025-10-01")
+    with pytest.raises(ValueError, match="start must be a date"):
+        parse_date_range("bad", None)
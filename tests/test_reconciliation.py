@@ -0,0 +1,113 @@
+import pandas as pd
+import pytest
+
+from reconciliation import Reconciler, attendance_intervals, classify, expand_roster, match_shifts
+
+WINDOWS = {"Morning": (420, 480), "Evening": (900, 480), "Night": (1380, 480)}
+
+
+def roster(rows):
+    """rows: {nurse_id: {"Monday 2025-10-20 Morning": "On Duty - ICU", ...}}"""
+    frame = pd.DataFrame.from_dict(rows, orient="index").fillna("Off")
+    return frame.rename_axis("Nurse_ID").reset_index()
+
+
+def record(checkin, checkout=None, checkout_date=None):
+    out = {"checkin": checkin}
+    if checkout:
+        out["checkout"] = checkout
+    if checkout_date:
+        out["checkout_date"] = checkout_date
+    return out
+
+
+def reconcile(rows, attendance, now):
+    shifts = expand_roster(roster(rows), WINDOWS)
+    events = attendance_intervals(attendance)
+    result = classify(match_shifts(shifts, events), events, pd.Timestamp(now))
+    return result.set_index(["nurse_id", "start"], drop=False)
+
+
+def at(result, nurse_id, start):
+    return result.loc[(nurse_id, pd.Timestamp(start))]
+
+
+def test_night_shifts_cross_midnight():
+    shifts = expand_roster(roster({"N1": {"Monday 2025-10-20 Night": "On Duty - ED"}}), WINDOWS)
+    assert shifts.iloc[0][["ward", "start", "end"]].tolist() == [
+        "ED", pd.Timestamp("2025-10-20 23:00"), pd.Timestamp("2025-10-21 07:00")]
+
+
+def test_attendance_intervals_infer_overnight_check_outs():
+    events = attendance_intervals({"N1": {"2025-10-20": record("23:00:00", "07:00:00"),
+                                          "2025-10-22": record("07:00:00", "15:00:00", "2025-10-22"),
+                                          "2025-10-23": record("07:00:00")}})
+    assert events["checkout"].tolist()[:2] == [pd.Timestamp("2025-10-21 07:00"), pd.Timestamp("2025-10-22 15:00")]
+    assert pd.isna(events["checkout"].iloc[2])
+
+
+def test_interval_join_lateness_and_statuses():
+    rows = {
+        "early": {"Monday 2025-10-20 Morning": "On Duty - ICU"},
+        "late": {"Monday 2025-10-20 Morning": "On Duty - ICU"},
+        "short": {"Monday 2025-10-20 Morning": "On Duty - ICU"},
+        "night": {"Monday 2025-10-20 Night": "On Duty - ED"},
+        "absent": {"Monday 2025-10-20 Morning": "On Duty - GW"},
+        "forgot": {"Monday 2025-10-20 Morning": "On Duty - GW"},
+        "working": {"Monday 2025-10-20 Evening": "On Duty - GW"},
+        "waiting": {"Monday 2025-10-20 Evening": "On Duty - GW", "Tuesday 2025-10-21 Morning": "On Duty - GW"},
+    }
+    attendance = {
+        "early": {"2025-10-20": record("06:50:00", "15:00:00")},
+        "late": {"2025-10-20": record("07:40:00", "15:00:00")},          # joined forward: check-in after the start
+        "short": {"2025-10-20": record("07:00:00", "10:00:00")},
+        "night": {"2025-10-20": record("23:12:00")},
+        "forgot": {"2025-10-20": record("07:00:00")},
+        "working": {"2025-10-20": record("15:00:00"), "2025-10-19": record("07:00:00", "15:00:00")},
+    }
+    result = reconcile(rows, attendance, "2025-10-21 06:00")
+    expected = {
+        ("early", "2025-10-20 07:00"): ("completed", 0),
+        ("late", "2025-10-20 07:00"): ("completed", 40),
+        ("short", "2025-10-20 07:00"): ("partial", 0),
+        ("night", "2025-10-20 23:00"): ("in_progress", 12),
+        ("absent", "2025-10-20 07:00"): ("no_show", 0),
+        ("forgot", "2025-10-20 07:00"): ("missing_checkout", 0),
+        ("working", "2025-10-20 15:00"): ("missing_checkout", 0),
+        ("waiting", "2025-10-20 15:00"): ("no_show", 0),
+        ("waiting", "2025-10-21 07:00"): ("upcoming", 0),
+    }
+    assert {key: (at(result, *key)["status"], at(result, *key)["late_minutes"]) for key in expected} == expected
+    assert at(result, "late", "2025-10-20 07:00")["worked_hours"] == pytest.approx(7 + 20 / 60)
+    assert at(result, "short", "2025-10-20 07:00")["coverage"] == pytest.approx(3 / 8)
+    # Sunday's shift was never rostered
+    unscheduled = result[result["status"] == "unscheduled"]
+    assert unscheduled["nurse_id"].tolist() == ["working"] and unscheduled["worked_hours"].tolist() == [8]
+
+
+def test_shift_that_started_without_a_check_in():
+    result = reconcile({"N1": {"Monday 2025-10-20 Morning": "On Duty - ICU"}}, {}, "2025-10-20 09:00")
+    assert at(result, "N1", "2025-10-20 07:00")["status"] == "not_checked_in"
+
+
+def test_incremental_updates_match_a_full_rebuild():
+    rows = {f"N{i}": {"Monday 2025-10-20 Morning": "On Duty - ICU", "Tuesday 2025-10-21 Night": "On Duty - ICU"}
+            for i in range(4)}
+    shifts = expand_roster(roster(rows), WINDOWS)
+    attendance = {f"N{i}": {"2025-10-20": record(f"07:0{i}:00", "15:00:00")} for i in range(4)}
+    reconciler = Reconciler()
+    assert reconciler.update(shifts, attendance) == 4
+    # One check-in: only that nurse is re-joined
+    attendance = dict(attendance, N2=dict(attendance["N2"], **{"2025-10-21": record("23:30:00")}))
+    assert reconciler.update(attendance=attendance) == 1
+    assert reconciler.update(attendance=attendance) == 0
+
+    fresh = Reconciler()
+    fresh.update(shifts, attendance)
+    now = pd.Timestamp("2025-10-22 01:00")
+    key = ["nurse_id", "start"]
+    incremental = reconciler.results(now).sort_values(key).reset_index(drop=True)
+    rebuilt = fresh.results(now).sort_values(key).reset_index(drop=True)
+    pd.testing.assert_frame_equal(incremental, rebuilt)
+    night = rebuilt[(rebuilt["nurse_id"] == "N2") & (rebuilt["shift"] == "Night")].iloc[0]
+    assert (night["status"], night["late_minutes"]) == ("in_progress", 30)
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+
+from replacement_finder import NOT_ON_LADDER, ReplacementIndex, slot_at
+
+WINDOWS = {"Morning": (420, 480), "Evening": (900, 480), "Night": (1380, 480)}
+DATES = ["2025-10-20", "2025-10-21", "2025-10-22"]
+LADDER = {"U44": ("U44", "U41"), "U41": ("U41",)}
+
+
+def nurse(nurse_id, grade="U44", ward="ICU", preferred="Morning", seniority=0, max_shifts=5):
+    return {"id": nurse_id, "name": nurse_id, "grade": grade, "department": ward, "skills": [ward, "ICU"],
+            "preferred_shifts": preferred, "seniority": seniority, "max_shifts_per_week": max_shifts}
+
+
+def build(nurses, duty=(), mcs=(), max_weekly_hours=60):
+    return ReplacementIndex(nurses, DATES, dict(duty), WINDOWS, LADDER, list(mcs), max_weekly_hours)
+
+
+def ranked(result):
+    return [c["nurse_id"] for c in result["candidates"]]
+
+
+def test_ranking_order():
+    nurses = [
+        nurse("junior", grade="U41", seniority=30),          # one ladder step down
+        nurse("capped", max_shifts=1),                       # already at max_shifts_per_week
+        nurse("other_ward", ward="GW"),
+        nurse("evening_pref", preferred="Evening"),
+        nurse("busy_week"),                                  # fewer hours left
+        nurse("senior", seniority=20),
+        nurse("newer", seniority=5),
+    ]
+    duty = {"capped": [("2025-10-21", "Evening")], "busy_week": [("2025-10-22", "Evening")]}
+    result = build(nurses, duty).find("ICU", "2025-10-20", "Morning", grade="U44")
+    assert ranked(result) == ["senior", "newer", "busy_week", "evening_pref", "other_ward", "capped", "junior"]
+    assert result["eligible"] == 7
+    top = result["candidates"][0]
+    assert top["ladder_step"] == 0 and top["hours_remaining"] == 52 and not top["beyond_contracted_shifts"]
+    assert result["candidates"][-1]["ladder_step"] == 1
+
+
+def test_excluded_nurses():
+    nurses = [nurse("free"), nurse("rostered"), nurse("on_mc"), nurse("after_night"), nurse("no_hours"),
+              nurse("off_ladder", grade="U54"), nurse("ed_only", ward="ED"), nurse("caller")]
+    nurses[6]["skills"] = ["ED"]
+    duty = {"rostered": [("2025-10-21", "Night")], "after_night": [("2025-10-20", "Night")],
+            "no_hours": [("2025-10-20", "Morning")]}
+    mcs = [{"nurse_id": "on_mc", "start_date": "2025-10-21", "end_date": "2025-10-22", "mc_id": "MC1"}]
+    index = build(nurses, duty, mcs, max_weekly_hours=10)
+    result = index.find("ICU", "2025-10-21", "Morning", grade="U44", exclude=("caller",))
+    assert ranked(result) == ["free"]
+    # Without a grade the ladder does not filter
+    assert "off_ladder" in ranked(index.find("ICU", "2025-10-21", "Morning"))
+    assert index.ladder_rank["U44"][5] == NOT_ON_LADDER
+
+
+def test_absences_outside_the_roster_dates_still_count():
+    mcs = [{"nurse_id": "a", "start_date": "2025-10-23", "end_date": "2025-10-24", "mc_id": "MC1"}]
+    index = build([nurse("a"), nurse("b")], mcs=mcs)
+    assert ranked(index.find("ICU", "2025-10-24", "Evening")) == ["b"]
+    assert ranked(index.find("ICU", "2025-10-25", "Evening")) == ["a", "b"]
+
+
+def test_malformed_mc_window_is_skipped(capsys):
+    mcs = [{"nurse_id": "a", "start_date": "22/09/2025", "end_date": "2025-10-21", "mc_id": "MC1"},
+           {"nurse_id": "b", "start_date": "2025-10-21", "end_date": "2025-10-21", "mc_id": "MC2"}]
+    index = build([nurse("a"), nurse("b")], mcs=mcs)
+    assert ranked(index.find("ICU", "2025-10-21", "Morning")) == ["a"]
+    assert "Skipping MC MC1" in capsys.readouterr().out
+
+
+def test_bad_queries_raise():
+    index = build([nurse("a")])
+    with pytest.raises(ValueError, match="shift must be one of"):
+        index.find("ICU", "2025-10-21", "Noon")
+    with pytest.raises(ValueError, match="YYYY-MM-DD"):
+        index.find("ICU", "21/10/2025", "Morning")
+
+
+def test_slot_at_puts_early_hours_on_the_previous_nights_date():
+    assert slot_at(datetime(2025, 10, 21, 3, 0), WINDOWS) == ("2025-10-20", "Night")
+    assert slot_at(datetime(2025, 10, 21, 7, 0), WINDOWS) == ("2025-10-21", "Morning")
+    assert slot_at(datetime(2025, 10, 21, 22, 59), WINDOWS) == ("2025-10-21", "Evening")
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from roster_codec import HEADER, OFF, ON_DUTY, decode_roster, encode_roster
+
+SHIFTS = ["Morning", "Evening", "Night"]
+
+
+def make_roster(nurses=40, days=9, seed=3):
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp("2025-10-20")
+    columns = {"Nurse_ID": [f"N{i:04d}" for i in range(nurses)], "Name": [f"Nurse {i}" for i in range(nurses)]}
+    picks = rng.integers(0, 5, size=(days, nurses))   # 0-2: that shift, 3-4: off
+    for d in range(days):
+        day = base + pd.Timedelta(days=d)
+        ward = rng.choice(["ICU", "ED", "GW"], nurses)
+        for s, name in enumerate(SHIFTS):
+            columns[f"{day:%A} {day:%Y-%m-%d} {name}"] = np.where(picks[d] == s, np.char.add(ON_DUTY, ward), OFF)
+    return pd.DataFrame(columns)
+
+
+@pytest.mark.parametrize("days", [1, 4, 7, 9])
+def test_round_trip_matches_json_records(days):
+    roster = make_roster(days=days)
+    decoded = decode_roster(encode_roster(roster))
+    assert decoded.records() == roster.to_dict("records")
+    assert decoded.shifts == SHIFTS
+    assert decoded.days[0].isoformat() == "2025-10-20"
+
+
+def test_round_trip_keeps_unicode_names():
+    roster = make_roster(nurses=3, days=2)
+    roster["Name"] = ["Siti Nur 'Aisyah", "Jose Muñoz", "李华"]
+    assert decode_roster(encode_roster(roster)).names == roster["Name"].tolist()
+
+
+def test_rejects_two_shifts_in_a_day():
+    roster = make_roster(nurses=2, days=1)
+    roster.loc[0, "Monday 2025-10-20 Morning"] = ON_DUTY + "ICU"
+    roster.loc[0, "Monday 2025-10-20 Night"] = ON_DUTY + "ICU"
+    with pytest.raises(ValueError, match="more than one shift"):
+        encode_roster(roster)
+
+
+def test_rejects_unsupported_cell_values():
+    roster = make_roster(nurses=2, days=1)
+    roster.loc[1, "Monday 2025-10-20 Evening"] = "Annual Leave"
+    with pytest.raises(ValueError, match="unsupported roster values"):
+        encode_roster(roster)
+
+
+def test_rejects_truncated_or_foreign_bytes():
+    packed = encode_roster(make_roster(nurses=5, days=3))
+    with pytest.raises(ValueError):
+        decode_roster(packed[:-1])
+    with pytest.raises(ValueError):
+        decode_roster(packed[:HEADER.size - 1])
+    with pytest.raises(ValueError):
+        decode_roster(b"XXXX" + packed[4:])
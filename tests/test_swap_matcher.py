@@ -0,0 +1,130 @@
+import itertools
+import json
+import random
+
+import pandas as pd
+import pytest
+
+import swap_matcher as swap_matcher_module
+from mc_store import MCStore
+from nurse_directory import NurseDirectory
+from swap_matcher import SwapMatcher, hopcroft_karp
+
+
+def brute_force_size(adjacency, right_count):
+    """Largest matching by trying every assignment; only for tiny graphs."""
+    best = 0
+
+    def extend(u, used, size):
+        nonlocal best
+        if u == len(adjacency):
+            best = max(best, size)
+            return
+        if size + len(adjacency) - u <= best:
+            return
+        extend(u + 1, used, size)
+        for v in adjacency[u]:
+            if v not in used:
+                extend(u + 1, used | {v}, size + 1)
+
+    extend(0, frozenset(), 0)
+    return best
+
+
+def assert_valid(adjacency, right_count, match_left):
+    partners = [v for v in match_left if v != -1]
+    assert len(partners) == len(set(partners))
+    for u, v in enumerate(match_left):
+        assert v == -1 or v in adjacency[u]
+        assert v < right_count
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_brute_force_on_random_graphs(seed):
+    rng = random.Random(seed)
+    left, right = rng.randint(0, 7), rng.randint(0, 7)
+    density = rng.random()
+    adjacency = [[v for v in range(right) if rng.random() < density] for _ in range(left)]
+    for neighbours in adjacency:
+        rng.shuffle(neighbours)
+    match_left = hopcroft_karp(adjacency, right)
+    assert_valid(adjacency, right, match_left)
+    assert sum(v != -1 for v in match_left) == brute_force_size(adjacency, right)
+
+
+def test_augments_past_a_bad_greedy_start():
+    # Greedy pairs 0-0, leaving 1 unmatched unless the phase reroutes 0 to 1
+    adjacency = [[0, 1], [0]]
+    assert hopcroft_karp(adjacency, 2) == [1, 0]
+
+
+def test_complete_bipartite_graph_is_perfectly_matched():
+    n = 12
+    adjacency = [list(range(n)) for _ in range(n)]
+    match_left = hopcroft_karp(adjacency, n)
+    assert sorted(match_left) == list(range(n))
+
+
+def test_every_small_graph_on_three_by_three():
+    edges = list(itertools.product(range(3), range(3)))
+    for mask in range(1 << len(edges)):
+        adjacency = [[] for _ in range(3)]
+        for bit, (u, v) in enumerate(edges):
+            if mask >> bit & 1:
+                adjacency[u].append(v)
+        match_left = hopcroft_karp(adjacency, 3)
+        assert_valid(adjacency, 3, match_left)
+        assert sum(v != -1 for v in match_left) == brute_force_size(adjacency, 3)
+
+
+# ---------------- SwapMatcher ----------------
+@pytest.fixture
+def matcher(tmp_path, monkeypatch):
+    nurses = [{"id": n, "name": n, "department": "ICU", "skills": ["ICU"], "max_shifts_per_week": 5}
+              for n in ("A", "B", "C")]
+    nurse_path = tmp_path / "nurses.json"
+    nurse_path.write_text(json.dumps(nurses))
+    roster = pd.DataFrame({"Nurse_ID": ["A", "B", "C"],
+                           "Monday 2025-10-20 Morning": ["On Duty - ICU", "Off", "Off"],
+                           "Tuesday 2025-10-21 Morning": ["Off", "On Duty - ICU", "Off"],
+                           "Wednesday 2025-10-22 Morning": ["Off", "Off", "On Duty - ICU"]})
+    monkeypatch.setattr(swap_matcher_module, "load_roster", lambda: roster)
+    monkeypatch.setattr(swap_matcher_module, "directory", NurseDirectory(str(nurse_path)))
+    monkeypatch.setattr(swap_matcher_module, "mc_store", MCStore(str(tmp_path / "mc_requests.json")))
+    return SwapMatcher()
+
+
+def swap(swap_id, nurse_id, give, take, status="pending", counterpart=None):
+    return {"id": swap_id, "nurse_id": nurse_id, "status": status, "submitted_at": swap_id,
+            "current_slot": give, "desired_slot": take, "counterpart_nurse_id": counterpart}
+
+
+MON, TUE, WED = "Monday 2025-10-20 Morning", "Tuesday 2025-10-21 Morning", "Wednesday 2025-10-22 Morning"
+
+
+def test_matches_reciprocal_requests(matcher):
+    result = matcher.match([swap("S1", "A", MON, WED), swap("S2", "C", WED, MON), swap("S3", "B", TUE, WED)])
+    assert [(a["id"], b["id"]) for a, b, _, _ in result["pairs"]] == [("S1", "S2")]
+    assert result["unmatched"] == {"S3": "no compatible counterpart"}
+
+
+def test_already_matched_swaps_count_as_worked(matcher):
+    # A and B already traded Monday for Tuesday
+    done = [swap("S1", "A", MON, TUE, "matched", "B"), swap("S2", "B", TUE, MON, "matched", "A")]
+    assert matcher.duty(done) == {"A": {("2025-10-21", "Morning"): "ICU"}, "B": {("2025-10-20", "Morning"): "ICU"},
+                                  "C": {("2025-10-22", "Morning"): "ICU"}}
+    result = matcher.match(done + [swap("S3", "A", TUE, WED), swap("S4", "C", WED, TUE),
+                                   swap("S5", "B", TUE, WED), swap("S6", "A", MON, WED)])
+    assert [(a["id"], b["id"]) for a, b, _, _ in result["pairs"]] == [("S3", "S4")]
+    # B gave Tuesday away and A gave Monday away, so neither can trade them again
+    assert result["unmatched"] == {"S5": "not rostered on the current shift",
+                                   "S6": "not rostered on the current shift"}
+
+
+def test_malformed_mc_window_does_not_break_matching(matcher, capsys):
+    with open(swap_matcher_module.mc_store.path, "w") as f:
+        json.dump({"C": [{"id": "MC1", "nurse_id": "C", "start_date": "2025-10-21 am", "end_date": "2025-10-22",
+                          "status": "approved", "submitted_at": "x"}]}, f)
+    result = matcher.match([swap("S1", "A", MON, WED), swap("S2", "C", WED, MON)])
+    assert len(result["pairs"]) == 1
+    assert "Skipping MC MC1" in capsys.readouterr().out
@@ -0,0 +1,35 @@
+import pytest
+
+from whatif import parse_scenario
+
+NURSES = {"N1000", "N1001"}
+
+
+def test_numbers_expand_to_every_ward_and_feature():
+    scenario = parse_scenario({"name": "surge", "demand": 1.5, "features": {"ICU": 2}}, 0, NURSES)
+    assert scenario == {"name": "surge", "demand": {"ED": 1.5, "GW": 1.5, "ICU": 1.5}, "features": {"ICU": 2.0}}
+
+
+def test_defaults_and_normalization():
+    scenario = parse_scenario({"remove_nurses": ["N1001", "N1000", "N1001"], "max_shifts_per_week": 4}, 2, NURSES)
+    assert scenario == {"name": "scenario 3", "remove_nurses": ["N1000", "N1001"],
+                        "max_shifts_per_week": {"*": 4}}
+
+
+@pytest.mark.parametrize("raw, message", [
+    ("surge", "must be an object"),
+    ({"colour": "red"}, "unknown fields colour"),
+    ({"demand": {"XYZ": 1}}, "demand keys"),
+    ({"demand": -1}, "non-negative"),
+    ({"demand": True}, "must be a number"),
+    ({"features": {"Deaths": 2}}, "features keys"),
+    ({"remove_nurses": ["N9"]}, "known nurse IDs"),
+    ({"remove_nurses": "N1000"}, "known nurse IDs"),
+    ({"remove_from_ward": {"ICU": -1}}, "remove_from_ward"),
+    ({"remove_from_ward": {"ICU": 1.5}}, "remove_from_ward"),
+    ({"max_shifts_per_week": 8}, "0-7"),
+    ({"max_shifts_per_week": {"N9": 3}}, "unknown nurse N9"),
+])
+def test_rejects_bad_scenarios(raw, message):
+    with pytest.raises(ValueError, match=message):
+        parse_scenario(raw, 0, NURSES)
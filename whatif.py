@@ -0,0 +1,274 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import pandas as pd
+
+from scheduling_ai import (DATASET_CSV, MIN_WEEKLY_HOURS, NURSE_JSON, SHIFT_HOURS, load_models, peek_next_week_start,
+                           predict_next_week, schedule_nurses_optimized, shifts, wards)
+
+# ---------------- Config ----------------
+MAX_SCENARIOS = 32
+WHATIF_WORKERS = int(os.environ.get('WHATIF_WORKERS', 0)) or os.cpu_count() or 1
+# forkserver: workers fork from a server that imported this module once, and never from a threaded app worker
+WHATIF_START_METHOD = os.environ.get('WHATIF_START_METHOD') or (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+FEATURES = ("New case", "ICU", "Admission")
+SCENARIO_KEYS = {"name", "demand", "features", "remove_nurses", "remove_from_ward", "max_shifts_per_week"}
+BASELINE = "baseline"
+
+
+def _multipliers(value, allowed, field):
+    """{key: factor} from a number (applies to every key) or a dict keyed by `allowed`."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = {key: value for key in allowed}
+    if not isinstance(value, dict):
+        raise ValueError(f"{field} must be a number or an object keyed by {', '.join(allowed)}")
+    out = {}
+    for key, factor in value.items():
+        if key not in allowed:
+            raise ValueError(f"{field} keys must be among {', '.join(allowed)}")
+        if isinstance(factor, bool) or not isinstance(factor, (int, float)) or factor < 0:
+            raise ValueError(f"{field}.{key} must be a non-negative number")
+        out[key] = float(factor)
+    return out
+
+
+def parse_scenario(raw, index, nurse_ids):
+    """Validated copy of one scenario; ValueError names the offending field."""
+    if not isinstance(raw, dict):
+        raise ValueError(f"scenario {index + 1} must be an object")
+    unknown = set(raw) - SCENARIO_KEYS
+    if unknown:
+        raise ValueError(f"scenario {index + 1}: unknown fields {', '.join(sorted(unknown))}")
+    scenario = {"name": str(raw.get("name") or f"scenario {index + 1}")}
+    if "demand" in raw:
+        scenario["demand"] = _multipliers(raw["demand"], wards, "demand")
+    if "features" in raw:
+        scenario["features"] = _multipliers(raw["features"], FEATURES, "features")
+    if "remove_nurses" in raw:
+        removed = raw["remove_nurses"]
+        if not isinstance(removed, list) or any(str(n) not in nurse_ids for n in removed):
+            raise ValueError("remove_nurses must be a list of known nurse IDs")
+        scenario["remove_nurses"] = sorted({str(n) for n in removed})
+    if "remove_from_ward" in raw:
+        counts = raw["remove_from_ward"]
+        if not isinstance(counts, dict) or any(w not in wards or not isinstance(c, int) or isinstance(c, bool) or c < 0
+                                               for w, c in counts.items()):
+            raise ValueError(f"remove_from_ward must map {', '.join(wards)} to a nurse count")
+        scenario["remove_from_ward"] = dict(counts)
+    if "max_shifts_per_week" in raw:
+        limit = raw["max_shifts_per_week"]
+        limits = limit if isinstance(limit, dict) else {"*": limit}
+        for key, value in limits.items():
+            if key != "*" and key not in nurse_ids:
+                raise ValueError(f"max_shifts_per_week: unknown nurse {key}")
+            if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 7:
+                raise ValueError("max_shifts_per_week must be 0-7, or an object of nurse ID -> 0-7")
+        scenario["max_shifts_per_week"] = limits
+    return scenario
+
+
+def load_inputs(start_date=None):
+    """The read-only inputs every scenario shares: models, latest dataset row, nurses and blocked slots."""
+    from availability import availability
+
+    start_date = start_date or peek_next_week_start()
+    with open(NURSE_JSON, "r", encoding="utf-8") as f:
+        nurses = json.load(f)
+    return {
+        "models": load_models(),
+        "latest": pd.read_csv(DATASET_CSV, parse_dates=["Date"], dayfirst=True).tail(1).reset_index(drop=True),
+        "nurses": nurses,
+        "start_date": start_date,
+        "unavailable": availability.blocked_slots([n["id"] for n in nurses], start_date, 7, shifts),
+    }
+
+
+def apply_scenario(inputs, scenario):
+    """(week demand, nurse list, removed IDs) for a scenario, leaving `inputs` untouched."""
+    latest = inputs["latest"].copy()
+    for feature, factor in scenario.get("features", {}).items():
+        latest[feature] = latest[feature] * factor
+    demand = predict_next_week(latest, inputs["models"], days=7)
+    for ward, factor in scenario.get("demand", {}).items():
+        demand[ward] = [max(2, math.ceil(v * factor - 1e-9)) for v in demand[ward]]
+
+    removed = set(scenario.get("remove_nurses", ()))
+    for ward, count in scenario.get("remove_from_ward", {}).items():
+        # Lowest IDs first, so the same scenario always removes the same nurses
+        in_ward = sorted(str(n["id"]) for n in inputs["nurses"]
+                         if n.get("department") == ward and str(n["id"]) not in removed)
+        removed.update(in_ward[:count])
+
+    limits = scenario.get("max_shifts_per_week", {})
+    nurses = []
+    for nurse in inputs["nurses"]:
+        if str(nurse["id"]) in removed:
+            continue
+        limit = limits.get(str(nurse["id"]), limits.get("*"))
+        nurses.append(dict(nurse, max_shifts_per_week=limit) if limit is not None else nurse)
+    return demand, nurses, sorted(removed)
+
+
+def coverage(summary):
+    """(overall coverage, {ward: coverage}, shortfall): assigned vs predicted nurses per ward, day and shift."""
+    covered, predicted, by_ward = 0, 0, {}
+    for ward in wards:
+        ward_covered = ward_predicted = 0
+        for shift in shifts:
+            p = summary[f"{ward}_{shift}_predicted"]
+            ward_covered += int(pd.concat([summary[f"{ward}_{shift}_assigned"], p], axis=1).min(axis=1).sum())
+            ward_predicted += int(p.sum())
+        by_ward[ward] = round(ward_covered / ward_predicted, 3) if ward_predicted else None
+        covered, predicted = covered + ward_covered, predicted + ward_predicted
+    return (round(covered / predicted, 3) if predicted else None), by_ward, predicted - covered
+
+
+def run_scenario(inputs, scenario):
+    """Predict and solve one scenario; returns its comparison row."""
+    started = time.perf_counter()
+    demand, nurses, removed = apply_scenario(inputs, scenario)
+    runs = []
+    with contextlib.redirect_stdout(io.StringIO()):   # the scheduler narrates every solve
+        schedule, summary, hours = schedule_nurses_optimized(
+            demand, nurses, wards, shifts, start_date=inputs["start_date"], weeks=1,
+            unavailable={n: s for n, s in inputs["unavailable"].items() if n not in removed}, run_log=runs,
+            record=False)
+    run = runs[-1] if runs else {}
+    row = {
+        "name": scenario["name"],
+        "feasible": schedule is not None,
+        "status": run.get("status", "not_solved"),
+        "nurses": len(nurses),
+        "removed": removed,
+        "predicted_demand": int(sum(demand[w].sum() for w in wards)) * len(shifts),
+        "solve_seconds": run.get("wall_seconds"),
+    }
+    if run.get("uncovered"):
+        row["uncovered"] = run["uncovered"]
+    if schedule is not None:
+        overall, by_ward, shortfall = coverage(summary)
+        worked = list(hours.values())
+        row.update({
+            "coverage": overall,
+            "coverage_by_ward": by_ward,
+            "shortfall": shortfall,
+            "assigned_shifts": sum(worked) // SHIFT_HOURS,
+            "total_hours": sum(worked),
+            "avg_hours": round(sum(worked) / len(worked), 1) if worked else 0,
+            "below_min_hours": sum(1 for h in worked if h < MIN_WEEKLY_HOURS),
+        })
+    row["seconds"] = round(time.perf_counter() - started, 3)
+    return row
+
+
+# Per-worker copy of the shared inputs, set once by the pool initializer instead of pickled with every task
+_inputs = None
+
+
+def _init_worker(inputs):
+    global _inputs
+    _inputs = inputs
+
+
+def _run_in_worker(scenario):
+    try:
+        return run_scenario(_inputs, scenario)
+    except Exception as e:
+        return {"name": scenario["name"], "feasible": False, "status": "error", "error": str(e)}
+
+
+def run_batch(raw_scenarios, start_date=None, include_baseline=True, workers=WHATIF_WORKERS, inputs=None):
+    """Run every scenario on a process pool and return the comparison table.
+
+    Each worker receives the models, dataset row, nurse list and blocked
+    slots once, then predicts and solves scenarios independently, so a
+    batch takes about as long as its slowest scenario when there are
+    enough cores. Rows after the baseline carry deltas against it.
+    """
+    if not isinstance(raw_scenarios, list) or not raw_scenarios:
+        raise ValueError("scenarios must be a non-empty list")
+    if len(raw_scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"at most {MAX_SCENARIOS} scenarios per batch")
+    if isinstance(start_date, str):
+        try:
+            start_date = date.fromisoformat(start_date)
+        except ValueError:
+            raise ValueError("start_date must be a date (YYYY-MM-DD)")
+    inputs = inputs or load_inputs(start_date)
+    nurse_ids = {str(n["id"]) for n in inputs["nurses"]}
+    scenarios = [parse_scenario(raw, i, nurse_ids) for i, raw in enumerate(raw_scenarios)]
+    if include_baseline and not any(s["name"] == BASELINE for s in scenarios):
+        scenarios.insert(0, {"name": BASELINE})
+
+    started = time.perf_counter()
+    workers = max(1, min(workers, len(scenarios)))
+    context = multiprocessing.get_context(WHATIF_START_METHOD)
+    if WHATIF_START_METHOD == "forkserver":
+        context.set_forkserver_preload(["whatif"])
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(inputs,)) as pool:
+        rows = list(pool.map(_run_in_worker, scenarios))
+
+    baseline = next((r for r in rows if r["name"] == BASELINE and r.get("feasible")), None)
+    if baseline:
+        for row in rows:
+            if row is not baseline and row.get("feasible"):
+                row["delta"] = {key: round(row[key] - baseline[key], 3)
+                                for key in ("coverage", "shortfall", "total_hours", "assigned_shifts")}
+    return {
+        "start_date": str(inputs["start_date"]),
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 3),
+        "slowest_scenario_seconds": max((r.get("seconds") or 0) for r in rows),
+        "scenarios": rows,
+    }
+
+
+def sample_scenarios():
+    """Sixteen typical questions: demand surges and dips, ICU absences and shift caps."""
+    scenarios = [{"name": f"demand x{m}", "demand": m} for m in (0.8, 1.1, 1.2, 1.5)]
+    scenarios += [{"name": f"admissions +{p}%", "features": {"Admission": 1 + p / 100}} for p in (20, 50)]
+    scenarios += [{"name": f"{n} ICU nurses out", "remove_from_ward": {"ICU": n}} for n in (1, 3, 5, 7)]
+    scenarios += [{"name": f"max {k} shifts/week", "max_shifts_per_week": k} for k in (3, 4, 6)]
+    scenarios += [{"name": "ICU +20%, 3 ICU out", "demand": {"ICU": 1.2}, "remove_from_ward": {"ICU": 3}},
+                  {"name": "5 ED out, max 6 shifts", "remove_from_ward": {"ED": 5}, "max_shifts_per_week": 6},
+                  {"name": "surge: all +50%, 2 per ward out", "demand": 1.5,
+                   "remove_from_ward": {"ED": 2, "GW": 2, "ICU": 2}}]
+    return scenarios
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run what-if staffing scenarios in parallel")
+    parser.add_argument('scenarios', nargs='?', help='JSON file with a list of scenarios (default: 16 samples)')
+    parser.add_argument('--start-date', help='roster start date (default: the next week to be generated)')
+    parser.add_argument('--workers', type=int, default=WHATIF_WORKERS)
+    parser.add_argument('--json', help='also write the results as JSON to this path')
+    args = parser.parse_args()
+
+    if args.scenarios:
+        with open(args.scenarios, 'r') as f:
+            scenarios = json.load(f)
+    else:
+        scenarios = sample_scenarios()
+    result = run_batch(scenarios, start_date=args.start_date, workers=args.workers)
+
+    print(f"{'scenario':34} {'status':10} {'nurses':>6} {'coverage':>8} {'short':>6} {'hours':>6} {'secs':>6}")
+    for r in result["scenarios"]:
+        coverage_text = f"{r['coverage']:.3f}" if r.get('coverage') is not None else "-"
+        print(f"{r['name'][:34]:34} {r['status']:10} {r.get('nurses', 0):6} {coverage_text:>8} "
+              f"{r.get('shortfall', '-'):>6} {r.get('total_hours', '-'):>6} {r.get('seconds') or 0:6.2f}")
+    print(f"{len(result['scenarios'])} scenarios on {result['workers']} workers in {result['seconds']}s "
+          f"(slowest scenario {result['slowest_scenario_seconds']}s)")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.json}")